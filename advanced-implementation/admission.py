@@ -0,0 +1,68 @@
+"""
+Overload control of the server: a token bucket per connection and a monitor of the event loop lag
+
+Neither drops a command. A connection over its rate, or every connection while the event loop is late, stops being read
+(see Command_handler.pause_reading): the commands wait in the client socket and TCP slows the client down,
+so the commands that are read are served within a bounded latency. Calls beyond the queue length of a tenant are refused
+by the call center itself ("queue_full", see Call_center.call).
+"""
+
+import time
+
+class Token_bucket():
+    """
+    Token_bucket allows "rate" commands per second on average and bursts of "burst" commands
+
+    take never refuses: it takes the tokens, going into debt if there are not enough, and returns how many seconds
+    the caller should wait before the next command, so the debt is paid back at "rate".
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.__rate = rate
+        self.__burst = burst
+        self.__clock = clock
+        self.__tokens = burst
+        self.__updated = clock()
+
+    def take(self, count=1):
+        """ Take count tokens, return the seconds to wait until the bucket is out of debt (0 if it is not in debt) """
+        now = self.__clock()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate) - count
+        self.__updated = now
+        return -self.__tokens / self.__rate if self.__tokens < 0 else 0
+
+class Lag_monitor():
+    """
+    Lag_monitor measures how late a check that should run every "interval" seconds runs (check is called by the server event loop)
+
+    The event loop is overloaded from the check that runs "max_lag" seconds late or more until one runs less than half of it late,
+    the hysteresis keeps the state from flapping on every check.
+    """
+
+    def __init__(self, interval, max_lag, clock=time.monotonic):
+        self.__interval = interval
+        self.__max_lag = max_lag
+        self.__clock = clock
+        self.__checked = clock()
+        self.__lag = 0
+        self.__overloaded = False
+
+    def check(self):
+        """ Measure the lag of this check, return True if the overloaded state changed """
+        now = self.__clock()
+        self.__lag = max(0, now - self.__checked - self.__interval)
+        self.__checked = now
+
+        threshold = self.__max_lag / 2 if self.__overloaded else self.__max_lag
+        overloaded = self.__lag >= threshold
+        changed = overloaded != self.__overloaded
+        self.__overloaded = overloaded
+        return changed
+
+    def is_overloaded(self):
+        """ Return True if the event loop is overloaded """
+        return self.__overloaded
+
+    def get_lag(self):
+        """ Return the seconds the last check ran late """
+        return self.__lag
@@ -0,0 +1,219 @@
+"""
+The asyncio backend of the call center server, without Twisted: the same protocol and the same Call_center_service as call_center_queue.py
+
+Ring timeouts are loop.call_later handles (cancelled when the call stops ringing), journal batches are written and reporting snapshots
+serialized in the default executor, and the periodic tasks (eviction, journal snapshots, lag checks, history flushes) are chained call_later handles.
+
+With uvloop installed the server runs on its event loop ("--loop auto", the default, or "--loop uvloop"), "--loop asyncio" keeps the stdlib one.
+See "benchmark.py server --backend twisted|asyncio" to compare both backends on the same floor.
+"""
+
+import asyncio
+import signal
+from call_center_service import Command_handler
+from call_center_service import Call_center_service
+from call_center_service import server_parser
+from call_center_service import build_service
+import metrics
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+class line_receiver(asyncio.Protocol):
+    """
+    The part of the Twisted LineReceiver interface Command_handler relies on, over an asyncio transport
+
+    Lines are split once per read, a paused receiver keeps the rest of the read buffered until resumeProducing,
+    setRawMode hands everything after the current line to rawDataReceived, and a line longer than MAX_LENGTH closes the connection.
+    The transport write buffer pausing and resuming is forwarded to the registered producer (the event feed of a subscribed connection).
+    """
+
+    delimiter = b"\n"
+    MAX_LENGTH = 16384
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.buffer = b""
+        self.line_mode = True
+        self.paused = False
+        self.producer = None
+        self.connectionMade()
+
+    def connection_lost(self, exc):
+        self.connectionLost(exc)
+        if self.producer is not None:
+            self.producer.stopProducing()
+            self.producer = None
+
+    def data_received(self, data):
+        self.dataReceived(data)
+
+    def pause_writing(self):
+        if self.producer is not None:
+            self.producer.pauseProducing()
+
+    def resume_writing(self):
+        if self.producer is not None:
+            self.producer.resumeProducing()
+
+    def register_producer(self, producer):
+        self.producer = producer
+
+    def dataReceived(self, data):
+        if self.paused:
+            self.buffer += data
+            return
+
+        if not self.line_mode:
+            self.rawDataReceived(self.buffer + data)
+            self.buffer = b""
+            return
+
+        lines = (self.buffer + data).split(self.delimiter)
+        self.buffer = lines.pop()
+
+        for index, line in enumerate(lines):
+            if self.paused or not self.line_mode:
+                self.buffer = self.delimiter.join(lines[index:] + [self.buffer])
+                break
+            if len(line) > self.MAX_LENGTH:
+                self.transport.close()
+                return
+            self.lineReceived(line)
+
+        if len(self.buffer) > self.MAX_LENGTH and self.line_mode:
+            self.transport.close()
+        elif not self.line_mode and not self.paused and self.buffer:
+            data, self.buffer = self.buffer, b""
+            self.rawDataReceived(data)
+
+    def setRawMode(self):
+        self.line_mode = False
+
+    def pauseProducing(self):
+        self.paused = True
+        self.transport.pause_reading()
+
+    def resumeProducing(self):
+        self.paused = False
+        self.dataReceived(b"")
+        if not self.paused and not self.transport.is_closing():
+            self.transport.resume_reading()
+
+class asyncio_call_center_server(Command_handler, line_receiver):
+    """ A Command_handler read by an asyncio line_receiver, see Command_handler for the protocol """
+
+class asyncio_call_center_factory(Call_center_service):
+    """
+    Builds asyncio_call_center_server connections that share one Call_center_service, on an asyncio event loop
+
+    It is the protocol factory of loop.create_server, start runs the periodic tasks and stop cancels them
+    """
+
+    def __init__(self, registry=None, journal=None, loop=None):
+        super().__init__(registry, journal)
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.periodic = dict()
+
+    def __call__(self):
+        p = asyncio_call_center_server()
+        p.factory = self
+        return p
+
+    def start(self):
+        self.every(self.eviction_interval, self.registry.evict_idle)
+        if self.journal is not None:
+            self.every(self.snapshot_interval, self.request_snapshot)
+        if self.start_lag_monitor():
+            self.every(self.lag_interval, self.check_lag)
+        if self.history is not None:
+            self.every(self.history_interval, self.flush_history)
+
+    def stop(self):
+        for handle in self.periodic.values():
+            handle.cancel()
+        self.periodic.clear()
+        self.close_history()
+
+    def every(self, interval, callback):
+        """ Call callback every interval seconds (after it returned, like a LoopingCall that is late) until stop """
+        def run():
+            self.periodic[callback] = self.loop.call_later(interval, run)
+            callback()
+
+        self.periodic[callback] = self.loop.call_later(interval, run)
+
+    def schedule(self, delay, callback, *args):
+        return self.loop.call_later(delay, callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        return self.loop.call_later(delay, callback, *args)
+
+    def run_in_thread(self, function, args, done):
+        def finished(future):
+            if future.exception() is not None:
+                self.loop.call_exception_handler({"message": f"{function.__qualname__} failed", "exception": future.exception()})
+                done(None)
+            else:
+                done(future.result())
+
+        self.loop.run_in_executor(None, function, *args).add_done_callback(finished)
+
+
+async def serve_metrics(registry, port):
+    """ Serve the Prometheus scrape endpoint with the metrics of every tenant of registry, on any GET path """
+    async def scrape(reader, writer):
+        try:
+            while (await reader.readline()).strip():
+                pass
+            body = metrics.render_prometheus(registry).encode()
+            writer.write(
+                b"HTTP/1.0 200 OK\r\ncontent-type: text/plain; version=0.0.4\r\n"
+                + f"content-length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(scrape, port=port)
+
+async def serve(args):
+    """ Run the server of the parsed server_parser options until it is cancelled """
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    factory = build_service(asyncio_call_center_factory, args, loop=loop)
+    factory.start()
+
+    listener = await loop.create_server(factory, port=args.port)
+    if args.metrics_port:
+        await serve_metrics(factory.registry, args.metrics_port)
+
+    print(f"Serving on port {args.port} with {type(loop).__module__}.{type(loop).__name__}")
+    try:
+        await listener.serve_forever()
+    finally:
+        factory.stop()
+
+
+if __name__ == '__main__':
+    parser = server_parser()
+    parser.add_argument("--loop", choices=("auto", "asyncio", "uvloop"), default="auto",
+                        help="event loop, auto is uvloop when it is installed and the asyncio one otherwise")
+    args = parser.parse_args()
+
+    if args.loop == "uvloop" and uvloop is None:
+        parser.error("uvloop is not installed")
+
+    loop = uvloop.new_event_loop() if args.loop != "asyncio" and uvloop is not None else asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    serving = loop.create_task(serve(args))
+    try:
+        loop.run_until_complete(serving)
+    except KeyboardInterrupt:
+        serving.cancel()
+    except asyncio.CancelledError:
+        pass
+    if not serving.done():
+        loop.run_until_complete(asyncio.gather(serving, return_exceptions=True))
@@ -0,0 +1,346 @@
+"""
+Load-generation and latency benchmark of the call center
+
+    core:   drives one Call_center per tenant directly, on a virtual clock, as fast as the CPU allows
+    server: starts a server on a loopback port and drives it in real time with many concurrent client connections,
+            "--backend" picks call_center_queue.py (twisted) or asyncio_server.py (asyncio), "both" runs one after the other and compares them
+
+Both modes simulate the same floor: calls arrive at every tenant as a Poisson process of "rate" calls per second,
+a ringing operator rejects the call with probability "reject" or answers it after "answer-delay" seconds,
+and an answered call hangs up after an exponential handle time of mean "handle" seconds.
+
+Throughput, p50/p99/p999 command latency and memory growth are printed and appended as one JSON line to "output",
+together with the git commit, so runs of different commits can be compared.
+"""
+
+import argparse
+import collections
+import heapq
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from call_center_registry import Call_center_registry
+import wire_codec
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKENDS = {"twisted": "call_center_queue.py", "asyncio": "asyncio_server.py"}
+
+class Floor():
+    """ Simulated callers and operators: decides which command comes next, and after how many seconds, from the call center events """
+
+    def __init__(self, tenants, rate, reject, answer_delay, handle, seed):
+        self.tenants = [f"tenant-{n}" for n in range(tenants)]
+        self.rate = rate
+        self.reject = reject
+        self.answer_delay = answer_delay
+        self.handle = handle
+        self.rnd = random.Random(seed)
+        self.next_call = 0
+
+    def arrival(self, tenant):
+        """ Return the next call of tenant: (delay, tenant, "call", call_id) """
+        self.next_call += 1
+        return self.rnd.expovariate(self.rate), tenant, "call", f"{self.next_call}"
+
+    def react(self, tenant, obj):
+        """ Return the commands that follow an event, as (delay, tenant, command, id) """
+        if obj["action"] == "ringing":
+            command = "reject" if self.rnd.random() < self.reject else "answer"
+            return [(self.answer_delay, tenant, command, obj["operator_id"])]
+        if obj["action"] == "answered":
+            return [(self.rnd.expovariate(1 / self.handle), tenant, "hangup", obj["call_id"])]
+        return []
+
+
+def percentiles(latencies):
+    """ Return p50/p99/p999/max of latencies in nanoseconds, in milliseconds """
+    if not latencies:
+        return {}
+
+    latencies = sorted(latencies)
+    last = len(latencies) - 1
+    return {
+        "p50": latencies[int(last * 0.5)] / 1e6,
+        "p99": latencies[int(last * 0.99)] / 1e6,
+        "p999": latencies[int(last * 0.999)] / 1e6,
+        "max": latencies[last] / 1e6
+    }
+
+def rss(pid="self"):
+    """ Return the resident memory of a process in bytes (Linux), or None """
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+#----/ core mode /----
+
+def run_core(floor, duration):
+    """ Run the floor for "duration" virtual seconds on Call_center objects """
+    registry = Call_center_registry(max_tenants=len(floor.tenants))
+    events = []
+    sequence = 0
+    latencies = []
+
+    for tenant in floor.tenants:
+        delay, tenant, command, id = floor.arrival(tenant)
+        events.append((delay, sequence, tenant, command, id))
+        sequence += 1
+    heapq.heapify(events)
+
+    rss_start = rss()
+    start = time.perf_counter()
+
+    while events and events[0][0] <= duration:
+        now, _, tenant, command, id = heapq.heappop(events)
+        call_center = registry.get(tenant)
+
+        t0 = time.perf_counter_ns()
+        responses = getattr(call_center, command)(id)
+        latencies.append(time.perf_counter_ns() - t0)
+
+        follow_ups = [floor.arrival(tenant)] if command == "call" else []
+        for obj in responses:
+            follow_ups.extend(floor.react(tenant, obj))
+
+        for delay, tenant, command, id in follow_ups:
+            heapq.heappush(events, (now + delay, sequence, tenant, command, id))
+            sequence += 1
+
+    elapsed = time.perf_counter() - start
+    return {
+        "commands": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "latency_ms": percentiles(latencies),
+        "rss_start": rss_start,
+        "rss_end": rss()
+    }
+
+
+#----/ server mode /----
+
+TEXT_EVENTS = (
+    (re.compile(r"Call (?P<call_id>\S+) ringing for operator (?P<operator_id>\S+)"), "ringing"),
+    (re.compile(r"Call (?P<call_id>\S+) answered by operator (?P<operator_id>\S+)"), "answered"),
+    (re.compile(r"Call (?P<call_id>\S+) ignored by operator (?P<operator_id>\S+)"), "ignored")
+)
+
+def parse_text_response(text):
+    """ Turn the English lines of a JSON response back into the action dicts the floor reacts to """
+    responses = []
+    for line in text.split("\n"):
+        for pattern, action in TEXT_EVENTS:
+            match = pattern.match(line)
+            if match:
+                responses.append(dict(match.groupdict(), action=action))
+                break
+        else:
+            responses.append({"action": "other"})
+    return responses
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not listen on port {port}")
+
+def run_server(floor, duration, connections, encoding, port, ring_timeout, backend="twisted"):
+    """ Run the floor for "duration" seconds against a server of the backend """
+    from twisted.internet import defer
+    from twisted.internet import reactor
+    from twisted.internet.endpoints import TCP4ClientEndpoint
+    from twisted.internet.protocol import Factory
+    from twisted.protocols.basic import LineReceiver
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, BACKENDS[backend]), "--port", f"{port}", "--ring-timeout", f"{ring_timeout}"],
+        stdout=subprocess.DEVNULL
+    )
+    wait_for_port(port)
+    latencies = []
+    state = {"running": True}
+
+    class Load_client(LineReceiver):
+        """ One client connection: sends commands and matches responses to them in order """
+
+        delimiter = b"\n"
+
+        def connectionMade(self):
+            self.sent = collections.deque()
+            self.buffer = b""
+            if encoding != "json":
+                self.sendLine(json.dumps({"command": "encoding", "id": encoding}).encode())
+
+        def send(self, tenant, command, id):
+            self.sent.append((time.perf_counter_ns(), tenant))
+            if encoding == "binary":
+                self.transport.write(wire_codec.encode_binary_command(command, id, tenant))
+            else:
+                self.transport.write(wire_codec.encode_json_command(command, id, tenant))
+
+        def lineReceived(self, line):
+            if encoding == "structured" and line.startswith(b'{"responses"'):
+                self.received(wire_codec.decode_structured_response(line))
+                return
+
+            text = wire_codec.decode_json_response(line)
+            if text == "Encoding binary":
+                self.setRawMode()
+            elif not text.startswith("Encoding"):
+                self.received(parse_text_response(text))
+
+        def rawDataReceived(self, data):
+            frames, self.buffer = wire_codec.split_frames(self.buffer + data)
+            for frame in frames:
+                self.received(wire_codec.decode_binary_response(frame))
+
+        def received(self, responses):
+            if responses and responses[0]["action"] == "ignored":
+                tenant = self.unsolicited_tenant(responses)
+            else:
+                sent_at, tenant = self.sent.popleft()
+                latencies.append(time.perf_counter_ns() - sent_at)
+
+            if tenant is not None:
+                for obj in responses:
+                    for follow_up in floor.react(tenant, obj):
+                        schedule(*follow_up)
+
+        def unsolicited_tenant(self, responses):
+            """ The tenant of an "ignored" notification is not on the wire, it is found from the call id """
+            return call_tenants.get(responses[0]["call_id"])
+
+    call_tenants = dict()
+    clients = []
+    tenant_numbers = {tenant: number for number, tenant in enumerate(floor.tenants)}
+
+    def client_for(tenant):
+        return clients[tenant_numbers[tenant] % len(clients)]
+
+    def schedule(delay, tenant, command, id):
+        if state["running"]:
+            reactor.callLater(delay, send, tenant, command, id)
+
+    def send(tenant, command, id):
+        if not state["running"]:
+            return
+        if command == "call":
+            call_tenants[id] = tenant
+            schedule(*floor.arrival(tenant))
+        client_for(tenant).send(tenant, command, id)
+
+    def stop():
+        state["running"] = False
+        reactor.callLater(1, reactor.stop)
+
+    result = {}
+
+    @defer.inlineCallbacks
+    def start():
+        endpoint = TCP4ClientEndpoint(reactor, "127.0.0.1", port)
+        for _ in range(connections):
+            clients.append((yield endpoint.connect(Factory.forProtocol(Load_client))))
+
+        result["rss_start"] = rss(server.pid)
+        result["start"] = time.perf_counter()
+        for tenant in floor.tenants:
+            schedule(*floor.arrival(tenant))
+        reactor.callLater(duration, stop)
+
+    try:
+        reactor.callWhenRunning(start)
+        reactor.run()
+        elapsed = time.perf_counter() - result["start"]
+        result.update({
+            "commands": len(latencies),
+            "elapsed": elapsed,
+            "throughput": len(latencies) / elapsed,
+            "latency_ms": percentiles(latencies),
+            "rss_end": rss(server.pid)
+        })
+    finally:
+        server.terminate()
+        server.wait()
+
+    del result["start"]
+    return result
+
+def compare_backends(argv, output):
+    """ Run the server mode once per backend, each in its own process since a reactor only runs once, and print their results side by side """
+    results = {}
+    for backend in BACKENDS:
+        print(f"--- {backend}")
+        subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--backend", backend], check=True)
+        with open(output) as lines:
+            results[backend] = json.loads(lines.readlines()[-1])
+
+    print(f"\n{'':12}" + "".join(f"{backend:>14}" for backend in results))
+    print(f"{'commands/s':12}" + "".join(f"{result['throughput']:>14,.0f}" for result in results.values()))
+    for quantile in ("p50", "p99", "p999", "max"):
+        print(f"{quantile + ' ms':12}" + "".join(f"{result['latency_ms'][quantile]:>14.4f}" for result in results.values()))
+    print(f"{'memory MiB':12}" + "".join(f"{result.get('rss_growth', 0) / 2 ** 20:>+14.1f}" for result in results.values()))
+
+
+def report(mode, params, result, output):
+    memory = ""
+    if result.get("rss_start") and result.get("rss_end"):
+        result["rss_growth"] = result["rss_end"] - result["rss_start"]
+        memory = f", memory +{result['rss_growth'] / 2 ** 20:.1f} MiB"
+
+    latency = result["latency_ms"]
+    print(f"{mode}: {result['commands']:,} commands in {result['elapsed']:.2f}s, {result['throughput']:,.0f} commands/s{memory}")
+    if latency:
+        print(f"latency ms: p50 {latency['p50']:.4f}  p99 {latency['p99']:.4f}  p999 {latency['p999']:.4f}  max {latency['max']:.4f}")
+
+    with open(output, "a") as results:
+        results.write(json.dumps({"mode": mode, "commit": git_commit(), "timestamp": time.time(), "params": params, **result}) + "\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("core", "server"))
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=0.2, help="calls per second per tenant")
+    parser.add_argument("--reject", type=float, default=0.1, help="probability that a ringing operator rejects the call")
+    parser.add_argument("--answer-delay", type=float, default=1, help="seconds an operator lets a call ring before answering or rejecting it")
+    parser.add_argument("--handle", type=float, default=8, help="mean seconds of an answered call")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to simulate (virtual in core mode), default 3600 core / 20 server")
+    parser.add_argument("--connections", type=int, default=10, help="server mode: client connections")
+    parser.add_argument("--encoding", choices=wire_codec.ENCODINGS, default="json", help="server mode: wire encoding")
+    parser.add_argument("--port", type=int, default=5799, help="server mode: loopback port of the server under test")
+    parser.add_argument("--ring-timeout", type=float, default=10, help="server mode: ring timeout of the server under test")
+    parser.add_argument("--backend", choices=(*BACKENDS, "both"), default="twisted", help="server mode: server under test, both compares them")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.jsonl")
+    args = parser.parse_args()
+
+    if args.mode == "server" and args.backend == "both":
+        compare_backends(sys.argv[1:], args.output)
+        sys.exit()
+
+    params = {key: value for key, value in vars(args).items() if key not in ("mode", "output")}
+    floor = Floor(args.tenants, args.rate, args.reject, args.answer_delay, args.handle, args.seed)
+
+    if args.mode == "core":
+        result = run_core(floor, args.duration or 3600)
+    else:
+        result = run_server(floor, args.duration or 20, args.connections, args.encoding, args.port, args.ring_timeout, args.backend)
+
+    report(args.mode, params, result, args.output)
@@ -0,0 +1,57 @@
+"""
+Memory footprint of the call center core: bytes per operator and bytes per queued call
+
+One tenant is provisioned with "operators" operators, all offline so no call is dispatched, then "calls" calls are queued one by one.
+tracemalloc measures the Python heap each step takes (the ids are built beforehand, they belong to the caller).
+The footprint is printed and appended as one JSON line to "output", together with the git commit, like benchmark.py,
+so runs of different commits can be compared.
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from benchmark import git_commit
+from call_center_registry import Call_center_registry
+
+def run(operators, calls):
+    """ Return the footprint of "operators" operators and "calls" queued calls in one call center """
+    entries = [{"op_id": f"op-{n}", "tenant": None, "skills": [], "ring_timeout": None, "status": "offline"} for n in range(operators)]
+    call_ids = [f"call-{n}" for n in range(calls)]
+    gc.collect()
+
+    tracemalloc.start()
+    registry = Call_center_registry()
+    registry.provision(entries)
+    call_center = registry.find(Call_center_registry.DEFAULT_TENANT)
+    provisioned, _ = tracemalloc.get_traced_memory()
+
+    for call_id in call_ids:
+        call_center.call(call_id)
+    queued, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "bytes_per_operator": provisioned / operators if operators else 0,
+        "bytes_per_call": (queued - provisioned) / calls if calls else 0,
+        "traced": queued,
+        "peak": peak
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operators", type=int, default=100000)
+    parser.add_argument("--calls", type=int, default=1000000)
+    parser.add_argument("--output", default="benchmark_results.jsonl")
+    args = parser.parse_args()
+
+    result = run(args.operators, args.calls)
+    print(f"{args.operators:,} operators: {result['bytes_per_operator']:,.0f} bytes/operator")
+    print(f"{args.calls:,} queued calls: {result['bytes_per_call']:,.0f} bytes/call")
+    print(f"traced {result['traced'] / 2 ** 20:,.1f} MiB, peak {result['peak'] / 2 ** 20:,.1f} MiB")
+
+    with open(args.output, "a") as results:
+        results.write(json.dumps({
+            "mode": "memory", "commit": git_commit(), "timestamp": time.time(), "params": vars(args), **result
+        }) + "\n")
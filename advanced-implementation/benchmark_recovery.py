@@ -0,0 +1,121 @@
+"""
+Measure the Journal: append + group commit throughput, and restart time with and without a snapshot
+
+    1. journal "events" commands of a random workload on "tenants" call centers, fsyncing every "batch" commands
+    2. recover a fresh registry from the whole log
+    3. write a snapshot, journal "tail" more commands and recover again from snapshot + tail
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from call_center_registry import Call_center_registry
+from journal import Journal
+from journal import apply_command
+
+def workload(tenants, seed):
+    """ Yield (tenant, command, args) of an endless random call/answer/reject/hangup workload """
+    rnd = random.Random(seed)
+    next_call = 0
+
+    while True:
+        tenant = f"tenant-{rnd.randrange(tenants)}"
+        roll = rnd.random()
+        if roll < 0.35:
+            next_call += 1
+            yield tenant, "call", (f"{next_call}",)
+        elif roll < 0.6:
+            yield tenant, "answer", (rnd.choice("AB"),)
+        elif roll < 0.7:
+            yield tenant, "reject", (rnd.choice("AB"),)
+        else:
+            yield tenant, "hangup", (f"{rnd.randint(max(1, next_call - 20), max(1, next_call))}",)
+
+def journal_workload(registry, journal, commands, events, batch):
+    """ Apply commands and journal the "events" first ones that change something, committing every batch of them """
+    journaled = 0
+
+    for tenant, command, args in commands:
+        if journaled == events:
+            break
+        if apply_command(registry, tenant, command, args):
+            journal.append(tenant, command, *args)
+            journaled += 1
+            if journaled % batch == 0:
+                journal.commit()
+
+    journal.commit()
+    return journaled
+
+def recover(directory):
+    """ Recover a fresh registry, return (registry, replayed commands, seconds) """
+    registry = Call_center_registry(max_tenants=10 ** 9)
+    journal = Journal(directory)
+    start = time.perf_counter()
+    replayed = journal.recover(registry)
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return registry, replayed, elapsed
+
+def assert_same_state(recovered, registry, tolerance=1.0):
+    """
+    Assert that a recovered registry has the state of the one that was journaled
+
+    The call ages depend on when the states are taken and on the wall clock the journal maps back to the registry clock,
+    they only have to agree within tolerance seconds, every other field exactly
+    """
+    recovered_state = recovered.get_state()
+    state = registry.get_state()
+    assert recovered_state.keys() == state.keys()
+
+    for tenant, call_center_state in state.items():
+        recovered_ages = recovered_state[tenant].pop("call_ages")
+        ages = call_center_state.pop("call_ages")
+        assert recovered_state[tenant] == call_center_state, tenant
+        assert recovered_ages.keys() == ages.keys(), tenant
+        assert all(abs(recovered_ages[call_id] - age) <= tolerance for call_id, age in ages.items()), tenant
+
+def size(directory, name):
+    path = os.path.join(directory, name)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def run(events, tail, tenants, batch, seed):
+    directory = tempfile.mkdtemp(prefix="call-center-journal-")
+
+    try:
+        registry = Call_center_registry(max_tenants=10 ** 9)
+        journal = Journal(directory)
+        start = time.perf_counter()
+        journaled = journal_workload(registry, journal, workload(tenants, seed), events, batch)
+        elapsed = time.perf_counter() - start
+        print(f"journaled {journaled:,} commands in {elapsed:.2f}s ({journaled / elapsed:,.0f}/s, fsync every {batch}), log {size(directory, Journal.LOG_NAME) / 2 ** 20:.1f} MiB")
+
+        recovered, replayed, elapsed = recover(directory)
+        assert_same_state(recovered, registry)
+        print(f"full log recovery: {replayed:,} commands in {elapsed:.2f}s ({replayed / elapsed:,.0f}/s)")
+
+        start = time.perf_counter()
+        journal.write_snapshot(journal.get_sequence(), registry.get_state())
+        elapsed = time.perf_counter() - start
+        print(f"snapshot of {tenants} tenants written in {elapsed:.3f}s, {size(directory, Journal.SNAPSHOT_NAME) / 2 ** 10:.1f} KiB")
+
+        journaled = journal_workload(registry, journal, workload(tenants, seed + 1), tail, batch)
+        journal.close()
+        recovered, replayed, elapsed = recover(directory)
+        assert_same_state(recovered, registry)
+        print(f"snapshot + tail recovery: {replayed:,} commands in {elapsed:.3f}s")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--tail", type=int, default=10000)
+    parser.add_argument("--tenants", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    run(args.events, args.tail, args.tenants, args.batch, args.seed)
@@ -0,0 +1,102 @@
+"""
+Throughput of the sharded server (sharded_server.py) on loopback, from 1 to "max-shards" shards
+
+For every shard count the supervisor is started with as many shards and routers, and "clients" load processes
+each pipeline windows of "window" commands (a call and its hangup per tenant, over "tenants" tenants of their own) for "duration" seconds.
+The commands per second of every run and the speedup over one shard are printed and appended as JSON lines to "output", like benchmark.py.
+Scaling needs free cores: shards + routers + clients processes compete for them.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from benchmark import HERE
+from benchmark import git_commit
+from benchmark import wait_for_port
+
+def load(port, client, tenants, window, duration, results):
+    """ One load process: pipeline windows of commands on one connection, put the number of answered commands in results """
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    next_call = 0
+    answered = 0
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        lines = []
+        for _ in range(window // 2):
+            next_call += 1
+            tenant = f"load-{client}-{next_call % tenants}"
+            lines.append(json.dumps({"command": "call", "id": f"{next_call}", "tenant": tenant}))
+            lines.append(json.dumps({"command": "hangup", "id": f"{next_call}", "tenant": tenant}))
+        sock.sendall(("\n".join(lines) + "\n").encode())
+
+        expected = len(lines)
+        received = 0
+        while received < expected:
+            data = sock.recv(1 << 20)
+            if not data:
+                raise RuntimeError("server closed the connection")
+            received += data.count(b"\n")
+        answered += expected
+
+    sock.close()
+    results.put(answered)
+
+def run(shards, clients, tenants, window, duration, port, shard_port):
+    """ Start a sharded server with "shards" shards and routers, load it and return the commands per second """
+    server = subprocess.Popen([
+        sys.executable, os.path.join(HERE, "sharded_server.py"), "--port", f"{port}", "--shards", f"{shards}",
+        "--routers", f"{shards}", "--shard-port", f"{shard_port}", "--ring-timeout", "3600"
+    ])
+
+    try:
+        for shard in range(shards):
+            wait_for_port(shard_port + shard)
+        wait_for_port(port)
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=load, args=(port, client, tenants, window, duration, results)) for client in range(clients)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        answered = sum(results.get() for _ in processes)
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+        time.sleep(0.5)
+
+    return answered / elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=None, help="load processes, 2 per shard by default")
+    parser.add_argument("--tenants", type=int, default=100, help="tenants per load process")
+    parser.add_argument("--window", type=int, default=200, help="commands in flight per load process")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=5798)
+    parser.add_argument("--shard-port", type=int, default=5800)
+    parser.add_argument("--output", default="benchmark_results.jsonl")
+    args = parser.parse_args()
+
+    baseline = None
+    for shards in range(1, args.max_shards + 1):
+        clients = args.clients or 2 * shards
+        throughput = run(shards, clients, args.tenants, args.window, args.duration, args.port, args.shard_port)
+        baseline = baseline or throughput
+        print(f"{shards} shards, {clients} clients: {throughput:,.0f} commands/s, x{throughput / baseline:.2f}")
+
+        with open(args.output, "a") as results:
+            results.write(json.dumps({
+                "mode": "sharding", "commit": git_commit(), "timestamp": time.time(), "params": dict(vars(args), shards=shards, clients=clients),
+                "throughput": throughput, "speedup": throughput / baseline, "cpu_count": os.cpu_count()
+            }) + "\n")
@@ -0,0 +1,113 @@
+"""
+Compare the encodings of wire_codec: bytes per event and encode/decode throughput,
+then the server CPU time per command of every encoding, from the line (or frame) received to the response buffered
+
+Commands and their action dicts come from a Call_center driven with a random workload, so the mix of events is the real one
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import time
+from twisted.internet.testing import StringTransport
+import wire_codec
+from call_center import Call_center
+from call_center_queue import call_center_factory
+from call_center_queue import call_center_server
+
+def generate_workload(commands, seed):
+    """ Return a list of (command, id, responses) produced by a Call_center """
+    rnd = random.Random(seed)
+    call_center = Call_center([])
+    workload = []
+    next_call = 0
+
+    for _ in range(commands):
+        roll = rnd.random()
+        if roll < 0.4:
+            next_call += 1
+            command, id = "call", f"{next_call}"
+        elif roll < 0.6:
+            command, id = "answer", rnd.choice("AB")
+        elif roll < 0.75:
+            command, id = "reject", rnd.choice("AB")
+        else:
+            command, id = "hangup", f"{rnd.randint(max(1, next_call - 5), max(1, next_call))}"
+
+        responses = getattr(call_center, command)(id)
+        workload.append((command, id, responses))
+
+    return workload
+
+def measure(name, encode, decode, items):
+    """ Encode and decode every item, return bytes and timings """
+    start = time.perf_counter()
+    encoded = [encode(item) for item in items]
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in encoded:
+        decode(data)
+    decode_time = time.perf_counter() - start
+
+    return {
+        "name": name,
+        "bytes": sum(len(data) for data in encoded),
+        "encode_per_sec": len(items) / encode_time,
+        "decode_per_sec": len(items) / decode_time
+    }
+
+def run(commands, seed):
+    workload = generate_workload(commands, seed)
+    renderer = call_center_server()
+    events = sum(len(responses) for _, _, responses in workload)
+    command_items = [(command, id) for command, id, _ in workload]
+    response_items = [responses for _, _, responses in workload]
+
+    results = [
+        measure("json commands", lambda item: wire_codec.encode_json_command(*item), wire_codec.decode_json_command, command_items),
+        measure("binary commands", lambda item: wire_codec.encode_binary_command(*item), lambda data: wire_codec.decode_binary_command(data[2:]), command_items),
+        measure("json responses", lambda item: wire_codec.encode_json_response(renderer.generate_response(item)), wire_codec.decode_json_response, response_items),
+        measure("structured responses", wire_codec.encode_structured_response, wire_codec.decode_structured_response, response_items),
+        measure("binary responses", wire_codec.encode_binary_response, lambda data: wire_codec.decode_binary_response(data[2:]), response_items)
+    ]
+
+    print(f"{commands} commands, {events} events")
+    print(f"{'':22}{'bytes/cmd':>12}{'bytes/event':>14}{'encode/s':>14}{'decode/s':>14}")
+    for result in results:
+        per_event = f"{result['bytes'] / events:.1f}" if "responses" in result["name"] else "-"
+        print(f"{result['name']:22}{result['bytes'] / commands:12.1f}{per_event:>14}{result['encode_per_sec']:14,.0f}{result['decode_per_sec']:14,.0f}")
+
+    print()
+    print(f"{'server':22}{'us/cmd':>12}")
+    for encoding in wire_codec.ENCODINGS:
+        print(f"{encoding:22}{server_cpu(encoding, command_items) * 1e6:12.2f}")
+
+def server_cpu(encoding, command_items):
+    """ Return the CPU seconds per command of a server connection in encoding, the ring timeouts included and the network excluded """
+    factory = call_center_factory()
+    connection = factory.buildProtocol(None)
+    connection.makeConnection(StringTransport())
+
+    if encoding == "binary":
+        commands = [wire_codec.encode_binary_command(command, id) for command, id in command_items]
+    else:
+        commands = [wire_codec.encode_json_command(command, id) for command, id in command_items]
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if encoding != "json":
+            connection.dataReceived(wire_codec.encode_json_command("encoding", encoding))
+        start = time.process_time()
+        for data in commands:
+            connection.dataReceived(data)
+        elapsed = time.process_time() - start
+
+    return elapsed / len(commands)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commands", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    run(args.commands, args.seed)
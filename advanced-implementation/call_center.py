@@ -0,0 +1,657 @@
+import time
+from call_registry import Call_registry
+from records import NO_SKILLS, AVAILABLE, RINGING, BUSY, OFFLINE, STATUS_NAMES, STATUSES
+from operator_index import Operator_index
+from metrics import Call_center_metrics
+from snapshot import Versioned_map, Call_center_snapshot
+
+PRIORITIES = {"normal": 0, "callback": 60, "vip": 300}
+
+class Call_center():
+    """
+    Call_center is a class that composes the logic about call operations in a call center that have operators and a waiting queue
+
+    Operators can have skills and calls can require some (language, product, tier...): a call only rings for an operator that has
+    every skill it requires, or for the closest operators when nobody on the floor has them all (see Operator_index.eligible).
+    A waiting call does not hold back the calls behind it that other available operators can take.
+
+    Calls can have a priority, whose credit (seconds, see PRIORITIES) is taken off their arrival time: a "vip" call is queued as if it
+    had arrived 5 minutes earlier, so it overtakes the normal calls of the last 5 minutes but not the ones waiting for longer (aging).
+    A rejected call goes back to the queue with the same virtual arrival time, it does not lose its place.
+
+    Operators are A and B unless "operators" is given (a roster, see roster.py), and can be added, removed, logged out and in at runtime.
+    The call of an operator that is removed or logs out, ringing or in progress, goes back to the queue at its place.
+    A call center whose operators were provisioned or changed (skills, logged out) is never idle, evicting it would lose them.
+
+    With max_queue, a new call that would have to wait while max_queue calls are already waiting is refused ("queue_full"),
+    a call that can ring right away is always taken. Calls that go back to the queue (rejected, handed back) are never refused.
+
+    snapshot returns an immutable view of the queue and the operators for reporting, see Call_center_snapshot.
+    """
+
+    def __init__(self, queue, ring_timeout=10, name=None, clock=time.monotonic, max_rejections=None, priorities=None, operators=None, max_queue=None):
+        self.__name = name
+        self.__clock = clock
+        self.__priorities = dict(PRIORITIES if priorities is None else priorities)
+        self.__max_rejections = max_rejections
+        self.__max_queue = max_queue
+        self.__metrics = Call_center_metrics(clock)
+        self.__actions = self.__metrics.get_action_counts()
+        self.__queue = Call_registry([])
+        self.__provisioned = operators is not None
+        self.__operators = Operator_index(operators if operators is not None else [
+            Operator("A", None, AVAILABLE, None, max_rejections=max_rejections),
+            Operator("B", None, AVAILABLE, None, max_rejections=max_rejections)
+        ])
+        self.__ring_timeout = ring_timeout
+        self.__queue_view = Versioned_map()
+        self.__operators_view = Versioned_map()
+
+        self.__metrics.add_operators(self.__operators)
+        for call_id in queue:
+            self.add_to_queue(call_id)
+
+    def get_name(self):
+        """ Return the call center name (its tenant in a registry) """
+        return self.__name
+
+    def add_to_queue(self, call_id, skills=None, key=None, now=None):
+        """ Add a new call_id to the queue, requiring skills and with key (the ones it had before when None), queued since now (the clock when None) """
+        self.__queue.enqueue(call_id, skills, key, self.__clock() if now is None else now)
+
+    def has_call(self, call_id):
+        """ Return True if call_id is a live call (waiting, ringing or answered), a new call can not reuse its id until it ends """
+        return self.__queue.is_live(call_id)
+
+    def is_idle(self):
+        """ Return True if there is no waiting call, every operator is available (or offline) and the operators are the default ones, as they were """
+        return len(self.__queue) == 0 and self.__operators.all_available() and not self.__provisioned
+
+    def has_priority(self, priority):
+        """ Return True if priority is one of the call center priorities """
+        return priority in self.__priorities
+
+    def get_state(self):
+        """
+        Return a JSON-serializable copy of the ring timeout, the queue (in order) and the operators
+
+        The virtual arrival time of the calls is saved as their age ("call_ages", now minus the key), so it does not depend on the clock origin.
+        """
+        now = self.__clock()
+        return {
+            "ring_timeout": self.__ring_timeout,
+            "queue": list(self.__queue),
+            "call_skills": {call_id: sorted(skills) for call_id, skills in self.__queue.get_call_skills().items()},
+            "call_ages": {call_id: now - key for call_id, key in self.__queue.get_keys().items()},
+            "call_attempts": self.__queue.get_attempts(),
+            "operators": [op.get_state() for op in self.__operators],
+            "provisioned": self.__provisioned
+        }
+
+    def set_state(self, state, now=None):
+        """ Replace the ring timeout, the queue and the operators with a state returned by get_state at now (the clock when None) """
+        self.__ring_timeout = state["ring_timeout"]
+        now = self.__clock() if now is None else now
+        self.__queue = Call_registry(
+            state["queue"],
+            {call_id: frozenset(skills) for call_id, skills in state.get("call_skills", {}).items()},
+            {call_id: now - age for call_id, age in state.get("call_ages", {}).items()},
+            state.get("call_attempts"),
+            now
+        )
+        for op in self.__operators:
+            self.__metrics.remove_operator(op.get_op_id())
+        self.__operators = Operator_index([Operator.from_state(op_state, self.__max_rejections) for op_state in state["operators"]])
+        self.__provisioned = state.get("provisioned", False)
+
+        for op in self.__operators:
+            self.__metrics.add_operator(op.get_op_id(), op.get_status())
+            if op.get_call_id() is not None:
+                self.__queue.assign(op.get_call_id(), op)
+                if op.get_status() is BUSY:
+                    self.__queue.answered(op.get_call_id())
+
+    def snapshot(self):
+        """
+        Return a Call_center_snapshot of the queue order and the operator statuses and calls as they are now
+
+        Only the calls and operators that changed since the previous snapshot are copied (all of them the first time),
+        the snapshot is materialized by whoever reads it, so it can be serialized in another thread.
+        """
+        self.__queue_view.update(*self.__queue.take_changes())
+        self.__operators_view.update(*self.__operators.take_changes())
+        return Call_center_snapshot(self.__name, self.__clock(), self.__queue_view.version(), self.__operators_view.version())
+
+    def get_stats(self):
+        """ Return the metrics of the call center (see Call_center_metrics.get_state) """
+        return self.__metrics.get_state(len(self.__queue))
+
+    def get_operators(self):
+        """ Iterate over the operators in dispatch order """
+        return iter(self.__operators)
+
+    def set_ring_timeout(self, seconds):
+        """ Set how many seconds a call rings before it is ignored, for operators without their own ring timeout """
+        self.__ring_timeout = seconds
+
+    def get_ring_timeout(self, op_id=None):
+        """ Return the ring timeout of the operator, or the call center one if the operator has none """
+        op = self.find_operator(op_id)
+        if op is not None and op.get_ring_timeout() is not None:
+            return op.get_ring_timeout()
+        return self.__ring_timeout
+
+    def set_max_queue(self, calls):
+        """ Set how many calls can wait in the queue before new ones are refused, None for no limit """
+        self.__max_queue = calls
+
+    def get_max_queue(self):
+        """ Return how many calls can wait in the queue, or None """
+        return self.__max_queue
+
+    def find_operator(self, op_id):
+        """ Find the operator by id """
+        return self.__operators.find(op_id)
+
+    def set_operator_status(self, operator, status):
+        """ Set the operator status through the operator index """
+        self.__operators.set_status(operator, status)
+        self.__metrics.operator_status(operator.get_op_id(), status)
+
+    def set_operator_call(self, operator, call_id):
+        """
+        Set the current operator call, changing the operator status to "ringing" 
+        """
+        self.set_operator_status(operator, RINGING)
+        operator.set_call_id(call_id)
+        self.__queue.assign(call_id, operator)
+        self.__actions["ringing"] += 1
+        return {
+            "action": "ringing",
+            "call_id": call_id,
+            "operator_id": operator.get_op_id()
+        } # f"Call {call_id} ringing for operator {operator.get_op_id()}"
+    
+    def verify_queue(self):
+        """ 
+        Verify if the queue has a pending call and find an anvailable operator whose call_id has the lowest rejection among the others operators 
+            * Return 0 if there is a pending call but no operator available 
+            * Return 1 if there is a pending call and an operator is available with lowest rejection for the call_id, furthermore sets the call to operator
+            * Return 2 if there is no pending call
+
+        -> when there is more than one operator available (like A, B and C), if A recives a call and reject it, the call will be redirected to B witch has the lowest rejection on that call, ensuring that call will be answered.
+        -> the pending call is the first one in queue order (virtual arrival time) an available operator has the skills for
+        """
+
+        if len(self.__queue) > 0:
+            for record in self.__queue.heads():
+                op = self.__operators.best_operator(record.call_id, record.skills)
+
+                if op is not None:
+                    self.__queue.dequeue(record)
+                    self.__metrics.dequeued(record.enqueued_at)
+                    return self.set_operator_call(op, record.call_id)
+            return 0
+        return 2
+
+    def drain_queue(self):
+        """
+        Dispatch queued calls while there are pending calls and available operators, in one pass
+
+        return: responses = [f"Call {call_id} ringing for operator {operator_id}", ...]
+        """
+        responses = []
+
+        while len(self.__queue) > 0 and self.__operators.has_available():
+            result = self.verify_queue()
+            if result == 0:
+                break
+            responses.append(result)
+
+        return responses
+
+    def call(self, call_id, skills=None, priority=None, now=None):
+        """
+        Add the call_id to queue, requiring skills (names of operator skills) and with a priority of PRIORITIES (normal when None),
+        and verify if there is an operator available in "verify_queue"
+
+        now is when the call arrived (the clock when None), a journal replays calls at the time they were first received
+
+        call_id must not be a live call (see has_call): its record and operator would be taken over by the new one
+
+        return: reponses = [f"Call {call_id} recived", f"{message}"]
+
+        message can be:
+            -> f"Call {call_id} ringing for operator {operator_id}"
+            -> f"Call {call_id} waiting in queue, {ahead} calls ahead, estimated wait {estimated_wait:.0f}s"
+               (about how many calls will ring first, see Call_registry.ahead, and the seconds it should wait, see Call_center_metrics.estimate_wait,
+               None until a ring and a handle time were observed)
+            -> f"Call {call_id} rejected: queue full" (the call is dropped)
+        """
+
+        responses = []
+        self.__actions["recived"] += 1
+        responses.append({
+                "action": "recived",
+                "call_id": call_id
+            })  #f"Call {call_id} recived"
+        
+        now = self.__clock() if now is None else now
+        key = now - self.__priorities[priority] if priority is not None else now
+        self.add_to_queue(call_id, frozenset(skills) if skills else NO_SKILLS, key, now)
+        result = self.verify_queue()
+
+        if result == 0 and self.__max_queue is not None and len(self.__queue) > self.__max_queue:
+            self.__queue.remove(call_id)
+            self.__actions["queue_full"] += 1
+            responses.append({
+                "action": "queue_full",
+                "call_id": call_id
+            }) # f"Call {call_id} rejected: queue full"
+        elif result == 0:
+            self.__actions["waiting"] += 1
+            ahead = self.__queue.ahead(call_id)
+            responses.append({
+                "action": "waiting",
+                "call_id": call_id,
+                "ahead": ahead,
+                "estimated_wait": self.__metrics.estimate_wait(ahead)
+            }) # f"Call {call_id} waiting in queue, {ahead} calls ahead, estimated wait {estimated_wait:.0f}s"
+        else:
+            responses.append(result)
+        
+        return responses
+    
+    def answer(self, op_id):
+        """
+        Set the operator status to "busy" if its "ringing"
+
+        return: responses = [f"{message}"]
+
+        message can be: 
+            -> f"No calls for operator {operator_id}"
+            -> f"Operator {operator_id} is already in Call {call_id}"
+            -> f"Call {call_id} answered by operator {operator_id}"
+        """
+        response = []
+        op = self.find_operator(op_id)
+
+        if op.get_status() is AVAILABLE or op.get_status() is OFFLINE:
+            self.__actions["no_calls"] += 1
+            response.append({
+                "action": "no_calls",
+                "operator_id": op.get_op_id()
+            }) #f"No calls for operator {op.get_op_id()}"
+
+        elif op.get_status() is BUSY:
+            self.__actions["in_call"] += 1
+            response.append({
+                "action": "in_call",
+                "operator_id": op.get_op_id(),
+                "call_id": op.get_call_id()
+            }) #f"Operator {op.get_op_id()} is already in Call {op.get_call_id()}"
+
+        else:
+            self.set_operator_status(op, BUSY)
+            self.__queue.answered(op.get_call_id())
+            self.__actions["answered"] += 1
+            response.append({
+                "action": "answered",
+                "operator_id": op.get_op_id(),
+                "call_id": op.get_call_id()
+            }) # f"Call {op.get_call_id()} answered by operator {op.get_op_id()}"
+
+        return response
+            
+    
+    def reject(self, op_id):
+        """
+        Reject the current operator call if his status is "ringing", removing his call_id value, modifying his status to "available" and adding 1 into rejections dictionary for this call_id (the higher this value, the lower is the priority)
+
+        return: response = [f"{message}"]
+
+        message can be:
+            if the operator is "available"
+            -> f"No calls for operator {operator_id}"
+
+            if the operator is already "busy"
+            -> f"Operator {operator_id} can't reject a call in progress"
+
+            if the operator is "ringing"
+            -> f"Call {call_id} rejected by operator {operator_id}"
+        """
+        response = []
+        op = self.find_operator(op_id)
+
+        if op.get_status() is AVAILABLE or op.get_status() is OFFLINE:
+            self.__actions["no_calls"] += 1
+            response.append({
+                "action": "no_calls",
+                "operator_id": op.get_op_id(),  
+            }) # f"No calls for operator {op.get_op_id()}"
+
+        elif op.get_status() is BUSY:
+            self.__actions["in_call"] += 1
+            response.append({
+            "action": "in_call",
+            "operator_id": op.get_op_id(),
+            "call_id": op.get_call_id()
+        }) # f"Operator {op.get_op_id()} can't reject a call in progress"
+
+        else:
+            self.__actions["reject"] += 1
+            response.append({
+                "action": "reject",
+                "operator_id": op.get_op_id(),
+                "call_id": op.get_call_id()
+            }) # f"Call {op.get_call_id()} rejected by operator {op.get_op_id()}"
+            self.__queue.release(op.get_call_id())
+            self.add_to_queue(op.get_call_id())
+            self.set_operator_status(op, AVAILABLE)
+            self.__operators.add_rejection(op, op.get_call_id())
+            op.set_call_id(None)
+            response.extend(self.drain_queue())
+        
+        return response
+
+    def skills(self, op_id, skills=()):
+        """
+        Replace the skills of the operator, waiting calls it can now take ring for it if it is available
+
+        return: responses = [f"Operator {operator_id} skills {skills}", f"Call {call_id} ringing for operator {operator_id}", ...]
+        """
+        op = self.find_operator(op_id)
+        self.__operators.set_skills(op, skills)
+        self.__provisioned = True
+        self.__actions["skills"] += 1
+        responses = [{
+            "action": "skills",
+            "operator_id": op.get_op_id(),
+            "skills": sorted(op.get_skills())
+        }] # f"Operator {op_id} skills {skills}"
+        responses.extend(self.drain_queue())
+        return responses
+
+    def hand_back(self, operator):
+        """ Put the call of the operator (ringing or in progress) back in the queue at its place, return its call_id or None """
+        call_id = operator.get_call_id()
+
+        if call_id is not None:
+            self.__queue.release(call_id)
+            self.add_to_queue(call_id)
+            operator.set_call_id(None)
+
+        return call_id
+
+    def add_operator(self, op_id, skills=()):
+        """
+        Add an available operator after the existing ones, waiting calls ring for it
+
+        return: responses = [f"Operator {operator_id} added", f"Call {call_id} ringing for operator {operator_id}"]
+        """
+        op = Operator(op_id, None, AVAILABLE, None, max_rejections=self.__max_rejections, skills=skills)
+        self.__operators.add(op)
+        self.__metrics.add_operator(op_id, AVAILABLE)
+        self.__provisioned = True
+        self.__actions["operator_added"] += 1
+        responses = [{
+            "action": "operator_added",
+            "operator_id": op_id,
+            "skills": sorted(op.get_skills())
+        }] # f"Operator {op_id} added"
+        responses.extend(self.drain_queue())
+        return responses
+
+    def remove_operator(self, op_id):
+        """
+        Remove an operator, its call goes back to the queue and rings for another operator if one is available
+
+        return: responses = [f"Operator {operator_id} removed, call {call_id} back in queue", f"Call {call_id} ringing for operator {operator_id}"]
+        """
+        op = self.find_operator(op_id)
+        call_id = self.hand_back(op)
+        self.__operators.remove(op)
+        self.__metrics.remove_operator(op_id)
+        self.__provisioned = True
+        self.__actions["operator_removed"] += 1
+        response = {
+            "action": "operator_removed",
+            "operator_id": op_id
+        } # f"Operator {op_id} removed"
+        if call_id is not None:
+            response["call_id"] = call_id
+        responses = [response]
+        responses.extend(self.drain_queue())
+        return responses
+
+    def logout(self, op_id):
+        """
+        Take an operator off the floor ("offline"), its call goes back to the queue and rings for another operator if one is available
+
+        return: responses = [f"Operator {operator_id} logged out, call {call_id} back in queue", f"Call {call_id} ringing for operator {operator_id}"]
+        """
+        op = self.find_operator(op_id)
+        call_id = self.hand_back(op)
+        self.set_operator_status(op, OFFLINE)
+        self.__provisioned = True
+        self.__actions["logged_out"] += 1
+        response = {
+            "action": "logged_out",
+            "operator_id": op_id
+        } # f"Operator {op_id} logged out"
+        if call_id is not None:
+            response["call_id"] = call_id
+        responses = [response]
+        responses.extend(self.drain_queue())
+        return responses
+
+    def login(self, op_id):
+        """
+        Bring an offline operator back on the floor, waiting calls ring for it (an operator already logged in is left as it is)
+
+        return: responses = [f"Operator {operator_id} logged in", f"Call {call_id} ringing for operator {operator_id}"]
+        """
+        op = self.find_operator(op_id)
+        if op.get_status() is OFFLINE:
+            self.set_operator_status(op, AVAILABLE)
+        self.__actions["logged_in"] += 1
+        responses = [{
+            "action": "logged_in",
+            "operator_id": op_id
+        }] # f"Operator {op_id} logged in"
+        responses.extend(self.drain_queue())
+        return responses
+
+    def hangup(self, call_id):
+        """
+        Finish a call:
+            * if the call_id is in the queue, removes it from there
+            * if the call is in progress, removes call_id from operator and sets his status to "available"
+
+        return: response = [f"{message_1}", f"{message_2}"]
+
+        message_1 can be:
+            if the call is ringing or waiting:
+            -> f"Call {call_id} missed"
+
+            if the call was answered 
+            -> f"Call {call_id} finished and operator {operator_id} available"
+
+        message_2 can be:
+            if there is another call pending:
+            -> f"Call {call_id} ringing for operator {operator_id}" 
+
+            if ther is not another call pending:
+            -> None
+        """
+        response = []
+        self.__operators.forget_call(call_id)
+
+        if self.__queue.remove(call_id):
+            self.__metrics.abandoned()
+            self.__actions["missed"] += 1
+            response.append({
+                "action": "missed",
+                "call_id": call_id
+            }) # f"Call {call_id} missed"
+        else:
+            op = self.__queue.release(call_id)
+            if op is not None:
+                self.__queue.forget(call_id)
+                if op.get_status() is RINGING:
+                    self.__actions["missed"] += 1
+                    response.append({
+                        "action": "missed",
+                        "call_id": op.get_call_id()
+                    }) # f"Call {call_id} missed"
+                else:
+                    self.__actions["finished"] += 1
+                    response.append({
+                        "action": "finished",
+                        "operator_id": op.get_op_id(),
+                        "call_id": op.get_call_id()
+                    }) # f"Call {call_id} finished and operator {op.get_op_id()} available"
+                self.set_operator_status(op, AVAILABLE)
+                op.set_call_id(None)
+                response.extend(self.drain_queue())
+
+        return response
+    
+    def verify_ignored(self, call_id, operator_id):
+        """
+        End a call that rang for operator_id for its whole ring timeout without being answered, rejected or hung up
+
+        return: responses = [f"Call {call_id} ignored by operator {operator_id}", f"{message}"], or None if the operator is not ringing with call_id anymore
+        """
+        responses = []
+        op = self.find_operator(operator_id)
+
+        if op is not None and op.get_call_id() == call_id and op.get_status() is RINGING:
+            
+            self.__actions["ignored"] += 1
+            responses.append({
+                "action": "ignored",
+                "operator_id": op.get_op_id(),
+                "call_id": op.get_call_id()
+            }) # f"Call {call_id} ignored by operator {operator_id}"
+
+            self.__queue.release(call_id)
+            self.__queue.forget(call_id)
+            self.__operators.forget_call(call_id)
+            op.set_call_id(None)
+            self.set_operator_status(op, AVAILABLE)
+            responses.extend(self.drain_queue())
+
+            return responses
+
+class Operator():
+    """
+    Operator of a call center
+
+    Rejections are counted per call_id (as a string, the form they are saved in) for as long as the call lives, the call center forgets them when the call ends.
+    With max_rejections only that many calls are remembered, the least recently rejected one is forgotten first.
+    Skills are the tags (language, product, tier...) calls can require, their changes go through the Operator_index.
+
+    The status is a records.Status, its name is what get_state carries. Operators are slotted and an operator that never rejected
+    a call or has no skills shares None and NO_SKILLS instead of an empty dict and frozenset of its own, a roster of 100k operators is small.
+    """
+
+    __slots__ = ("__op_id", "__call_id", "__status", "__rejections", "__ring_timeout", "__max_rejections", "__skills")
+
+    def __init__(self, op_id, call_id, status, rejections, ring_timeout=None, max_rejections=None, skills=()):
+        self.__op_id = op_id
+        self.__call_id = call_id
+        self.__status = status
+        self.__rejections = rejections or None
+        self.__ring_timeout = ring_timeout
+        self.__max_rejections = max_rejections
+        self.__skills = frozenset(skills) if skills else NO_SKILLS
+
+    @classmethod
+    def from_state(cls, state, max_rejections=None):
+        """ Build an operator from a state returned by get_state """
+        return cls(
+            state["op_id"], state["call_id"], STATUSES[state["status"]], dict(state["rejections"]), state["ring_timeout"], max_rejections,
+            state.get("skills", ())
+        )
+
+    def get_state(self):
+        """ Return a JSON-serializable copy of the operator """
+        return {
+            "op_id": self.__op_id,
+            "call_id": self.__call_id,
+            "status": STATUS_NAMES[self.__status],
+            "rejections": dict(self.__rejections or {}),
+            "ring_timeout": self.__ring_timeout,
+            "skills": sorted(self.__skills)
+        }
+    
+    def get_op_id(self):
+        """ Return operator id """
+        return self.__op_id
+
+    def set_status(self, status):
+        """ Set operator status """
+        self.__status = status
+
+    def get_status(self):
+        """Return  operator status """
+        return self.__status
+    
+    def set_call_id(self, call_id):
+        """ Set the call id the operator is on """
+        self.__call_id = call_id
+
+    def get_call_id(self):
+        """ Return the call id the operator is on"""
+        return self.__call_id
+
+    def set_ring_timeout(self, seconds):
+        """ Set the operator own ring timeout, None to use the call center one """
+        self.__ring_timeout = seconds
+
+    def get_ring_timeout(self):
+        """ Return the operator own ring timeout, or None """
+        return self.__ring_timeout
+    
+    def set_skills(self, skills):
+        """ Set the operator skills """
+        self.__skills = frozenset(skills) if skills else NO_SKILLS
+
+    def get_skills(self):
+        """ Return the operator skills, a frozenset of skill names """
+        return self.__skills
+
+    def add_rejection(self, call_id):
+        """ Add 1 into the rejections of call_id, return the call_id forgotten to stay under max_rejections, or None """
+        evicted = None
+
+        key = f'{call_id}'
+
+        if self.__rejections is None:
+            self.__rejections = dict()
+
+        if key in self.__rejections:
+            self.__rejections[key] = self.__rejections.pop(key) + 1
+        else:
+            if self.__max_rejections is not None and len(self.__rejections) >= self.__max_rejections:
+                evicted = next(iter(self.__rejections))
+                del self.__rejections[evicted]
+            self.__rejections[key] = 1
+
+        return evicted
+
+    def forget_rejections(self, call_id):
+        """ Forget the rejections of call_id """
+        if self.__rejections is not None:
+            self.__rejections.pop(f'{call_id}', None)
+
+    def get_rejected_calls(self):
+        """ Return the call_ids this operator rejected at least once """
+        return list(self.__rejections) if self.__rejections is not None else []
+
+    def get_rejections(self, call_id):
+        if self.__rejections is not None and f'{call_id}' in self.__rejections:
+            return self.__rejections[f'{call_id}']
+        else:
+            return 0
@@ -0,0 +1,225 @@
+"""
+Asynchronous client library of the call center server
+
+    pool = Call_center_pool(TCP4ClientEndpoint(reactor, "localhost", 5678), size=4)
+    yield pool.connect()
+    responses = yield pool.call("42", tenant="acme")    # [{"action": "recived", ...}, {"action": "ringing", ...}]
+
+Every command returns a Deferred that fires with the action dicts of its response (or with the metrics for "stats"),
+or fails with Call_center_error when the server refuses it. Commands are pipelined: each one is written as soon as it is issued
+with a request id, and its Deferred is found from the request id of the response, so a connection can have any number of commands in flight.
+Under an asyncio reactor, Deferred.asFuture(loop) turns them into asyncio futures.
+
+The connections use the structured encoding, notifications the server sends on its own (a call ignored after a ring timeout)
+go to the "on_event" callback with their action dicts.
+"""
+
+import itertools
+import json
+import zlib
+from twisted.internet import defer
+from twisted.internet import reactor
+from twisted.internet.protocol import Factory
+from twisted.protocols.basic import LineReceiver
+import wire_codec
+
+class Call_center_error(Exception):
+    """ The server refused a command, the message is its error """
+
+
+class call_center_client(LineReceiver):
+    """
+    One pipelined connection to the server
+
+    It must only be used from the reactor thread, a thread that is not the reactor one goes through
+    reactor.callFromThread or threads.blockingCallFromThread (see call_command_interpreter).
+    """
+
+    delimiter = b"\n"
+    MAX_LENGTH = 2 ** 20
+
+    def __init__(self, on_event=None, on_lost=None):
+        self.on_event = on_event
+        self.on_lost = on_lost
+        self.pending = dict()
+        self.request_ids = itertools.count()
+
+    def connectionMade(self):
+        self.send("encoding", "structured").addErrback(lambda _: None)
+
+    def connectionLost(self, reason):
+        pending = self.pending
+        self.pending = dict()
+
+        for d in pending.values():
+            d.errback(reason)
+
+        if self.on_lost is not None:
+            self.on_lost(self)
+
+    def in_flight(self):
+        """ Return the number of commands waiting for their response """
+        return len(self.pending)
+
+    def send(self, command, id, tenant=None, skills=None, priority=None):
+        """ Send a command, return a Deferred of its result """
+        request_id = next(self.request_ids)
+        d = defer.Deferred()
+        self.pending[request_id] = d
+        self.transport.write(wire_codec.encode_json_command(command, id, tenant, request_id, skills, priority))
+        return d
+
+    def call(self, call_id, tenant=None, skills=None, priority=None):
+        return self.send("call", call_id, tenant, skills, priority)
+
+    def answer(self, operator_id, tenant=None):
+        return self.send("answer", operator_id, tenant)
+
+    def reject(self, operator_id, tenant=None):
+        return self.send("reject", operator_id, tenant)
+
+    def hangup(self, call_id, tenant=None):
+        return self.send("hangup", call_id, tenant)
+
+    def skills(self, operator_id, skills, tenant=None):
+        return self.send("skills", operator_id, tenant, skills)
+
+    def add_operator(self, operator_id, skills=None, tenant=None):
+        return self.send("add_operator", operator_id, tenant, skills)
+
+    def remove_operator(self, operator_id, tenant=None):
+        return self.send("remove_operator", operator_id, tenant)
+
+    def login(self, operator_id, tenant=None):
+        return self.send("login", operator_id, tenant)
+
+    def logout(self, operator_id, tenant=None):
+        return self.send("logout", operator_id, tenant)
+
+    def stats(self, tenant=None):
+        return self.send("stats", "", tenant)
+
+    def lineReceived(self, line):
+        data = json.loads(line)
+        d = self.pending.pop(data.get("request_id"), None)
+
+        if d is None:
+            if self.on_event is not None and data.get("responses"):
+                self.on_event(data["responses"])
+        elif "error" in data:
+            d.errback(Call_center_error(data["error"]))
+        elif "responses" in data:
+            d.callback(data["responses"])
+        elif "stats" in data:
+            d.callback(data["stats"])
+        else:
+            d.callback(data.get("response"))
+
+
+class call_center_client_factory(Factory):
+    """ Builds call_center_client connections with the same callbacks """
+
+    def __init__(self, on_event=None, on_lost=None):
+        self.on_event = on_event
+        self.on_lost = on_lost
+
+    def buildProtocol(self, addr):
+        p = call_center_client(self.on_event, self.on_lost)
+        p.factory = self
+        return p
+
+
+class Call_center_pool():
+    """
+    A pool of pipelined connections to the server, with the commands of call_center_client
+
+    Commands of a tenant always go through the same connection, so they reach the server in the order they were issued.
+    A lost connection fails its in-flight commands and is replaced after "reconnect_delay" seconds.
+    """
+
+    reconnect_delay = 1
+
+    def __init__(self, endpoint, size=1, on_event=None):
+        self.__endpoint = endpoint
+        self.__size = size
+        self.__on_event = on_event
+        self.__connections = [None] * size
+        self.__running = False
+
+    def __len__(self):
+        """ Return the number of live connections """
+        return sum(1 for connection in self.__connections if connection is not None)
+
+    def connect(self):
+        """ Open every connection, return a Deferred that fires with the pool once they are all open """
+        self.__running = True
+        return defer.gatherResults([self.open(slot) for slot in range(self.__size)], consumeErrors=True).addCallback(lambda _: self)
+
+    def open(self, slot):
+        """ Open the connection of a slot """
+        factory = call_center_client_factory(self.__on_event, lambda connection: self.lost(slot, connection))
+        return self.__endpoint.connect(factory).addCallback(self.opened, slot)
+
+    def opened(self, connection, slot):
+        self.__connections[slot] = connection
+        return connection
+
+    def lost(self, slot, connection):
+        if self.__connections[slot] is connection:
+            self.__connections[slot] = None
+        if self.__running:
+            reactor.callLater(self.reconnect_delay, self.reopen, slot)
+
+    def reopen(self, slot):
+        if self.__running and self.__connections[slot] is None:
+            self.open(slot).addErrback(lambda _: reactor.callLater(self.reconnect_delay, self.reopen, slot))
+
+    def close(self):
+        """ Close every connection """
+        self.__running = False
+        for connection in self.__connections:
+            if connection is not None:
+                connection.transport.loseConnection()
+
+    def connection_for(self, tenant):
+        """ Return the connection of tenant, commands fail with Call_center_error while it is being reconnected """
+        connection = self.__connections[zlib.crc32((tenant or "").encode()) % self.__size]
+        if connection is None:
+            raise Call_center_error("Not connected")
+        return connection
+
+    def send(self, command, id, tenant=None, skills=None, priority=None):
+        try:
+            return self.connection_for(tenant).send(command, id, tenant, skills, priority)
+        except Call_center_error as error:
+            return defer.fail(error)
+
+    def call(self, call_id, tenant=None, skills=None, priority=None):
+        return self.send("call", call_id, tenant, skills, priority)
+
+    def answer(self, operator_id, tenant=None):
+        return self.send("answer", operator_id, tenant)
+
+    def reject(self, operator_id, tenant=None):
+        return self.send("reject", operator_id, tenant)
+
+    def hangup(self, call_id, tenant=None):
+        return self.send("hangup", call_id, tenant)
+
+    def skills(self, operator_id, skills, tenant=None):
+        return self.send("skills", operator_id, tenant, skills)
+
+    def add_operator(self, operator_id, skills=None, tenant=None):
+        return self.send("add_operator", operator_id, tenant, skills)
+
+    def remove_operator(self, operator_id, tenant=None):
+        return self.send("remove_operator", operator_id, tenant)
+
+    def login(self, operator_id, tenant=None):
+        return self.send("login", operator_id, tenant)
+
+    def logout(self, operator_id, tenant=None):
+        return self.send("logout", operator_id, tenant)
+
+    def stats(self, tenant=None):
+        return self.send("stats", "", tenant)
@@ -0,0 +1,165 @@
+import time
+from collections import OrderedDict
+from call_center import Call_center
+from call_center import Operator
+from roster import paused_gc
+from records import STATUSES
+
+class Call_center_registry():
+    """
+    Call_center_registry is the long-lived server-side holder of many named call centers (tenants), shared by every connection
+
+    Tenants are created the first time a command names them and kept in least-recently-used order,
+    so "evict_idle" only has to look at the front of the registry to drop the tenants that have been idle for "max_idle" seconds.
+    A tenant is idle when it has no waiting call and all its operators are available, so evicting it loses no call.
+    Tenants provisioned from a roster (or whose operators changed at runtime) are never idle, see Call_center.is_idle.
+
+    The queue length limit of the tenants (see set_max_queue) is configuration, not state: it applies to the tenants created later too,
+    and the server sets it once the journal is recovered, so replaying calls that were taken never refuses them.
+    The ring timeouts of given tenants (see set_ring_timeouts) are set the same way, over the ones of the journal.
+    """
+
+    DEFAULT_TENANT = "default"
+
+    def __init__(self, max_tenants=10000, max_idle=300, ring_timeout=10, clock=time.monotonic, max_rejections=None):
+        self.__tenants = OrderedDict()
+        self.__last_used = dict()
+        self.__max_tenants = max_tenants
+        self.__max_idle = max_idle
+        self.__ring_timeout = ring_timeout
+        self.__clock = clock
+        self.__max_rejections = max_rejections
+        self.__max_queue = None
+        self.__max_queues = dict()
+        self.__ring_timeouts = dict()
+
+    def __len__(self):
+        """ Return the number of live tenants """
+        return len(self.__tenants)
+
+    def __contains__(self, tenant):
+        return tenant in self.__tenants
+
+    def items(self):
+        """ Iterate over (tenant, call center) pairs, least recently used first """
+        return iter(self.__tenants.items())
+
+    def get_state(self):
+        """ Return a JSON-serializable copy of every tenant, see Call_center.get_state """
+        return {tenant: call_center.get_state() for tenant, call_center in self.__tenants.items()}
+
+    def set_state(self, state, now=None):
+        """ Replace every tenant with a state returned by get_state at now (a clock reading, the clock when None), see Call_center.set_state """
+        self.__tenants.clear()
+        self.__last_used.clear()
+        used = self.__clock()
+
+        for tenant, call_center_state in state.items():
+            self.create(tenant).set_state(call_center_state, now)
+            self.__last_used[tenant] = used
+
+    def get_clock(self):
+        """ Return the clock of the registry and its call centers """
+        return self.__clock
+
+    def find(self, tenant):
+        """ Return the call center of tenant without creating it or marking it used, or None """
+        return self.__tenants.get(tenant)
+
+    def get(self, tenant):
+        """
+        Return the call center of tenant, creating it if needed
+
+        return None when the registry is full and no idle tenant can be evicted to make room
+        """
+        call_center = self.__tenants.get(tenant)
+
+        if call_center is None:
+            if len(self.__tenants) >= self.__max_tenants and not self.evict_lru():
+                return None
+            call_center = self.create(tenant)
+        else:
+            self.__tenants.move_to_end(tenant)
+
+        self.__last_used[tenant] = self.__clock()
+        return call_center
+
+    def create(self, tenant, operators=None):
+        """ Create the call center of a new tenant, with operators (the default ones when None) """
+        call_center = Call_center(
+            [], self.__ring_timeouts.get(tenant, self.__ring_timeout), tenant, self.__clock, self.__max_rejections, operators=operators,
+            max_queue=self.__max_queues.get(tenant, self.__max_queue)
+        )
+        self.__tenants[tenant] = call_center
+        return call_center
+
+    def set_max_queue(self, max_queue=None, tenants=None):
+        """ Limit the queue of every tenant to max_queue waiting calls, and of the tenants of {tenant: calls} to their own, None for no limit """
+        self.__max_queue = max_queue
+        self.__max_queues = dict(tenants or {})
+
+        for tenant, call_center in self.__tenants.items():
+            call_center.set_max_queue(self.__max_queues.get(tenant, max_queue))
+
+    def set_ring_timeouts(self, tenants):
+        """ Give the tenants of {tenant: seconds} their own ring timeout instead of the registry one, the ones created later too """
+        self.__ring_timeouts = dict(tenants)
+
+        for tenant, call_center in self.__tenants.items():
+            if tenant in self.__ring_timeouts:
+                call_center.set_ring_timeout(self.__ring_timeouts[tenant])
+
+    def provision(self, entries):
+        """ Create the call centers of the roster entries (see roster.py) with their operators, return the number of tenants """
+        operators = dict()
+        now = self.__clock()
+
+        with paused_gc():
+            for entry in entries:
+                operators.setdefault(entry["tenant"] or self.DEFAULT_TENANT, []).append(Operator(
+                    entry["op_id"], None, STATUSES[entry["status"]], None, entry["ring_timeout"], self.__max_rejections, entry["skills"]
+                ))
+
+            for tenant, tenant_operators in operators.items():
+                self.create(tenant, tenant_operators)
+                self.__tenants.move_to_end(tenant)
+                self.__last_used[tenant] = now
+
+        return len(operators)
+
+    def evict_lru(self):
+        """ Evict the least recently used idle tenant, return True if one was evicted """
+        for tenant, call_center in self.__tenants.items():
+            if call_center.is_idle():
+                self.evict(tenant)
+                return True
+        return False
+
+    def evict(self, tenant):
+        """ Drop a tenant """
+        del self.__tenants[tenant]
+        del self.__last_used[tenant]
+
+    def evict_idle(self):
+        """
+        Evict every idle tenant not used for max_idle seconds
+
+        Tenants that expired but still have calls are moved to the back, so each one is looked at once per pass
+        """
+        deadline = self.__clock() - self.__max_idle
+        evicted = 0
+
+        for _ in range(len(self.__tenants)):
+            tenant, call_center = next(iter(self.__tenants.items()))
+
+            if self.__last_used[tenant] > deadline:
+                break
+
+            if call_center.is_idle():
+                self.evict(tenant)
+                evicted += 1
+            else:
+                self.__tenants.move_to_end(tenant)
+                self.__last_used[tenant] = self.__clock()
+
+        return evicted
@@ -0,0 +1,745 @@
+"""
+The call center server without its network backend: what every connection does with the commands it reads (Command_handler)
+and what the connections share (Call_center_service), for the Twisted server (call_center_queue.py) and the asyncio one (asyncio_server.py)
+
+Nothing here imports an event loop. A backend subclasses Call_center_service with its timers and threads:
+
+    schedule(delay, callback, *args)        a ring timeout, returns a handle with cancel()
+    call_later(delay, callback, *args)      any other timer, returns a handle with cancel()
+    run_in_thread(function, args, done)     run function(*args) in a thread, then done(result) in the loop
+
+and mixes Command_handler into a protocol with the LineReceiver interface: dataReceived/lineReceived/rawDataReceived,
+setRawMode, pauseProducing/resumeProducing, a transport with write, and register_producer for the feed of a subscribed connection.
+"""
+
+import argparse
+import cProfile
+import os
+import time
+from call_center_registry import Call_center_registry
+from journal import Journal
+from roster import read_roster
+from records import RINGING
+from admission import Token_bucket
+from admission import Lag_monitor
+from tracing import Tracer
+import tracing
+from event_feed import Event_feed
+from event_feed import event_subscriber
+from history import History
+import metrics
+import wire_codec
+
+OPERATOR_COMMANDS = ("answer", "reject", "skills", "remove_operator", "login", "logout")
+
+class Command_handler():
+    """
+    Newline-delimited JSON protocol: every command is a JSON object followed by "\n" and every response is sent back the same way
+
+    Many commands can be pipelined in one read, they are processed in order and their responses are written with a single transport.write.
+    A JSON command can carry a "request_id" (any JSON value), it is copied into its response so clients can match them,
+    responses without one are notifications (a call ignored after a ring timeout)
+
+    A client can switch the connection to another encoding (see wire_codec) by sending {"command": "encoding", "id": "structured" or "binary"} as a JSON line,
+    the server confirms it in JSON and every following response is sent in that encoding (and every following byte in both directions is binary for "binary").
+    The structured encoding sends the action dicts as they are, no English text is rendered for it
+
+    Every command names the tenant (call center) it acts on, commands without one go to the default tenant.
+    Tenants live in the factory registry, so every connection sees the same call centers.
+
+    {"command": "stats", "id": "", "tenant": ...} answers with the tenant metrics, as text in "response" and as data in "stats" (JSON encoding only)
+
+    {"command": "call", "id": ..., "skills": ["es", "gold"], "priority": "vip"} requires operator skills for the call and queues it with a priority,
+    {"command": "skills", "id": <operator id>, "skills": [...]} replaces the skills of an operator (see Call_center)
+
+    {"command": "add_operator", "id": <operator id>, "skills": [...]}, "remove_operator", "login" and "logout" provision the operators at runtime,
+    the call of an operator that is removed or logs out goes back to the queue
+
+    {"command": "subscribe", "id": <operator ids, comma separated, or "">, "tenant": ...} turns the connection into a read-only feed of the tenant events,
+    every event of the tenant (or of those operators) is sent as it happens, whichever connection caused it (see Event_feed)
+
+    A connection that sends commands faster than the factory "command_rate" (with bursts of "command_burst") is not read
+    until its token bucket is out of debt, and no connection is read while the event loop is overloaded (see admission.py).
+    Reading is paused for as long as any of those reasons holds, the commands already received are still answered.
+
+    Admin commands:
+        {"command": "trace", "id": <N or "off">} samples the stage timings of one command out of N into the factory Tracer (see tracing.py)
+        {"command": "spans", "id": <count or "">} answers with the per-stage summary of the sampled spans and the last count spans ("spans", JSON only)
+        {"command": "profile", "id": <seconds>} runs cProfile on the server for that many seconds, then dumps it in the factory profile_dir
+        {"command": "snapshot", "id": "", "tenant": ...} answers with the queue and the operators of the tenant at that point ("snapshot", JSON only),
+            serialized in a thread, so its response can come after the ones of the commands that follow it
+
+    The factory of a connection is its Call_center_service.
+    """
+
+    delimiter = b"\n"
+
+    def connectionMade(self):
+        self.registry = self.factory.registry
+        self.pending_responses = []
+        self.encoding = "json"
+        self.raw_buffer = b""
+        self.subscriber = None
+        self.request_id = None
+        self.span = None
+        self.paused_by = set()
+        self.throttle_timer = None
+        self.bucket = self.factory.command_bucket()
+        self.factory.connections.add(self)
+
+        if self.factory.is_overloaded():
+            self.pause_reading("lag")
+
+    def connectionLost(self, reason):
+        self.factory.connections.discard(self)
+        if self.throttle_timer is not None:
+            self.throttle_timer.cancel()
+            self.throttle_timer = None
+
+        if self.subscriber is not None:
+            self.factory.feed.unsubscribe(self.subscriber)
+            self.subscriber = None
+
+    def dataReceived(self, data):
+        super().dataReceived(data)
+        self.flushResponses()
+
+    def lineReceived(self, line):
+        if not line.strip():
+            return
+
+        tracer = self.factory.tracer
+        span = self.span = tracer.start() if tracer is not None else None
+
+        try:
+            command, id, tenant, self.request_id, options = wire_codec.decode_json_command(line)
+        except (ValueError, TypeError, KeyError):
+            self.span = None
+            self.sendError("Invalid command")
+            return
+
+        if span is not None:
+            span.mark("decode")
+
+        try:
+            self.dispatch(tenant, command, id, options)
+        finally:
+            self.request_id = None
+
+        if span is not None:
+            self.span = None
+            tracer.finish(span, command, tenant)
+
+        if self.bucket is not None:
+            self.throttle(self.bucket.take())
+
+    def dispatch(self, tenant, command, id, options=None):
+        """ Run a JSON command, its responses carry the request id of the line """
+        if self.subscriber is not None:
+            self.sendError("Subscribed connections are read-only")
+        elif command == "encoding":
+            self.set_encoding(id)
+        elif command == "subscribe":
+            self.subscribe(tenant, id)
+        elif command == "stats":
+            self.send_stats(tenant)
+        elif command == "trace":
+            self.set_tracing(id)
+        elif command == "spans":
+            self.send_spans(id)
+        elif command == "profile":
+            self.start_profile(id)
+        elif command == "snapshot":
+            self.send_snapshot(tenant)
+        else:
+            self.execute(tenant, command, id, options)
+
+    def rawDataReceived(self, data):
+        frames, self.raw_buffer = wire_codec.split_frames(self.raw_buffer + data)
+
+        tracer = self.factory.tracer
+
+        for frame in frames:
+            span = self.span = tracer.start() if tracer is not None else None
+            try:
+                command, id, tenant = wire_codec.decode_binary_command(frame)
+            except wire_codec.Codec_error:
+                self.span = None
+                self.sendError("Invalid command")
+                continue
+            if span is not None:
+                span.mark("decode")
+
+            self.execute(tenant, command, id)
+
+            if span is not None:
+                self.span = None
+                tracer.finish(span, command, tenant)
+
+        if self.bucket is not None and frames:
+            self.throttle(self.bucket.take(len(frames)))
+
+    #----/ flow control /----
+
+    def throttle(self, delay):
+        """ Stop reading the connection for delay seconds, the time its token bucket needs to get out of debt """
+        if delay > 0 and "rate" not in self.paused_by:
+            self.pause_reading("rate")
+            self.throttle_timer = self.factory.call_later(delay, self.throttled)
+
+    def throttled(self):
+        self.throttle_timer = None
+        self.resume_reading("rate")
+
+    def pause_reading(self, reason):
+        """ Stop reading the connection until resume_reading is called with every reason it was paused for """
+        if not self.paused_by:
+            self.pauseProducing()
+        self.paused_by.add(reason)
+
+    def resume_reading(self, reason):
+        """ Drop a reason to pause, reading resumes (with the lines already buffered) when none is left """
+        if reason not in self.paused_by:
+            return
+
+        self.paused_by.discard(reason)
+        if not self.paused_by:
+            self.resumeProducing()
+
+    #----/ commands /----
+
+    def set_encoding(self, encoding):
+        """ Switch the connection encoding, the confirmation is the last JSON line sent """
+        if encoding not in wire_codec.ENCODINGS:
+            self.sendError(f"Unknown encoding {encoding}")
+            return
+
+        self.sendResponse({"response": f"Encoding {encoding}"})
+        self.encoding = encoding
+
+        if encoding == "binary":
+            self.setRawMode()
+
+    def subscribe(self, tenant, operators):
+        """ Make the connection a feed of the tenant events, of every operator or of the comma separated operator ids """
+        tenant = tenant or self.registry.DEFAULT_TENANT
+        operators = set(operators.split(",")) if operators else None
+
+        self.sendResponse({"response": f"Subscribed to {tenant}"})
+        self.subscriber = event_subscriber(self.transport, tenant, operators, self.factory.max_feed_backlog)
+        self.register_producer(self.subscriber)
+        self.factory.feed.subscribe(self.subscriber)
+
+    def send_stats(self, tenant):
+        """ Send the metrics of a tenant """
+        call_center = self.registry.find(tenant or self.registry.DEFAULT_TENANT)
+
+        if call_center is None:
+            self.sendError(f"Unknown tenant {tenant}")
+        else:
+            stats = call_center.get_stats()
+            self.sendResponse({"response": metrics.format_stats(stats), "stats": stats})
+
+    def set_tracing(self, every):
+        """ Sample one command out of every into a new Tracer, "off" (or 0) stops tracing """
+        try:
+            every = 0 if every == "off" else int(every)
+        except ValueError:
+            self.sendError(f"Invalid sampling {every}")
+            return
+
+        self.factory.set_tracing(every)
+        self.sendResponse({"response": f"Tracing 1 command out of {every}" if every > 0 else "Tracing off"})
+
+    def send_spans(self, count):
+        """ Send the stage summary of the sampled spans and the last count of them """
+        tracer = self.factory.tracer
+
+        if tracer is None:
+            self.sendError("Tracing is off")
+        else:
+            self.sendResponse({
+                "response": tracing.format_summary(tracer.get_summary()),
+                "summary": tracer.get_summary(),
+                "spans": tracer.get_spans(int(count) if count.isdigit() else 10)
+            })
+
+    def start_profile(self, seconds):
+        """ Profile the server for a few seconds (at most the factory max_profile), the response names the file the profile is dumped to """
+        try:
+            seconds = float(seconds)
+        except ValueError:
+            self.sendError(f"Invalid duration {seconds}")
+            return
+
+        if not 0 < seconds <= self.factory.max_profile:
+            self.sendError(f"Invalid duration {seconds:g}, profiles last up to {self.factory.max_profile:g} seconds")
+            return
+
+        path = self.factory.start_profile(seconds)
+        if path is None:
+            self.sendError("A profile is already running")
+        else:
+            self.sendResponse({"response": f"Profiling for {seconds:g} seconds into {path}"})
+
+    def send_snapshot(self, tenant):
+        """ Send a Call_center_snapshot of the tenant, encoded in a thread while the event loop keeps serving commands """
+        call_center = self.registry.find(tenant or self.registry.DEFAULT_TENANT)
+
+        if call_center is None:
+            self.sendError(f"Unknown tenant {tenant}")
+            return
+
+        request_id = self.request_id
+        self.factory.run_in_thread(encode_snapshot, (call_center.snapshot(), request_id), lambda data: self.snapshot_encoded(data, request_id))
+
+    def snapshot_encoded(self, data, request_id):
+        if self not in self.factory.connections:
+            return
+
+        if data is None:
+            self.request_id = request_id
+            self.sendError("Snapshot failed")
+            self.request_id = None
+        else:
+            self.pending_responses.append(data)
+        self.flushResponses()
+
+    def execute(self, tenant, command, id, options=None):
+        """
+        Run a command on the tenant call center, journal it and send back its responses
+
+        options can have the "skills" a call requires or an operator has, and the "priority" of a call
+        """
+        tenant = tenant or self.registry.DEFAULT_TENANT
+        call_center = self.registry.get(tenant)
+        responses = []
+        skills = priority = None
+        if options:
+            skills = options.get("skills")
+            priority = options.get("priority")
+
+        if call_center is None:
+            self.sendError("Tenant limit reached")
+            return
+
+        if priority is not None and not call_center.has_priority(priority):
+            self.sendError(f"Unknown priority {priority}")
+            return
+
+        if command in OPERATOR_COMMANDS and call_center.find_operator(id) is None:
+            self.sendError(f"Unknown operator {id}")
+            return
+
+        if command == "add_operator" and call_center.find_operator(id) is not None:
+            self.sendError(f"Operator {id} already exists")
+            return
+
+        if command == "call" and call_center.has_call(id):
+            self.sendError(f"Call {id} already exists")
+            return
+
+        if command == "call":
+            responses = call_center.call(id, skills, priority)
+        elif command == "answer":
+            responses = call_center.answer(id)
+        elif command == "reject":
+            responses = call_center.reject(id)
+        elif command == "hangup":
+            responses = call_center.hangup(id)
+        elif command == "skills":
+            responses = call_center.skills(id, skills or ())
+        elif command == "add_operator":
+            responses = call_center.add_operator(id, skills or ())
+        elif command in ("remove_operator", "login", "logout"):
+            responses = getattr(call_center, command)(id)
+
+        if self.span is not None:
+            self.span.mark("dispatch")
+
+        if responses and responses[-1]["action"] != "queue_full":
+            if command == "call" and (skills or priority is not None):
+                self.factory.journal_command(tenant, command, id, skills, priority)
+            elif command in ("skills", "add_operator") and skills:
+                self.factory.journal_command(tenant, command, id, skills)
+            else:
+                self.factory.journal_command(tenant, command, id)
+
+        if self.span is not None:
+            self.span.mark("journal")
+        self.sendActions(call_center, responses)
+
+    def sendActions(self, call_center, responses):
+        """ Start or cancel the ring timeouts of the responses and buffer them in the connection encoding """
+        for obj in responses:
+            if obj["action"] == "ringing":
+                self.time_out(call_center, obj['call_id'], obj['operator_id'])
+            elif obj["action"] in self.factory.RING_ENDING_ACTIONS:
+                self.factory.cancel_ring_timer(call_center, obj.get('call_id'))
+        self.factory.publish(call_center, responses)
+
+        span = self.span
+        if span is not None:
+            span.mark("timers")
+
+        if self.encoding == "binary":
+            try:
+                self.pending_responses.append(wire_codec.encode_binary_response(responses))
+            except wire_codec.Codec_error:
+                self.sendError("Responses too long for a binary frame")
+        elif self.encoding == "structured":
+            self.pending_responses.append(wire_codec.encode_structured_response(responses, self.request_id))
+        else:
+            self.sendResponse(self.generate_response(responses))
+
+        if span is not None:
+            span.mark("render")
+
+    def sendError(self, message):
+        """ Buffer an error, binary and structured connections get an empty response so every command still has one """
+        if self.encoding == "binary":
+            self.pending_responses.append(wire_codec.encode_binary_response([]))
+        elif self.encoding == "structured":
+            self.sendResponse({"responses": [], "error": message})
+        else:
+            self.sendResponse({"response": message})
+
+    def sendResponse(self, data):
+        """ Buffer a JSON response until flushResponses writes it, with the request id of the command if it had one """
+        if self.request_id is not None:
+            data["request_id"] = self.request_id
+        self.pending_responses.append(wire_codec.encode_json_response(data))
+
+    def flushResponses(self):
+        """ Write every buffered response in one transport.write, once the journal has the commands that produced them """
+        if self.pending_responses:
+            data = b"".join(self.pending_responses)
+            self.pending_responses = []
+            self.factory.after_durable(self.transport.write, data)
+
+    def generate_response(self, responses):
+        """ Render action dicts as the English lines of a JSON response """
+        return {"response": wire_codec.render_text(responses)}
+
+    def time_out(self, call_center, call_id, operator_id):
+        """ Start the ring timeout of call_id, the "ignored" result comes back to this connection """
+        self.factory.start_ring_timer(call_center, call_id, operator_id, self.ignored_result)
+
+    def ignored_result(self, result, call_center):
+        if result:
+            self.sendActions(call_center, result)
+            self.flushResponses()
+
+class Call_center_service():
+    """
+    Call_center_service is what the connections of a server share: one Call_center_registry, the ring timeouts, the journal and the event feed
+
+    One ring timeout per ringing call, cancelled as soon as the call is answered, rejected, missed or finished.
+
+    With a Journal, every state-changing command is appended to it and responses are only written once their batch is fsynced.
+    Batches are written in a thread one at a time, commands that arrive meanwhile are grouped in the next batch,
+    and the backend requests a snapshot with a batch every "snapshot_interval" seconds
+
+    Every response is published to the subscribers of its tenant once it is durable, each subscriber buffers at most "max_feed_backlog" events.
+    With a History (see history.py) the call lifecycle events are also recorded as they are published, stamped with the wall clock,
+    and the backend flushes it every "history_interval" seconds
+
+    With a Tracer (see set_tracing) the connections sample the stage timings of the commands, and start_profile runs cProfile
+    for a few seconds (at most "max_profile") and dumps it in "profile_dir"
+
+    Every connection gets a token bucket of "command_rate" commands per second and "command_burst" commands (no limit when command_rate is None),
+    and the backend checks the event loop lag every "lag_interval" seconds: while it is "max_lag" seconds or more, no connection is read (None never pauses).
+    The backend also evicts the idle tenants of the registry every "eviction_interval" seconds.
+    """
+
+    eviction_interval = 60
+    snapshot_interval = 60
+    history_interval = 1
+    max_feed_backlog = 1000
+    command_rate = None
+    command_burst = 100
+    lag_interval = 0.1
+    max_lag = 0.5
+    trace_buffer = 1000
+    profile_dir = "."
+    max_profile = 300
+    RING_ENDING_ACTIONS = ("answered", "reject", "missed", "finished", "operator_removed", "logged_out")
+
+    def __init__(self, registry=None, journal=None):
+        self.registry = registry if registry is not None else Call_center_registry()
+        self.journal = journal
+        self.ring_timers = dict()
+        self.feed = Event_feed()
+        self.history = None
+        self.committing = False
+        self.commit_waiters = []
+        self.snapshot_requested = False
+        self.connections = set()
+        self.lag_monitor = None
+        self.tracer = None
+        self.trace_hooks = []
+        self.stage_hooks = []
+        self.profiler = None
+
+    def schedule(self, delay, callback, *args):
+        """ Call callback(*args) in delay seconds for a ring timeout, return a handle with cancel() """
+        raise NotImplementedError
+
+    def call_later(self, delay, callback, *args):
+        """ Call callback(*args) in delay seconds, return a handle with cancel() """
+        raise NotImplementedError
+
+    def run_in_thread(self, function, args, done):
+        """ Run function(*args) in a thread, then done(result) in the event loop (done(None) if it raised, the error is logged) """
+        raise NotImplementedError
+
+    #----/ overload /----
+
+    def command_bucket(self):
+        """ Return the token bucket of a new connection, or None without a command rate """
+        if self.command_rate is None:
+            return None
+        return Token_bucket(self.command_rate, self.command_burst)
+
+    def start_lag_monitor(self):
+        """ Start measuring the lag, return False if it is not monitored (max_lag None), the backend then calls check_lag every lag_interval """
+        if self.max_lag is None:
+            return False
+        self.lag_monitor = Lag_monitor(self.lag_interval, self.max_lag)
+        return True
+
+    def is_overloaded(self):
+        """ Return True while the event loop lags, connections are not read meanwhile """
+        return self.lag_monitor is not None and self.lag_monitor.is_overloaded()
+
+    def check_lag(self):
+        """ Pause reading every connection when the event loop starts lagging, resume them when it caught up """
+        if not self.lag_monitor.check():
+            return
+
+        if self.lag_monitor.is_overloaded():
+            print(f"Event loop {self.lag_monitor.get_lag():.3f}s late, pausing {len(self.connections)} connections")
+            for connection in list(self.connections):
+                connection.pause_reading("lag")
+        else:
+            print("Event loop caught up, resuming connections")
+            for connection in list(self.connections):
+                connection.resume_reading("lag")
+
+    #----/ tracing /----
+
+    def set_tracing(self, every):
+        """
+        Sample one command out of every into a new Tracer of "trace_buffer" spans, no tracing when every is 0
+
+        The hooks of the service (see add_trace_hook and add_stage_hook) are the ones of every Tracer it makes, they are kept while tracing is off
+        """
+        self.tracer = Tracer(every, self.trace_buffer, hooks=self.trace_hooks, stage_hooks=self.stage_hooks) if every > 0 else None
+
+    def add_trace_hook(self, hook):
+        """ Call hook(span) with every finished span, see Tracer.add_hook """
+        self.trace_hooks.append(hook)
+
+    def add_stage_hook(self, hook):
+        """ Call hook(stage, seconds) whenever a stage of a sampled command ends, see Tracer.add_stage_hook """
+        self.stage_hooks.append(hook)
+
+    def start_profile(self, seconds):
+        """ Run cProfile for seconds and dump it in profile_dir, return the path of the dump or None if a profile is already running """
+        if self.profiler is not None:
+            return None
+
+        path = os.path.abspath(os.path.join(self.profile_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.pstats"))
+        self.call_later(seconds, self.stop_profile, path)
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return path
+
+    def stop_profile(self, path):
+        profiler = self.profiler
+        profiler.disable()
+        self.profiler = None
+        print(f"Profile dumped to {path}\n{tracing.profile_report(profiler, path)}")
+
+    #----/ journal /----
+
+    def recover(self):
+        """ Rebuild the registry from the journal and restart the ring timeouts of the ringing calls """
+        replayed = self.journal.recover(self.registry)
+
+        for tenant, call_center in self.registry.items():
+            for op in call_center.get_operators():
+                if op.get_status() is RINGING:
+                    self.start_ring_timer(call_center, op.get_call_id(), op.get_op_id(), self.orphan_ignored_result)
+
+        return replayed
+
+    def orphan_ignored_result(self, result, call_center):
+        """ Handle an "ignored" result that has no connection to report to, only its ring timeouts and subscribers matter """
+        self.publish(call_center, result or [])
+        for obj in result or []:
+            if obj["action"] == "ringing":
+                self.start_ring_timer(call_center, obj["call_id"], obj["operator_id"], self.orphan_ignored_result)
+
+    def journal_command(self, tenant, command, *args):
+        """ Append a state-changing command to the journal, if there is one """
+        if self.journal is not None:
+            self.journal.append(tenant, command, *args)
+
+    def after_durable(self, callback, *args):
+        """ Call callback(*args) once every command journaled so far is on disk, right away if there is nothing to write """
+        if self.journal is None or (not self.committing and not self.journal.has_pending()):
+            callback(*args)
+            return
+
+        self.commit_waiters.append((callback, args))
+        self.commit()
+
+    def request_snapshot(self):
+        """ Write a snapshot with the next batch """
+        self.snapshot_requested = True
+        self.commit()
+
+    def commit(self):
+        """ Write the pending journal batch (and snapshot) in a thread, unless a batch is already being written """
+        if self.committing:
+            return
+
+        snapshot = None
+        if self.snapshot_requested:
+            snapshot = (self.journal.get_sequence(), self.registry.get_state(), self.journal.get_time())
+            self.snapshot_requested = False
+
+        batch = self.journal.take_batch()
+        waiters = self.commit_waiters
+        self.commit_waiters = []
+        self.committing = True
+
+        self.run_in_thread(self.journal.write_batch, (batch, snapshot), lambda _: self.committed(waiters))
+
+    def committed(self, waiters):
+        self.committing = False
+
+        for callback, args in waiters:
+            callback(*args)
+
+        if self.journal.has_pending() or self.commit_waiters or self.snapshot_requested:
+            self.commit()
+
+    #----/ event feed /----
+
+    def publish(self, call_center, responses):
+        """ Send responses to the subscribers of the call center tenant, once the commands that produced them are durable """
+        tenant = call_center.get_name()
+
+        history = self.history
+        if history is not None:
+            now = time.time()
+            for obj in responses:
+                history.record(now, tenant, obj)
+
+        if not self.feed.has_subscribers(tenant):
+            return
+
+        if self.journal is None:
+            self.feed.publish(tenant, responses)
+        else:
+            self.after_durable(self.feed.publish, tenant, responses)
+
+    def flush_history(self):
+        """ Make the recorded events visible to the readers of the history, if any """
+        if self.history is not None:
+            self.history.flush()
+
+    def close_history(self):
+        if self.history is not None:
+            self.history.close()
+            self.history = None
+
+    #----/ ring timeouts /----
+
+    def start_ring_timer(self, call_center, call_id, operator_id, callback):
+        """ Call callback(call_center.verify_ignored(...), call_center) when the ring timeout of the operator expires """
+        self.cancel_ring_timer(call_center, call_id)
+        self.ring_timers[(call_center, call_id)] = self.schedule(
+            call_center.get_ring_timeout(operator_id), self.ring_timed_out, call_center, call_id, operator_id, callback
+        )
+
+    def cancel_ring_timer(self, call_center, call_id):
+        """ Cancel the ring timeout of call_id, if any """
+        timer = self.ring_timers.pop((call_center, call_id), None)
+        if timer is not None:
+            timer.cancel()
+
+    def ring_timed_out(self, call_center, call_id, operator_id, callback):
+        del self.ring_timers[(call_center, call_id)]
+        result = call_center.verify_ignored(call_id, operator_id)
+
+        if result:
+            self.journal_command(call_center.get_name(), "ignored", call_id, operator_id)
+        callback(result, call_center)
+
+
+def encode_snapshot(snapshot, request_id=None):
+    """ Return the JSON response line of a Call_center_snapshot """
+    state = snapshot.get_state()
+    data = {"response": f"Snapshot of {state['tenant']}: {len(state['queue'])} waiting calls, {len(state['operators'])} operators", "snapshot": state}
+    if request_id is not None:
+        data["request_id"] = request_id
+    return wire_codec.encode_json_response(data)
+
+def parse_tenant_values(values, convert):
+    """ Return (value of every tenant or None, {tenant: value}) of the values "VALUE" and "TENANT=VALUE" of an option, converted """
+    default = None
+    tenants = dict()
+
+    for value in values:
+        tenant, _, value = value.rpartition("=")
+        if tenant:
+            tenants[tenant] = convert(value)
+        else:
+            default = convert(value)
+
+    return default, tenants
+
+def server_parser(description=None):
+    """ Return the argument parser of the options every backend takes """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--port", type=int, default=5678)
+    parser.add_argument("--journal", help="directory of the write-ahead journal and snapshots, state is only kept in memory without it")
+    parser.add_argument("--ring-timeout", action="append", default=[], metavar="[TENANT=]SECONDS",
+                        help="seconds a call rings before it is ignored, 10 by default (or for TENANT, repeatable)")
+    parser.add_argument("--max-rejections", type=int, help="calls whose rejections each operator remembers at most, unbounded without it")
+    parser.add_argument("--metrics-port", type=int, help="port of the Prometheus scrape endpoint, disabled without it")
+    parser.add_argument("--roster", help="CSV or JSON file of the operators the tenants start with (see roster.py), A and B without it")
+    parser.add_argument("--max-queue", action="append", default=[], metavar="[TENANT=]CALLS",
+                        help="calls that can wait in the queue of every tenant (or of TENANT, repeatable), new calls beyond are refused")
+    parser.add_argument("--command-rate", type=float, help="commands per second a connection can send on average, unlimited without it")
+    parser.add_argument("--command-burst", type=int, default=100, help="commands a connection can send at once above its command rate")
+    parser.add_argument("--max-lag", type=float, default=0.5, help="seconds the event loop can lag before no connection is read, 0 never pauses")
+    parser.add_argument("--trace-every", type=int, default=0, help="sample the stage timings of one command out of N (see tracing.py), 0 traces nothing")
+    parser.add_argument("--history", help="directory of the columnar call history (see history.py and history_report.py), not recorded without it")
+    parser.add_argument("--profile-dir", default=".", help="directory the profiles of the \"profile\" admin command are dumped to")
+    return parser
+
+def build_service(service_class, args, **kwargs):
+    """ Return a service_class(registry, journal=..., **kwargs) configured with the parsed server_parser options, its journal recovered """
+    ring_timeout, ring_timeouts = parse_tenant_values(args.ring_timeout, float)
+    registry = Call_center_registry(ring_timeout=10 if ring_timeout is None else ring_timeout, max_rejections=args.max_rejections)
+    if args.roster:
+        entries = read_roster(args.roster)
+        print(f"Provisioned {len(entries)} operators in {registry.provision(entries)} tenants")
+
+    service = service_class(registry, journal=Journal(args.journal) if args.journal else None, **kwargs)
+    service.command_rate = args.command_rate
+    service.command_burst = args.command_burst
+    service.max_lag = args.max_lag or None
+    service.profile_dir = args.profile_dir
+    service.set_tracing(args.trace_every)
+    if args.history:
+        service.history = History(args.history)
+    if service.journal is not None:
+        print(f"Recovered {service.recover()} journaled commands")
+    registry.set_max_queue(*parse_tenant_values(args.max_queue, int))
+    registry.set_ring_timeouts(ring_timeouts)
+    return service
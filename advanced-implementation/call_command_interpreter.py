@@ -1,79 +1,125 @@
+import argparse
 import cmd
-import json
-from twisted.internet.protocol import Protocol
-from twisted.internet.protocol import ClientFactory
-from twisted.internet.endpoints import TCP4ClientEndpoint
 from twisted.internet import reactor
+from twisted.internet import threads
+from twisted.internet.endpoints import TCP4ClientEndpoint
+from call_center_client import Call_center_error
+from call_center_client import Call_center_pool
+import metrics
+import wire_codec
+
+class command_interpreter(cmd.Cmd):
+    """
+    Interactive shell on top of a Call_center_pool
 
-class command_interpreter_client(Protocol, cmd.Cmd):
+    cmdloop runs in a reactor thread, every command is handed to the reactor thread with blockingCallFromThread
+    and its responses are printed once they arrive, notifications (ignored calls) are printed as they come.
+
+    "call 42 es,gold @vip" requires skills for a call and gives it a priority (both optional),
+    "skills A es,gold" sets the skills of an operator ("skills A" clears them).
+    "add C es,gold", "remove C", "logout C" and "login C" provision operators at runtime.
+    """
 
     prompt = ""
 
-    def __init__(self, completekey = "tab", stdin = None, stdout = None):
+    def __init__(self, pool, tenant=None, completekey="tab", stdin=None, stdout=None):
         super().__init__(completekey, stdin, stdout)
-        self.command = dict()
-        reactor.callInThread(self.interpretor)
+        self.pool = pool
+        self.tenant = tenant
 
     #----/ call commands /----
 
-    def do_call(self, call_id):
-        self.set_command("call", call_id)
-        self.sendData()
-        
+    def do_call(self, arg):
+        call_id, skills, priority = split_options(arg)
+        self.send("call", call_id, skills, priority)
+
     def do_answer(self, operator_id):
-        self.set_command("answer", operator_id)
-        self.sendData()
+        self.send("answer", operator_id)
 
     def do_reject(self, operator_id):
-        self.set_command("reject", operator_id)
-        self.sendData()
+        self.send("reject", operator_id)
 
     def do_hangup(self, call_id):
-        self.set_command("hangup", call_id)
-        self.sendData()
+        self.send("hangup", call_id)
 
-    def set_command(self, command, id):
-        self.command = {
-            "command": command,
-            "id": f"{id}"
-        }
+    def do_skills(self, arg):
+        operator_id, skills, _ = split_options(arg)
+        self.send("skills", operator_id, skills or [])
 
-    def do_quit(self):
-        return True
-    
-    #----/ protocol logic /----
-
-    def dataReceived(self, data):
-        data = json.loads(data.decode())
-        print(data['response'])
+    def do_add(self, arg):
+        operator_id, skills, _ = split_options(arg)
+        self.send("add_operator", operator_id, skills)
 
-    def sendData(self):
-        self.transport.write(json.dumps(self.command).encode())
+    def do_remove(self, operator_id):
+        self.send("remove_operator", operator_id)
 
-    def interpretor(self):
-        self.cmdloop()
+    def do_login(self, operator_id):
+        self.send("login", operator_id)
 
+    def do_logout(self, operator_id):
+        self.send("logout", operator_id)
 
-class command_interpreter_factory(ClientFactory):
-    """A factory for command_interpreter_client.
+    def do_stats(self, _):
+        self.send("stats", "")
 
-    A new protocol instance will be created each time we connect to the server.
-    """
+    def do_quit(self, _):
+        reactor.callFromThread(reactor.stop)
+        return True
 
-    def buildProtocol(self, addr):
-        p = command_interpreter_client()
-        p.factory = self
-        return p
-    
-    def clientConnectionLost(self, connector, reason):
-        """If client disconnected, reconnect to server."""
-        connector.connect()
-    
-    def clientConnectionFailed(self, connector, reason):
-        print("connection failed:", reason)
+    do_EOF = do_quit
+
+    #----/ client logic /----
+
+    def send(self, command, id, skills=None, priority=None):
+        try:
+            result = threads.blockingCallFromThread(reactor, self.pool.send, command, id, self.tenant, skills, priority)
+        except Call_center_error as error:
+            print(error)
+        except Exception as error:
+            print("request failed:", error)
+        else:
+            self.print_result(command, result)
+
+    def print_result(self, command, result):
+        if command == "stats":
+            print(metrics.format_stats(result))
+        else:
+            print(wire_codec.render_text(result))
+
+def split_options(arg):
+    """ Split "<id> <skill>,<skill> @<priority>" into (id, [skills], priority), skills and priority are None without them """
+    parts = arg.split()
+    id = parts[0] if parts else ""
+    skills = priority = None
+
+    for part in parts[1:]:
+        if part.startswith("@"):
+            priority = part[1:]
+        else:
+            skills = (skills or []) + [skill for skill in part.split(",") if skill]
+
+    return id, skills, priority
+
+def print_event(responses):
+    print(wire_codec.render_text(responses))
+
+def start(pool, tenant):
+    def connected(_):
+        reactor.callInThread(command_interpreter(pool, tenant).cmdloop)
+
+    def failed(reason):
+        print("connection failed:", reason.getErrorMessage())
         reactor.stop()
-    
+
+    pool.connect().addCallbacks(connected, failed)
+
 if __name__ == '__main__':
-    endpoint = TCP4ClientEndpoint(reactor, 'localhost', 5678)
-    endpoint.connect(command_interpreter_factory())
-    reactor.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5678)
+    parser.add_argument("--tenant", help="call center the commands act on, the server default one without it")
+    args = parser.parse_args()
+
+    pool = Call_center_pool(TCP4ClientEndpoint(reactor, args.host, args.port), on_event=print_event)
+    reactor.callWhenRunning(start, pool, args.tenant)
+    reactor.run()
@@ -0,0 +1,232 @@
+from priority_queue import Priority_queue
+from records import Call_record, NO_SKILLS, QUEUED, CALL_RINGING, ANSWERED, ENDED
+
+class Call_registry():
+    """
+    Call_registry keeps track of where every live call is: waiting in the queue or assigned to an operator (ringing or busy)
+
+    The waiting queue is ordered by the key of every call (its virtual arrival time, see Priority_queue) and then by a sequence number,
+    so with equal priorities it is FIFO. A call taken from the queue keeps its key while it rings, so if it is rejected it goes back to its place.
+
+    A call can require skills (a frozenset of skill names), kept for as long as the call lives. The queue is split into one Priority_queue
+    per skill set the waiting calls require (calls that require none have their own), so the front call of every skill set
+    is found without walking the queue.
+
+    Every live call has one Call_record (see records.py), from the moment it is queued until it ends: its key, skills, when it was queued,
+    how many times it was dispatched, its state and its operator are all kept there, in a single dict by call_id.
+
+    Once take_changes was called, the call_ids that entered or left the queue are tracked until the next call, for snapshots (see snapshot.py).
+    When more calls changed than are alive tracking is dropped, and the next take_changes returns every queued call instead.
+    """
+
+    def __init__(self, queue, skills=None, keys=None, attempts=None, now=0):
+        self.__plain = Priority_queue()
+        self.__groups = dict()
+        self.__calls = dict()
+        self.__sequence = 0
+        self.__newest = float("-inf")
+        self.__changed = None
+
+        skills = skills or {}
+        keys = dict(keys or {})
+        for call_id in queue:
+            self.enqueue(call_id, skills.get(call_id, NO_SKILLS), keys.pop(call_id, 0), now)
+        for call_id, key in keys.items():
+            self.__sequence += 1
+            self.__calls[call_id] = Call_record(call_id, key, self.__sequence, skills.get(call_id, NO_SKILLS), state=ENDED)
+        for call_id, count in (attempts or {}).items():
+            if call_id in self.__calls:
+                self.__calls[call_id].attempts = count
+
+    def __len__(self):
+        """ Return the number of calls waiting in the queue """
+        if not self.__groups:
+            return len(self.__plain)
+        return len(self.__plain) + sum(len(group) for group in self.__groups.values())
+
+    def __iter__(self):
+        """ Iterate over the waiting call_ids in queue order """
+        items = self.__plain.items()
+        for group in self.__groups.values():
+            items.extend(group.items())
+        items.sort()
+        return iter([record.call_id for _, _, record in items])
+
+    def group_of(self, record):
+        """ Return the Priority_queue a record waits in or goes to """
+        if not record.skills:
+            return self.__plain
+
+        group = self.__groups.get(record.skills)
+        if group is None:
+            group = self.__groups[record.skills] = Priority_queue()
+        return group
+
+    def enqueue(self, call_id, skills=None, key=None, now=0):
+        """
+        Add a call_id to the queue with key, requiring skills, queued since now (a clock reading)
+
+        skills None keeps the ones it was given before, key None the one it had when it was taken from the queue (0 for a new call)
+        """
+        record = self.__calls.get(call_id)
+
+        if record is None:
+            self.__sequence += 1
+            record = self.__calls[call_id] = Call_record(call_id, key or 0, self.__sequence, skills or NO_SKILLS, now)
+        else:
+            if record.state is QUEUED:
+                self.take(record)
+                record = self.__calls[call_id] = record.copy()
+            if key is not None:
+                self.__sequence += 1
+                record.key = key
+                record.sequence = self.__sequence
+            if skills is not None:
+                record.skills = skills
+            record.enqueued_at = now
+            record.operator = None
+
+        if record.skills:
+            self.group_of(record).push(record)
+        else:
+            self.__plain.push(record)
+        if record.key > self.__newest:
+            self.__newest = record.key
+        if self.__changed is not None:
+            self.changed(call_id)
+
+    def heads(self):
+        """ Return the records of the front call of every skill set, in queue order """
+        if not self.__groups:
+            first = self.__plain.first()
+            return [first] if first is not None else []
+
+        heads = []
+        first = self.__plain.first()
+        if first is not None:
+            heads.append((first.key, first.sequence, first))
+        for group in self.__groups.values():
+            first = group.first()
+            heads.append((first.key, first.sequence, first))
+        heads.sort()
+        return [record for _, _, record in heads]
+
+    def dequeue(self, record=None):
+        """ Take a record (the one at the front of the queue when None) from the queue for an operator, it counts as one more attempt """
+        if record is None:
+            record = self.heads()[0]
+
+        self.take(record)
+        record.attempts += 1
+        return record
+
+    def remove(self, call_id):
+        """ Remove a call_id that ended from anywhere in the queue and forget it, return True if it was queued """
+        record = self.__calls.get(call_id)
+        if record is None or record.state is not QUEUED:
+            return False
+
+        self.take(record)
+        del self.__calls[call_id]
+        return True
+
+    def take(self, record):
+        """ Remove a queued record from its Priority_queue """
+        if self.__changed is not None:
+            self.changed(record.call_id)
+
+        if not record.skills:
+            return self.__plain.pop(record)
+
+        group = self.__groups[record.skills]
+        group.pop(record)
+        if not group:
+            del self.__groups[record.skills]
+        return True
+
+    def changed(self, call_id):
+        """ Track a call_id that entered or left the queue """
+        self.__changed.add(call_id)
+        if len(self.__changed) > 2 * len(self.__calls) + 1000:
+            self.__changed = None
+
+    def take_changes(self):
+        """
+        Return ({call_id: (key, sequence, enqueued_at, skills) or None when it left}, complete) of the calls that entered or left the queue
+        since the last call, or of every queued call with complete True the first time (and after tracking was dropped)
+        """
+        changed = self.__changed
+        self.__changed = set()
+
+        if changed is None:
+            return {call_id: (record.key, record.sequence, record.enqueued_at, record.skills)
+                    for call_id, record in self.__calls.items() if record.state is QUEUED}, True
+
+        changes = dict()
+        for call_id in changed:
+            record = self.__calls.get(call_id)
+            if record is not None and record.state is QUEUED:
+                changes[call_id] = (record.key, record.sequence, record.enqueued_at, record.skills)
+            else:
+                changes[call_id] = None
+        return changes, False
+
+    def is_live(self, call_id):
+        """ Return True if call_id is a live call, waiting in the queue or with an operator """
+        return call_id in self.__calls
+
+    def get_call_skills(self):
+        """ Return {call_id: skills} of the live calls that require skills """
+        return {call_id: record.skills for call_id, record in self.__calls.items() if record.skills}
+
+    def get_keys(self):
+        """ Return {call_id: key} of the live calls, waiting or taken from the queue """
+        return {call_id: record.key for call_id, record in self.__calls.items()}
+
+    def get_attempts(self):
+        """ Return {call_id: attempts} of the live calls that were dispatched at least once """
+        return {call_id: record.attempts for call_id, record in self.__calls.items() if record.attempts}
+
+    def forget(self, call_id):
+        """ Forget a call that ended """
+        record = self.__calls.pop(call_id, None)
+        if record is not None:
+            record.state = ENDED
+
+    def ahead(self, call_id):
+        """
+        Return about how many calls are ahead of a waiting call_id in the queue, without walking it
+
+        It is exact for a call keyed after every other (a new call of the normal priority) or at the front,
+        otherwise it is interpolated between the oldest key waiting and the newest key queued, as if the keys in between were evenly spread
+        """
+        record = self.__calls[call_id]
+        others = len(self) - 1
+        if not others or record.key >= self.__newest:
+            return others
+
+        oldest = self.heads()[0]
+        if oldest is record:
+            return 0
+        return min(others, max(0, round(others * (record.key - oldest.key) / (self.__newest - oldest.key))))
+
+    def assign(self, call_id, operator):
+        """ Record that call_id is now ringing for operator """
+        record = self.__calls[call_id]
+        record.operator = operator
+        record.state = CALL_RINGING
+
+    def answered(self, call_id):
+        """ Record that the operator of call_id answered it """
+        self.__calls[call_id].state = ANSWERED
+
+    def release(self, call_id):
+        """ Forget the operator that had call_id and return it, or None if no operator had it """
+        record = self.__calls.get(call_id)
+        if record is None or record.operator is None:
+            return None
+
+        operator = record.operator
+        record.operator = None
+        record.state = ENDED
+        return operator
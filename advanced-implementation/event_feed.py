@@ -0,0 +1,113 @@
+from collections import deque
+import wire_codec
+
+class event_subscriber():
+    """
+    One read-only subscriber of an Event_feed, writing feed lines to its transport
+
+    Its connection registers it as the streaming producer of its transport (pauseProducing, resumeProducing and stopProducing
+    are the Twisted IPushProducer methods): when the transport buffer is full the event loop pauses it,
+    and until it is resumed the events are kept in a backlog of at most "max_pending" events.
+    When the backlog overflows the oldest events are dropped, and the subscriber gets a {"dropped": count} line before the rest of the backlog,
+    so a slow dashboard costs the server a bounded amount of memory.
+    """
+
+    def __init__(self, transport, tenant, operators=None, max_pending=1000):
+        self.transport = transport
+        self.tenant = tenant
+        self.operators = operators
+        self.max_pending = max_pending
+        self.paused = False
+        self.pending = deque()
+        self.pending_events = 0
+        self.dropped = 0
+
+    def wants(self, obj):
+        """ Return True if the event concerns one of the subscribed operators (every event without an operator subset) """
+        return self.operators is None or obj.get("operator_id") in self.operators
+
+    def send(self, data, events):
+        """ Write the feed lines of "events" events, or keep them in the backlog while paused """
+        if not self.paused:
+            self.transport.write(data)
+            return
+
+        self.pending.append((data, events))
+        self.pending_events += events
+
+        while self.pending_events > self.max_pending:
+            _, dropped = self.pending.popleft()
+            self.pending_events -= dropped
+            self.dropped += dropped
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        """ Write the dropped count and the backlog in one write """
+        self.paused = False
+        chunks = [data for data, _ in self.pending]
+
+        if self.dropped:
+            chunks.insert(0, wire_codec.encode_feed_dropped(self.dropped))
+            self.dropped = 0
+
+        self.pending.clear()
+        self.pending_events = 0
+
+        if chunks:
+            self.transport.write(b"".join(chunks))
+
+    def stopProducing(self):
+        self.paused = True
+        self.pending.clear()
+        self.pending_events = 0
+
+
+class Event_feed():
+    """
+    Event_feed fans the events of every tenant out to its subscribers
+
+    Every event is serialized once per publish, subscribers of the whole tenant share one buffer
+    and subscribers of an operator subset get the lines of their events only.
+    Publishing to a tenant without subscribers is a single dict lookup.
+    """
+
+    def __init__(self):
+        self.__subscribers = dict()
+
+    def __len__(self):
+        """ Return the number of subscribers """
+        return sum(len(subscribers) for subscribers in self.__subscribers.values())
+
+    def has_subscribers(self, tenant):
+        return tenant in self.__subscribers
+
+    def subscribe(self, subscriber):
+        self.__subscribers.setdefault(subscriber.tenant, []).append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        subscribers = self.__subscribers.get(subscriber.tenant, [])
+        if subscriber in subscribers:
+            subscribers.remove(subscriber)
+        if not subscribers:
+            self.__subscribers.pop(subscriber.tenant, None)
+
+    def publish(self, tenant, responses):
+        """ Send the action dicts of tenant to its subscribers """
+        subscribers = self.__subscribers.get(tenant)
+        if not subscribers or not responses:
+            return
+
+        lines = [wire_codec.encode_feed_event(tenant, obj) for obj in responses]
+        everything = None
+
+        for subscriber in subscribers:
+            if subscriber.operators is None:
+                if everything is None:
+                    everything = b"".join(lines)
+                subscriber.send(everything, len(lines))
+            else:
+                wanted = [line for line, obj in zip(lines, responses) if subscriber.wants(obj)]
+                if wanted:
+                    subscriber.send(b"".join(wanted), len(wanted))
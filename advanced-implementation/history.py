@@ -0,0 +1,181 @@
+"""
+Append-only columnar history of the call lifecycle events, in memory-mapped files (see history_report.py for the reports)
+
+Every event that moves a call through its lifecycle is one row, stored column by column in fixed-width arrays, one file per column:
+
+    time.f8       float64  seconds (wall clock on a server, trace time in a replay)
+    tenant.u4     uint32   interned tenant, line number in tenants.jsonl
+    action.u1     uint8    wire_codec.ACTION_CODES of the event
+    previous.u1   uint8    action code of the previous event of the same call, NO_ACTION for its first one
+    call.u4       uint32   call number, line number in calls.jsonl (a call id reused after its call ended gets a new number)
+    operator.u4   uint32   interned (tenant, operator id), line number in operators.jsonl (0 is no operator)
+    elapsed.f4    float32  seconds since the previous event of the same call (0 for its first one)
+
+With "previous" and "elapsed" a report needs no join: a "ringing" whose previous event put the call in the queue tells how long it waited,
+an "answered" how long it rang, a "finished" how long it was handled.
+
+Arrays are in native byte order and grow by doubling their file. Rows are buffered and copied into the maps BATCH at a time (or on flush),
+then the row count in the "rows" file is updated, so readers only ever see complete rows. The interned names are JSON values, one per line:
+strings for tenants and calls, [tenant, operator id] for operators (operators of different tenants can share an id), null for no operator.
+Only the live calls are kept in memory, to chain their events.
+"""
+
+import json
+import mmap
+import os
+import struct
+from array import array
+from wire_codec import ACTION_CODES
+
+COLUMNS = (
+    ("time", "d", "f8"),
+    ("tenant", "I", "u4"),
+    ("action", "B", "u1"),
+    ("previous", "B", "u1"),
+    ("call", "I", "u4"),
+    ("operator", "I", "u4"),
+    ("elapsed", "f", "f4")
+)
+LIFECYCLE_ACTIONS = ("recived", "ringing", "answered", "reject", "missed", "ignored", "finished", "queue_full", "operator_removed", "logged_out")
+TERMINAL_ACTIONS = ("missed", "ignored", "finished", "queue_full")
+NO_ACTION = 0xFF
+HEADER = struct.Struct("=QQ")
+
+class History():
+    """
+    History appends the lifecycle events of the calls of every tenant to the columnar store in "directory", creating it if needed
+
+    record is a few dict lookups and one append per column, the copy into the maps happens every BATCH rows.
+    An existing store is appended to, the calls that were live when it was closed start a new chain.
+    """
+
+    BATCH = 4096
+    INITIAL_ROWS = 1 << 16
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__header = self.__map("rows", HEADER.size)
+        self.__rows, self.__calls = HEADER.unpack_from(self.__header)
+        self.__capacity = max(self.INITIAL_ROWS, self.__rows)
+        self.__maps = [self.__map(f"{name}.{suffix}", self.__capacity * array(code).itemsize) for name, code, suffix in COLUMNS]
+        self.__buffers = [array(code) for _, code, _ in COLUMNS]
+        self.__tenants, self.__tenant_names = self.__names("tenants.jsonl")
+        self.__operators, self.__operator_names = self.__names("operators.jsonl")
+        self.__call_names = open(os.path.join(directory, "calls.jsonl"), "a")
+        self.__live = dict()
+
+        if not self.__operators:
+            self.intern(self.__operators, self.__operator_names, None)
+
+    def __map(self, name, size):
+        """ Map the file name of the store, growing it to size bytes if it is smaller """
+        path = os.path.join(self.__directory, name)
+        with open(path, "a+b") as file:
+            if os.fstat(file.fileno()).st_size < size:
+                file.truncate(size)
+            return mmap.mmap(file.fileno(), 0)
+
+    def __names(self, name):
+        """ Return ({name: number}, file to append new names to) of an interned names file """
+        path = os.path.join(self.__directory, name)
+        names = dict()
+        if os.path.exists(path):
+            with open(path) as file:
+                for number, line in enumerate(file):
+                    value = json.loads(line)
+                    names[tuple(value) if value.__class__ is list else value] = number
+        return names, open(path, "a")
+
+    def intern(self, numbers, file, name):
+        """ Return the number of name in numbers, appending it to file if it is new """
+        number = numbers.get(name)
+        if number is None:
+            number = numbers[name] = len(numbers)
+            file.write(json.dumps(name) + "\n")
+        return number
+
+    def get_rows(self):
+        """ Return the number of rows recorded, flushed or not """
+        return self.__rows + len(self.__buffers[0])
+
+    def record(self, now, tenant, obj):
+        """ Record an action dict of tenant at time now, if it is a lifecycle event of a call """
+        call_id = obj.get("call_id")
+        action = obj["action"]
+        if call_id is None or action not in LIFECYCLE_ACTIONS:
+            return
+
+        key = (tenant, call_id)
+        live = self.__live.get(key)
+        code = ACTION_CODES[action]
+
+        if live is None or action == "recived":
+            call = self.__calls
+            self.__calls += 1
+            self.__call_names.write(json.dumps(call_id) + "\n")
+            previous = NO_ACTION
+            elapsed = 0.0
+        else:
+            call, since, previous = live
+            elapsed = now - since
+
+        if action in TERMINAL_ACTIONS:
+            self.__live.pop(key, None)
+        else:
+            self.__live[key] = (call, now, code)
+
+        tenant_number = self.__tenants.get(tenant)
+        if tenant_number is None:
+            tenant_number = self.intern(self.__tenants, self.__tenant_names, tenant)
+        operator_id = obj.get("operator_id")
+        operator = 0
+        if operator_id is not None:
+            operator = self.__operators.get((tenant, operator_id), 0)
+            if not operator:
+                operator = self.intern(self.__operators, self.__operator_names, (tenant, operator_id))
+
+        times, tenants, actions, previouses, calls, operators, elapseds = self.__buffers
+        times.append(now)
+        tenants.append(tenant_number)
+        actions.append(code)
+        previouses.append(previous)
+        calls.append(call)
+        operators.append(operator)
+        elapseds.append(elapsed)
+
+        if len(times) >= self.BATCH:
+            self.flush()
+
+    def flush(self):
+        """ Copy the buffered rows into the maps and publish the new row count """
+        count = len(self.__buffers[0])
+        if not count:
+            return
+
+        rows = self.__rows + count
+        if rows > self.__capacity:
+            while rows > self.__capacity:
+                self.__capacity *= 2
+            for mm, (_, code, _) in zip(self.__maps, COLUMNS):
+                mm.resize(self.__capacity * array(code).itemsize)
+
+        for mm, buffer in zip(self.__maps, self.__buffers):
+            size = buffer.itemsize
+            mm[self.__rows * size:rows * size] = buffer
+            del buffer[:]
+
+        for file in (self.__tenant_names, self.__operator_names, self.__call_names):
+            file.flush()
+
+        self.__rows = rows
+        HEADER.pack_into(self.__header, 0, self.__rows, self.__calls)
+
+    def close(self):
+        """ Flush, write the maps to disk and close them """
+        self.flush()
+        for mm in self.__maps + [self.__header]:
+            mm.flush()
+            mm.close()
+        for file in (self.__tenant_names, self.__operator_names, self.__call_names):
+            file.close()
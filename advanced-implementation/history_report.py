@@ -0,0 +1,192 @@
+"""
+Reports over a columnar call history (see history.py), vectorized with NumPy
+
+The columns are memory-mapped read-only and scanned CHUNK rows at a time, so a report over hundreds of millions of events
+never builds a Python object per event and only holds a few arrays of one chunk in memory. It can run while a server appends to the history,
+it reads the rows that were flushed when it started.
+
+Every figure comes from the "previous" and "elapsed" columns of one row, without joining the events of a call:
+
+    wait          a ringing whose previous event put the call in the queue (recived, reject, operator_removed, logged_out),
+                  "first wait" only the ones right after recived (how long a caller waits for a first ring)
+    ring time     an answered (the previous event is its ringing)
+    handle time   a finished whose previous event is answered
+    abandonment   the calls that ended missed (the caller hung up before an answer), over the calls received
+    operators     rings, answers, rejects and ignores of every operator, reject and ignore rates over its rings
+                  (named by operator id in the report of a tenant, "tenant/operator id" in the report of all of them)
+    hourly        the calls received per hour of the time column (UTC hours of the wall clock of a server, hours of the trace time of a replay)
+
+NumPy is only needed here, not by the servers that write the history.
+"""
+
+import argparse
+import json
+import os
+import time
+from history import COLUMNS
+from history import HEADER
+from wire_codec import ACTION_CODES
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CHUNK = 1 << 24
+QUEUEING_ACTIONS = ("recived", "reject", "operator_removed", "logged_out")
+OPERATOR_ACTIONS = ("ringing", "answered", "reject", "ignored")
+
+def read_names(directory, name):
+    """ Return the list of the interned names of a names file of the history """
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+def operator_name(name, tenant=None):
+    """ Return the report name of an interned operator [tenant, operator id]: its id in the report of its tenant, "tenant/id" otherwise """
+    operator_tenant, op_id = name
+    return op_id if tenant is not None else f"{operator_tenant}/{op_id}"
+
+def open_history(directory):
+    """ Return {column: read-only array} of the rows flushed to the history in directory, memory-mapped """
+    with open(os.path.join(directory, "rows"), "rb") as file:
+        rows, _ = HEADER.unpack(file.read(HEADER.size))
+
+    columns = dict()
+    for name, _, suffix in COLUMNS:
+        if rows:
+            columns[name] = numpy.memmap(os.path.join(directory, f"{name}.{suffix}"), dtype=suffix, mode="r", shape=(rows,))
+        else:
+            columns[name] = numpy.empty(0, dtype=suffix)
+    return columns
+
+def report(directory, tenant=None, chunk=CHUNK):
+    """ Return the JSON-serializable report of the history in directory, of one tenant or of all of them """
+    columns = open_history(directory)
+    operators = read_names(directory, "operators.jsonl")
+    rows = len(columns["time"])
+
+    tenant_number = None
+    if tenant is not None:
+        tenants = read_names(directory, "tenants.jsonl")
+        if tenant not in tenants:
+            raise ValueError(f"no tenant {tenant!r} in the history")
+        tenant_number = tenants.index(tenant)
+
+    queueing = numpy.array([ACTION_CODES[action] for action in QUEUEING_ACTIONS], dtype="u1")
+    counts = dict.fromkeys(("events", "calls", "abandoned", "abandoned_in_queue", "queue_full",
+                            "waits", "first_waits", "rings_answered", "handled"), 0)
+    sums = dict.fromkeys(("wait", "first_wait", "ring_time", "handle_time"), 0.0)
+    per_operator = {action: numpy.zeros(len(operators), dtype="i8") for action in OPERATOR_ACTIONS}
+    hourly = dict()
+
+    for start in range(0, rows, chunk):
+        part = {name: column[start:start + chunk] for name, column in columns.items()}
+        if tenant_number is not None:
+            keep = part["tenant"] == tenant_number
+            part = {name: column[keep] for name, column in part.items()}
+
+        action = part["action"]
+        previous = part["previous"]
+        elapsed = part["elapsed"]
+        counts["events"] += len(action)
+
+        received = action == ACTION_CODES["recived"]
+        counts["calls"] += int(numpy.count_nonzero(received))
+        hours, calls = numpy.unique(part["time"][received] // 3600, return_counts=True)
+        for hour, count in zip(hours.tolist(), calls.tolist()):
+            hourly[hour] = hourly.get(hour, 0) + count
+
+        missed = action == ACTION_CODES["missed"]
+        counts["abandoned"] += int(numpy.count_nonzero(missed))
+        counts["abandoned_in_queue"] += int(numpy.count_nonzero(missed & numpy.isin(previous, queueing)))
+        counts["queue_full"] += int(numpy.count_nonzero(action == ACTION_CODES["queue_full"]))
+
+        ringing = action == ACTION_CODES["ringing"]
+        for name, key, mask in (
+            ("wait", "waits", ringing & numpy.isin(previous, queueing)),
+            ("first_wait", "first_waits", ringing & (previous == ACTION_CODES["recived"])),
+            ("ring_time", "rings_answered", action == ACTION_CODES["answered"]),
+            ("handle_time", "handled", (action == ACTION_CODES["finished"]) & (previous == ACTION_CODES["answered"]))
+        ):
+            counts[key] += int(numpy.count_nonzero(mask))
+            sums[name] += float(elapsed[mask].sum(dtype="f8"))
+
+        operator = part["operator"]
+        for name in OPERATOR_ACTIONS:
+            per_operator[name] += numpy.bincount(operator[action == ACTION_CODES[name]], minlength=len(operators))[:len(operators)]
+
+    def average(name, key):
+        return sums[name] / counts[key] if counts[key] else None
+
+    rings = per_operator["ringing"]
+    return {
+        "tenant": tenant,
+        "events": counts["events"],
+        "calls": counts["calls"],
+        "average_wait": average("wait", "waits"),
+        "average_first_wait": average("first_wait", "first_waits"),
+        "average_ring_time": average("ring_time", "rings_answered"),
+        "average_handle_time": average("handle_time", "handled"),
+        "abandoned": counts["abandoned"],
+        "abandoned_in_queue": counts["abandoned_in_queue"],
+        "abandonment_rate": counts["abandoned"] / counts["calls"] if counts["calls"] else None,
+        "queue_full": counts["queue_full"],
+        "operators": {
+            operator_name(operators[number], tenant): {
+                "rings": int(rings[number]),
+                "answered": int(per_operator["answered"][number]),
+                "rejects": int(per_operator["reject"][number]),
+                "ignored": int(per_operator["ignored"][number]),
+                "reject_rate": float(per_operator["reject"][number] / rings[number]),
+                "ignore_rate": float(per_operator["ignored"][number] / rings[number])
+            }
+            for number in numpy.flatnonzero(rings).tolist()
+        },
+        "hourly": {time.strftime("%Y-%m-%d %H:00", time.gmtime(hour * 3600)): count for hour, count in sorted(hourly.items())}
+    }
+
+def format_report(result, top=20):
+    """ Return the text of a report, with the "top" operators that reject or ignore the most of their rings """
+    def seconds(value):
+        return f"{value:.2f}s" if value is not None else "-"
+
+    lines = [
+        f"{result['events']:,} events, {result['calls']:,} calls" + (f" of {result['tenant']}" if result["tenant"] is not None else ""),
+        f"average wait {seconds(result['average_wait'])}, first wait {seconds(result['average_first_wait'])}, "
+        f"ring time {seconds(result['average_ring_time'])}, handle time {seconds(result['average_handle_time'])}",
+        f"abandoned {result['abandoned']:,} ({result['abandonment_rate'] or 0:.2%}), {result['abandoned_in_queue']:,} in queue, "
+        f"{result['queue_full']:,} refused (queue full)"
+    ]
+
+    operators = sorted(result["operators"].items(), key=lambda item: item[1]["reject_rate"] + item[1]["ignore_rate"], reverse=True)
+    lines.append(f"operators ({min(top, len(operators))} of {len(operators)}, most rejecting or ignoring first):")
+    for name, op in operators[:top]:
+        lines.append(f"  {name:20} rings {op['rings']:>10,}  answered {op['answered']:>10,}  "
+                     f"rejects {op['reject_rate']:>7.2%}  ignored {op['ignore_rate']:>7.2%}")
+
+    lines.append("calls per hour:")
+    for hour, count in result["hourly"].items():
+        lines.append(f"  {hour}  {count:>12,}")
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("history", help="directory of the history (--history of the servers and of replay.py)")
+    parser.add_argument("--tenant", help="report on one tenant, every tenant together without it")
+    parser.add_argument("--top", type=int, default=20, help="operators listed in the text report")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="rows scanned at a time")
+    parser.add_argument("--json", action="store_true", help="write the whole report as JSON")
+    args = parser.parse_args()
+
+    if numpy is None:
+        parser.error("the reports need numpy")
+
+    try:
+        result = report(args.history, args.tenant, args.chunk)
+    except ValueError as error:
+        parser.error(str(error))
+
+    print(json.dumps(result) if args.json else format_report(result, args.top))
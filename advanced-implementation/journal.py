@@ -0,0 +1,156 @@
+import json
+import os
+import time
+
+class Journal():
+    """
+    Journal is the write-ahead log of a Call_center_registry, so a restart does not lose waiting calls, operator states or rejections
+
+    A directory holds two files:
+        * journal.log: one JSON line [sequence, time, tenant, command, args...] per state-changing command
+          (call, answer, reject, hangup, ignored, skills, add_operator, remove_operator, login, logout)
+        * snapshot.json: the compact state of every tenant, the sequence of the last command it includes and its time
+
+    Recovery loads the snapshot and replays only the log lines after its sequence, so restart time is bounded by the snapshot size plus the log tail.
+
+    Times are read from "clock" (the wall clock, which goes on across restarts) and mapped to the registry clock on recovery:
+    a replayed call keeps the arrival time it had, and the calls of the snapshot the ages they had when it was written,
+    so the calls that waited before a crash are still ahead of the ones that arrive after it (aging, see Call_center).
+
+    Appending only buffers the line. "take_batch" and "write_batch" are split so a server can take the batch in its event loop
+    and write + fsync it in a worker thread (one batch at a time): every command appended while a batch is being synced goes into the next one (group commit).
+    """
+
+    LOG_NAME = "journal.log"
+    SNAPSHOT_NAME = "snapshot.json"
+    COMMANDS = ("call", "answer", "reject", "hangup", "ignored", "skills", "add_operator", "remove_operator", "login", "logout")
+
+    def __init__(self, directory, clock=time.time):
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__log_path = os.path.join(directory, self.LOG_NAME)
+        self.__snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+        self.__log = open(self.__log_path, "ab")
+        self.__pending = []
+        self.__sequence = 0
+        self.__clock = clock
+
+    def get_sequence(self):
+        """ Return the sequence of the last appended command """
+        return self.__sequence
+
+    def get_time(self):
+        """ Return a reading of the journal clock, the time of a snapshot is taken when its state is """
+        return self.__clock()
+
+    def has_pending(self):
+        """ Return True if some appended commands are not written yet """
+        return len(self.__pending) > 0
+
+    def append(self, tenant, command, *args):
+        """ Buffer a command, it is durable once a write_batch including it returns """
+        self.__sequence += 1
+        self.__pending.append(json.dumps([self.__sequence, self.__clock(), tenant, command, *args], separators=(",", ":")).encode() + b"\n")
+
+    def take_batch(self):
+        """ Return and forget the buffered commands """
+        batch = self.__pending
+        self.__pending = []
+        return batch
+
+    def write_batch(self, batch, snapshot=None):
+        """
+        Write and fsync a batch, then write the snapshot (sequence, state, time) if given
+
+        The snapshot must include every command of the log once the batch is written, the log is emptied after it
+        """
+        if batch:
+            self.__log.write(b"".join(batch))
+            self.__log.flush()
+            os.fsync(self.__log.fileno())
+
+        if snapshot is not None:
+            self.write_snapshot(*snapshot)
+
+    def commit(self):
+        """ Write and fsync the buffered commands """
+        self.write_batch(self.take_batch())
+
+    def write_snapshot(self, sequence, state, now=None):
+        """ Atomically replace the snapshot of state taken at now (a get_time reading, the clock when None) and empty the log """
+        tmp_path = self.__snapshot_path + ".tmp"
+
+        with open(tmp_path, "wb") as snapshot:
+            snapshot.write(json.dumps({"sequence": sequence, "time": self.__clock() if now is None else now, "state": state}, separators=(",", ":")).encode())
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+
+        os.replace(tmp_path, self.__snapshot_path)
+        self.sync_directory()
+        self.__log.truncate(0)
+        os.fsync(self.__log.fileno())
+
+    def sync_directory(self):
+        """ fsync the directory so the snapshot rename survives a crash (not available on every platform) """
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.__directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def recover(self, registry):
+        """
+        Load the snapshot into registry and replay the log commands after it
+
+        A torn last line (crash in the middle of a write) is cut from the log. return: number of replayed commands
+        """
+        sequence = 0
+        replayed = 0
+        valid = 0
+        decode = json.JSONDecoder().decode
+        shift = registry.get_clock()() - self.__clock()
+
+        if os.path.exists(self.__snapshot_path):
+            with open(self.__snapshot_path, "rb") as snapshot:
+                data = json.loads(snapshot.read())
+            registry.set_state(data["state"], data["time"] + shift)
+            sequence = data["sequence"]
+
+        with open(self.__log_path, "rb") as log:
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = decode(line.decode())
+                except ValueError:
+                    break
+
+                valid += len(line)
+                if entry[0] <= sequence:
+                    continue
+
+                apply_command(registry, entry[2], entry[3], entry[4:], entry[1] + shift)
+                sequence = entry[0]
+                replayed += 1
+
+        self.__log.truncate(valid)
+        self.__sequence = sequence
+        return replayed
+
+    def close(self):
+        """ Write the buffered commands and close the log """
+        self.commit()
+        self.__log.close()
+
+
+def apply_command(registry, tenant, command, args, now=None):
+    """ Run a journaled command on the tenant call center and return its responses, a call arrives at now (a registry clock reading, the clock when None) """
+    call_center = registry.get(tenant)
+
+    if command == "ignored":
+        return call_center.verify_ignored(*args)
+    elif command == "call":
+        return call_center.call(*args, now=now)
+    elif command in Journal.COMMANDS:
+        return getattr(call_center, command)(*args)
@@ -0,0 +1,242 @@
+import time
+from bisect import bisect_left
+from records import RINGING, BUSY, OFFLINE, STATUS_NAMES
+
+class Histogram():
+    """ Fixed-bucket histogram: observe is one bisect and two additions, cumulative counts are only computed when read """
+
+    BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+
+    def __init__(self, buckets=BUCKETS):
+        self.__buckets = tuple(buckets)
+        self.__counts = [0] * (len(self.__buckets) + 1)
+        self.__sum = 0
+        self.__count = 0
+
+    def observe(self, value):
+        """ Add a value """
+        self.__counts[bisect_left(self.__buckets, value)] += 1
+        self.__sum += value
+        self.__count += 1
+
+    def get_state(self):
+        """ Return {"buckets": [(upper bound, cumulative count), ...], "sum": ..., "count": ...}, the last bound is "+Inf" """
+        cumulative = 0
+        buckets = []
+
+        for bound, count in zip(self.__buckets + ("+Inf",), self.__counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+
+        return {"buckets": buckets, "sum": self.__sum, "count": self.__count}
+
+class Call_center_metrics():
+    """
+    Call_center_metrics is the instrumentation of one Call_center: per-action counters, time-in-queue and ring-time histograms,
+    and the seconds every operator spent in each status (occupancy)
+
+    The call center increments the action counters in place (get_action_counts) and calls it on every dequeue and operator status change,
+    each update is a few dict operations. The time a call was queued at is kept in its record (see records.Call_record), not here.
+    Operator statuses are records.Status, named in get_state
+
+    For the wait estimates (estimate_wait) it also keeps exponentially weighted moving averages of the ring time, of the handle time
+    (the time an operator stays busy) and of the abandonment rate (the share of the calls leaving the queue that hung up instead of ringing),
+    each moving "ALPHA" of the way towards every new value, and how many operators are logged in.
+    They are plain floats updated in place (None before the first value), as they change on every dispatch.
+    """
+
+    ALPHA = 0.1
+
+    ACTIONS = (
+        "recived", "ringing", "waiting", "reject", "answered", "missed", "finished", "no_calls", "in_call", "ignored", "skills",
+        "operator_added", "operator_removed", "logged_in", "logged_out", "queue_full"
+    )
+
+    def __init__(self, clock=time.monotonic):
+        self.__clock = clock
+        self.__actions = dict.fromkeys(self.ACTIONS, 0)
+        self.__time_in_queue = Histogram()
+        self.__ring_time = Histogram()
+        self.__operators = dict()
+        self.__ring_average = None
+        self.__handle_average = None
+        self.__abandonment = None
+        self.__logged_in = 0
+
+    def get_action_counts(self):
+        """ Return the dict of action counters, for the call center to increment directly """
+        return self.__actions
+
+    def dequeued(self, enqueued_at):
+        """ Observe the time a call queued at enqueued_at (a clock reading) waited in the queue, when it leaves it for an operator """
+        self.__time_in_queue.observe(self.__clock() - enqueued_at)
+        if self.__abandonment is None:
+            self.__abandonment = 0
+        else:
+            self.__abandonment -= self.ALPHA * self.__abandonment
+
+    def abandoned(self):
+        """ Count a call that hung up while it was waiting in the queue """
+        if self.__abandonment is None:
+            self.__abandonment = 1
+        else:
+            self.__abandonment += self.ALPHA * (1 - self.__abandonment)
+
+    def add_operator(self, op_id, status):
+        self.remove_operator(op_id)
+        self.__operators[op_id] = [status, self.__clock(), None]
+        if status is not OFFLINE:
+            self.__logged_in += 1
+
+    def add_operators(self, operators):
+        """ Start the status times of many operators at once (a roster), with one clock reading """
+        now = self.__clock()
+        for op in operators:
+            self.remove_operator(op.get_op_id())
+            self.__operators[op.get_op_id()] = [op.get_status(), now, None]
+            if op.get_status() is not OFFLINE:
+                self.__logged_in += 1
+
+    def remove_operator(self, op_id):
+        """ Forget the status times of an operator that was removed """
+        operator = self.__operators.pop(op_id, None)
+        if operator is not None and operator[0] is not OFFLINE:
+            self.__logged_in -= 1
+
+    def operator_status(self, op_id, status):
+        """ Account the time the operator spent in its previous status, observing the ring time when it stops ringing """
+        operator = self.__operators.get(op_id)
+        now = self.__clock()
+
+        if operator is None:
+            self.add_operator(op_id, status)
+            return
+
+        elapsed = now - operator[1]
+        previous = operator[0]
+
+        if previous is RINGING and status is not RINGING:
+            self.__ring_time.observe(elapsed)
+            average = self.__ring_average
+            self.__ring_average = elapsed if average is None else average + self.ALPHA * (elapsed - average)
+        elif previous is BUSY and status is not BUSY:
+            average = self.__handle_average
+            self.__handle_average = elapsed if average is None else average + self.ALPHA * (elapsed - average)
+
+        if previous is OFFLINE:
+            if status is not OFFLINE:
+                self.__logged_in += 1
+        elif status is OFFLINE:
+            self.__logged_in -= 1
+
+        if operator[2] is None:
+            operator[2] = dict()
+        operator[2][operator[0]] = operator[2].get(operator[0], 0) + elapsed
+        operator[0] = status
+        operator[1] = now
+
+    def estimate_wait(self, ahead):
+        """
+        Return how many seconds a call with "ahead" calls queued before it should wait, or None while it cannot be told
+        (no ring or handle time observed yet, or no operator logged in)
+
+        Every logged-in operator takes a new call once per ring time plus handle time, and the calls ahead that will hang up
+        while waiting (the abandonment rate) take none, so the call rings after (ahead * (1 - abandonment) + 1) of those turns, shared by the operators.
+        """
+        if self.__ring_average is None or self.__handle_average is None or not self.__logged_in:
+            return None
+
+        abandonment = self.__abandonment or 0
+        return (ahead * (1 - abandonment) + 1) * (self.__ring_average + self.__handle_average) / self.__logged_in
+
+    def get_state(self, queue_depth):
+        """ Return every metric as JSON-serializable data """
+        now = self.__clock()
+        operators = dict()
+
+        for op_id, (status, since, seconds) in self.__operators.items():
+            seconds = {STATUS_NAMES[key]: value for key, value in (seconds or {}).items()}
+            status = STATUS_NAMES[status]
+            seconds[status] = seconds.get(status, 0) + now - since
+            total = sum(seconds.values()) - seconds.get("offline", 0)
+            occupied = seconds.get("ringing", 0) + seconds.get("busy", 0)
+            operators[op_id] = {
+                "status": status,
+                "seconds": seconds,
+                "occupancy": occupied / total if total else 0
+            }
+
+        return {
+            "queue_depth": queue_depth,
+            "actions": dict(self.__actions),
+            "time_in_queue": self.__time_in_queue.get_state(),
+            "ring_time": self.__ring_time.get_state(),
+            "averages": {
+                "ring_time": self.__ring_average,
+                "handle_time": self.__handle_average,
+                "abandonment": self.__abandonment
+            },
+            "operators": operators
+        }
+
+
+def format_stats(stats):
+    """ Render the stats of one call center as text lines """
+    lines = [f"Queue depth {stats['queue_depth']}"]
+    lines.append("Actions " + ", ".join(f"{action} {count}" for action, count in sorted(stats["actions"].items())))
+
+    for name in ("time_in_queue", "ring_time"):
+        histogram = stats[name]
+        average = histogram["sum"] / histogram["count"] if histogram["count"] else 0
+        lines.append(f"{name.replace('_', ' ').capitalize()} count {histogram['count']}, average {average:.2f}s")
+
+    averages = stats["averages"]
+    if averages["ring_time"] is not None or averages["handle_time"] is not None:
+        lines.append(
+            f"Averages ring time {averages['ring_time'] or 0:.2f}s, handle time {averages['handle_time'] or 0:.2f}s, "
+            f"abandonment {averages['abandonment'] or 0:.0%}"
+        )
+
+    for op_id, operator in stats["operators"].items():
+        lines.append(f"Operator {op_id} {operator['status']}, occupancy {operator['occupancy']:.0%}")
+
+    return "\n".join(lines)
+
+def render_prometheus(registry):
+    """ Render the metrics of every tenant of a Call_center_registry in the Prometheus text exposition format """
+    lines = [
+        "# TYPE call_center_queue_depth gauge",
+        "# TYPE call_center_actions_total counter",
+        "# TYPE call_center_time_in_queue_seconds histogram",
+        "# TYPE call_center_ring_time_seconds histogram",
+        "# TYPE call_center_operator_status_seconds_total counter",
+        "# TYPE call_center_average gauge"
+    ]
+
+    for tenant, call_center in registry.items():
+        stats = call_center.get_stats()
+        labels = f'tenant="{escape_label(tenant)}"'
+        lines.append(f"call_center_queue_depth{{{labels}}} {stats['queue_depth']}")
+
+        for action, count in stats["actions"].items():
+            lines.append(f'call_center_actions_total{{{labels},action="{action}"}} {count}')
+
+        for name in ("time_in_queue", "ring_time"):
+            histogram = stats[name]
+            for bound, count in histogram["buckets"]:
+                lines.append(f'call_center_{name}_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"call_center_{name}_seconds_sum{{{labels}}} {histogram['sum']}")
+            lines.append(f"call_center_{name}_seconds_count{{{labels}}} {histogram['count']}")
+
+        for name, value in stats["averages"].items():
+            if value is not None:
+                lines.append(f'call_center_average{{{labels},name="{name}"}} {value}')
+
+        for op_id, operator in stats["operators"].items():
+            for status, seconds in operator["seconds"].items():
+                lines.append(f'call_center_operator_status_seconds_total{{{labels},operator="{escape_label(op_id)}",status="{status}"}} {seconds}')
+
+    return "\n".join(lines) + "\n"
+
+def escape_label(value):
+    return f"{value}".replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,297 @@
+from records import AVAILABLE, OFFLINE
+
+class Operator_index():
+    """
+    Operator_index keeps the operators of a call center indexed for dispatch
+
+    Every operator gets a rank (its position in the operators list) and the index keeps:
+        * a dict by op_id
+        * a bitmask of the available operators (bit n set means the operator with rank n is available)
+        * a bitmask per call_id of the operators that rejected that call
+        * a bitmask per skill of the operators that have it
+
+    With them the least-rejecting available operator for a call is found without scanning every operator,
+    and ties are broken by rank, exactly like a scan over the operators list would do.
+
+    The operators eligible for a set of required skills are the AND of the bitmasks of those skills, cached per skill set until
+    the operators or their skills change. When no operator has them all, the call falls back to the operators that have the most of them
+    (every operator when nobody has any), so it is never stuck waiting for an operator that does not exist.
+    Offline operators still count as eligible: a call that needs them waits until one logs in.
+
+    Ranks are never reused, so an operator added at runtime comes after every existing one and a removed one leaves a hole.
+    Bulk loads (extend) build every bitmask in one pass instead of one OR per operator.
+
+    Once take_changes was called, the operators added, removed or whose status or skills changed are tracked until the next call,
+    for snapshots (see snapshot.py). The call of an operator only changes with its status, so it needs no tracking of its own.
+    """
+
+    MAX_CACHED_SKILL_SETS = 4096
+
+    def __init__(self, operators):
+        self.__operators = dict()
+        self.__ranks = dict()
+        self.__by_rank = dict()
+        self.__next_rank = 0
+        self.__available = 0
+        self.__offline = 0
+        self.__all = 0
+        self.__rejectors = dict()
+        self.__skilled = dict()
+        self.__eligible = dict()
+        self.__changed = None
+
+        self.extend(operators)
+
+    def __len__(self):
+        """ Return the number of operators """
+        return len(self.__operators)
+
+    def __iter__(self):
+        """ Iterate over the operators in rank order """
+        return iter(self.__operators.values())
+
+    def add(self, operator):
+        """ Add an operator after the existing ones """
+        self.extend([operator])
+
+    def extend(self, operators):
+        """ Add operators after the existing ones, building the bitmasks of the whole batch at once, nothing is added if an op_id is taken """
+        operators = list(operators)
+        op_ids = [operator.get_op_id() for operator in operators]
+        if len(set(op_ids)) < len(op_ids) or not self.__operators.keys().isdisjoint(op_ids):
+            taken = set(self.__operators)
+            for op_id in op_ids:
+                if op_id in taken:
+                    raise ValueError(f"Operator {op_id} already exists")
+                taken.add(op_id)
+
+        first = self.__next_rank
+        self.__next_rank += len(operators)
+        statuses = {AVAILABLE: [], OFFLINE: []}
+        skilled = dict()
+
+        for rank, op_id, operator in zip(range(first, self.__next_rank), op_ids, operators):
+            self.__operators[op_id] = operator
+            self.__ranks[op_id] = rank
+            self.__by_rank[rank] = operator
+
+            status = statuses.get(operator.get_status())
+            if status is not None:
+                status.append(rank)
+            for skill in operator.get_skills():
+                skilled.setdefault(skill, []).append(rank)
+            for call_id in operator.get_rejected_calls():
+                self.__rejectors[call_id] = self.__rejectors.get(call_id, 0) | 1 << rank
+            if self.__changed is not None:
+                self.changed(op_id)
+
+        self.__all |= ((1 << len(operators)) - 1) << first
+        self.__available |= bitmask(statuses[AVAILABLE])
+        self.__offline |= bitmask(statuses[OFFLINE])
+        for skill, ranks in skilled.items():
+            self.__skilled[skill] = self.__skilled.get(skill, 0) | bitmask(ranks)
+        self.__eligible.clear()
+
+    def remove(self, operator):
+        """ Remove an operator, clearing its bit from every bitmask (the call center hands its call back to the queue first) """
+        op_id = operator.get_op_id()
+        rank = self.__ranks.pop(op_id)
+        bit = 1 << rank
+        del self.__operators[op_id]
+        del self.__by_rank[rank]
+        if self.__changed is not None:
+            self.changed(op_id)
+        self.__all &= ~bit
+        self.__available &= ~bit
+        self.__offline &= ~bit
+
+        for call_id in operator.get_rejected_calls():
+            self.unmark_rejector(call_id, bit)
+
+        for skill in operator.get_skills():
+            operators = self.__skilled[skill] & ~bit
+            if operators:
+                self.__skilled[skill] = operators
+            else:
+                del self.__skilled[skill]
+        self.__eligible.clear()
+
+    def find(self, op_id):
+        """ Return the operator with op_id, or None """
+        return self.__operators.get(op_id)
+
+    def set_status(self, operator, status):
+        """ Set the operator status, keeping the available bitmask up to date """
+        operator.set_status(status)
+        bit = 1 << self.__ranks[operator.get_op_id()]
+        if self.__changed is not None:
+            self.changed(operator.get_op_id())
+
+        if status is AVAILABLE:
+            self.__available |= bit
+        else:
+            self.__available &= ~bit
+
+        if status is OFFLINE:
+            self.__offline |= bit
+        else:
+            self.__offline &= ~bit
+
+    def set_skills(self, operator, skills):
+        """ Replace the operator skills, keeping the skill bitmasks up to date """
+        bit = 1 << self.__ranks[operator.get_op_id()]
+
+        for skill in operator.get_skills():
+            operators = self.__skilled[skill] & ~bit
+            if operators:
+                self.__skilled[skill] = operators
+            else:
+                del self.__skilled[skill]
+
+        operator.set_skills(skills)
+        self.mark_skills(operator.get_skills(), bit)
+        if self.__changed is not None:
+            self.changed(operator.get_op_id())
+
+    def changed(self, op_id):
+        """ Track an operator that was added, removed or changed """
+        self.__changed.add(op_id)
+        if len(self.__changed) > 2 * len(self.__operators) + 1000:
+            self.__changed = None
+
+    def take_changes(self):
+        """
+        Return ({op_id: (status, call_id, skills) or None when it was removed}, complete) of the operators that changed since the last call,
+        or of every operator with complete True the first time (and after tracking was dropped)
+        """
+        changed = self.__changed
+        self.__changed = set()
+
+        if changed is None:
+            return {op_id: (op.get_status(), op.get_call_id(), op.get_skills()) for op_id, op in self.__operators.items()}, True
+
+        changes = dict()
+        for op_id in sorted(changed, key=lambda op_id: self.__ranks.get(op_id, -1)):
+            op = self.__operators.get(op_id)
+            changes[op_id] = (op.get_status(), op.get_call_id(), op.get_skills()) if op is not None else None
+        return changes, False
+
+    def mark_skills(self, skills, bit):
+        for skill in skills:
+            self.__skilled[skill] = self.__skilled.get(skill, 0) | bit
+        self.__eligible.clear()
+
+    def eligible(self, skills):
+        """ Return the bitmask of the operators a call requiring skills can be routed to """
+        operators = self.__eligible.get(skills)
+
+        if operators is None:
+            operators = self.__all
+            for skill in skills:
+                operators &= self.__skilled.get(skill, 0)
+
+            if not operators:
+                operators = self.closest(skills)
+
+            if len(self.__eligible) >= self.MAX_CACHED_SKILL_SETS:
+                self.__eligible.clear()
+            self.__eligible[skills] = operators
+
+        return operators
+
+    def closest(self, skills):
+        """ Return the bitmask of the operators that have the most of skills, every operator if nobody has any """
+        counts = dict()
+
+        for skill in skills:
+            operators = self.__skilled.get(skill, 0)
+            while operators:
+                lowest = operators & -operators
+                operators ^= lowest
+                counts[lowest] = counts.get(lowest, 0) + 1
+
+        if not counts:
+            return self.__all
+
+        most = max(counts.values())
+        return sum(bit for bit, count in counts.items() if count == most)
+
+    def has_available(self):
+        """ Return True if at least one operator is available """
+        return self.__available != 0
+
+    def all_available(self):
+        """ Return True if every operator is available or offline """
+        return self.__available | self.__offline == self.__all
+
+    def add_rejection(self, operator, call_id):
+        """
+        Add 1 into the operator rejections for call_id and mark the operator as a rejector of that call
+
+        If the operator had to forget its oldest rejected call to stay under its cap, it is unmarked as a rejector of that call too
+        """
+        evicted = operator.add_rejection(call_id)
+        bit = 1 << self.__ranks[operator.get_op_id()]
+        self.__rejectors[call_id] = self.__rejectors.get(call_id, 0) | bit
+
+        if evicted is not None:
+            self.unmark_rejector(evicted, bit)
+
+    def unmark_rejector(self, call_id, bit):
+        rejectors = self.__rejectors.get(call_id, 0) & ~bit
+        if rejectors:
+            self.__rejectors[call_id] = rejectors
+        else:
+            self.__rejectors.pop(call_id, None)
+
+    def forget_call(self, call_id):
+        """ Drop the rejections of a call that ended, from the index and from every operator that rejected it """
+        rejectors = self.__rejectors.pop(call_id, 0)
+
+        while rejectors:
+            lowest = rejectors & -rejectors
+            rejectors ^= lowest
+            self.__by_rank[lowest.bit_length() - 1].forget_rejections(call_id)
+
+    def best_operator(self, call_id, skills=None):
+        """
+        Return the available operator with the lowest rejection for call_id among the ones eligible for skills, or None if none is available
+
+        Operators that never rejected the call come first (lowest rank wins), otherwise the available rejector
+        with the fewest rejections is chosen (lowest rank wins on a tie).
+        """
+        available = self.__available
+        if skills:
+            available &= self.eligible(skills)
+
+        rejectors = self.__rejectors.get(call_id, 0)
+        candidates = available & ~rejectors
+
+        if candidates:
+            return self.__by_rank[(candidates & -candidates).bit_length() - 1]
+
+        candidates = available & rejectors
+        min_rejections = None
+        min_rejections_op = None
+
+        while candidates:
+            lowest = candidates & -candidates
+            candidates ^= lowest
+            op = self.__by_rank[lowest.bit_length() - 1]
+            call_rejections = op.get_rejections(call_id)
+
+            if min_rejections == None or min_rejections > call_rejections:
+                min_rejections = call_rejections
+                min_rejections_op = op
+
+        return min_rejections_op
+
+def bitmask(ranks):
+    """ Return the int with the bits of ranks set, built from bytes in one pass """
+    if not ranks:
+        return 0
+
+    data = bytearray(max(ranks) // 8 + 1)
+    for rank in ranks:
+        data[rank >> 3] |= 1 << (rank & 7)
+    return int.from_bytes(data, "little")
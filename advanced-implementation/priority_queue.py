@@ -0,0 +1,93 @@
+import heapq
+from collections import deque
+from records import QUEUED, ENDED
+
+class Priority_queue():
+    """
+    Priority_queue keeps waiting call records (see records.Call_record) ordered by key, the lowest key first and the lowest sequence first on equal keys
+
+    The key of a call is its virtual arrival time (arrival time minus the credit of its priority), so a high priority call
+    overtakes the calls that arrived less than its credit before it, and a low priority call ages: the calls arriving later
+    get later keys, it reaches the front without any re-sort.
+
+    A record is live while its state is QUEUED, the queue only counts them.
+    Records pushed in order (calls of one priority arriving one after the other) are appended to a deque "run" in O(1),
+    the others (a priority call that overtakes, a rejected call that keeps its key) go to a heap of (key, sequence, record) in O(log n).
+    The front is the lowest of the run head and the heap top. Removal from either end of the run or from the heap top is O(1),
+    removal from the middle (a hangup while waiting) only marks the record ENDED:
+    the run and the heap skip it when it reaches their front, and are rebuilt when more than half of them is dead.
+    A record removed from the middle must not be pushed again (Call_registry queues a copy), the ones taken from the front can.
+    """
+
+    def __init__(self):
+        self.__size = 0
+        self.__run = deque()
+        self.__tail = None
+        self.__heap = []
+
+    def __len__(self):
+        """ Return the number of queued records """
+        return self.__size
+
+    def items(self):
+        """ Return [(key, sequence, record), ...] of every queued record, in no particular order """
+        items = [(record.key, record.sequence, record) for record in self.__run if record.state is QUEUED]
+        items.extend(entry for entry in self.__heap if entry[2].state is QUEUED)
+        return items
+
+    def push(self, record):
+        """ Queue a record that is not in a queue, by its key and sequence """
+        record.state = QUEUED
+        self.__size += 1
+
+        tail = self.__tail
+        if tail is None or (record.key, record.sequence) > (tail.key, tail.sequence):
+            self.__run.append(record)
+            self.__tail = record
+        else:
+            heapq.heappush(self.__heap, (record.key, record.sequence, record))
+
+    def first(self):
+        """ Return the front record, or None if the queue is empty """
+        run = self.__run
+        heap = self.__heap
+
+        while run and run[0].state is not QUEUED:
+            run.popleft()
+        while heap and heap[0][2].state is not QUEUED:
+            heapq.heappop(heap)
+
+        if not run:
+            self.__tail = None
+            return heap[0][2] if heap else None
+        if heap:
+            front = run[0]
+            if heap[0][:2] < (front.key, front.sequence):
+                return heap[0][2]
+        return run[0]
+
+    def pop(self, record):
+        """ Remove a queued record from anywhere in the queue, marking it ENDED, return False if it was not queued """
+        if record.state is not QUEUED:
+            return False
+        record.state = ENDED
+        self.__size -= 1
+
+        run = self.__run
+        heap = self.__heap
+        if run and run[0] is record:
+            run.popleft()
+            if not run:
+                self.__tail = None
+        elif run and run[-1] is record:
+            run.pop()
+            self.__tail = run[-1] if run else None
+        elif heap and heap[0][2] is record:
+            heapq.heappop(heap)
+        elif len(run) + len(heap) > 2 * self.__size + 16:
+            self.__run = deque(live for live in run if live.state is QUEUED)
+            self.__tail = self.__run[-1] if self.__run else None
+            self.__heap = [live for live in heap if live[2].state is QUEUED]
+            heapq.heapify(self.__heap)
+
+        return True
@@ -0,0 +1,59 @@
+"""
+Compact records of the call center: the int enum statuses of operators and calls, and the slotted call record
+
+Statuses are IntEnum members, compared by identity or as small ints instead of strings. Their lower case names
+("available", "ringing", ...) are what states, metrics and roster files carry, see STATUS_NAMES and STATUSES.
+"""
+
+from enum import IntEnum
+
+NO_SKILLS = frozenset()
+
+class Status(IntEnum):
+    """ Status of an operator """
+    AVAILABLE = 0
+    RINGING = 1
+    BUSY = 2
+    OFFLINE = 3
+
+class Call_state(IntEnum):
+    """ State of a call record: waiting in a queue, with an operator, or ended (a record that left a queue is never queued again) """
+    QUEUED = 0
+    RINGING = 1
+    ANSWERED = 2
+    ENDED = 3
+
+AVAILABLE, RINGING, BUSY, OFFLINE = Status
+QUEUED, CALL_RINGING, ANSWERED, ENDED = Call_state
+
+STATUS_NAMES = {status: status.name.lower() for status in Status}
+STATUSES = {name: status for status, name in STATUS_NAMES.items()}
+
+class Call_record():
+    """
+    One live call: its queue key and sequence (see Priority_queue), the skills it requires, when it was last queued,
+    how many times it rang (attempts), its state and the operator it is with while it rings or is answered
+
+    Records are plain slotted structs, their fields are read and written directly by Call_registry and Priority_queue:
+    a queued call costs one record and no dict or tuple of its own.
+    """
+
+    __slots__ = ("call_id", "key", "sequence", "skills", "enqueued_at", "attempts", "state", "operator")
+
+    def __init__(self, call_id, key, sequence, skills=NO_SKILLS, enqueued_at=0, attempts=0, state=QUEUED, operator=None):
+        self.call_id = call_id
+        self.key = key
+        self.sequence = sequence
+        self.skills = skills
+        self.enqueued_at = enqueued_at
+        self.attempts = attempts
+        self.state = state
+        self.operator = operator
+
+    def __lt__(self, other):
+        """ Heap entries (key, sequence, record) only compare records when a record and its ended copy meet, neither comes first """
+        return False
+
+    def copy(self):
+        """ Return a new record with the same fields, for a call whose record is left behind in a queue """
+        return Call_record(self.call_id, self.key, self.sequence, self.skills, self.enqueued_at, self.attempts, self.state, self.operator)
@@ -0,0 +1,251 @@
+"""
+Replay a trace of timestamped commands through the call centers, without the reactor and on a virtual clock
+
+The trace is JSON lines, one command per line, in time order:
+
+    {"time": 12.5, "tenant": "acme", "command": "call", "id": "42"}
+
+"time" is in seconds from any origin, "tenant" is optional (default tenant) and "command" is call, answer, reject, hangup, skills,
+add_operator, remove_operator, login or logout. An optional "skills" list is the skills a call requires, or the skills of an operator
+for the skills and add_operator commands,
+and an optional "priority" the priority of a call (see Call_center).
+The virtual clock jumps from one command to the next, so a day of traffic replays as fast as the CPU allows.
+Ring timeouts run on a Timing_wheel ticked by the virtual clock, an unanswered call is ignored exactly when it would be on a live server.
+
+Every response is written to "events" as one JSON line {"time": ..., "tenant": ..., "action": ..., ...},
+and the summary (totals and the metrics of every tenant) to "summary".
+The trace is streamed, memory only grows with the number of tenants and of live calls. With --roster the tenants start with
+the operators of a roster file (see roster.py).
+With --history the call lifecycle events are also recorded in a columnar history (see history.py), stamped with the trace time,
+for the reports of history_report.py.
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from call_center_registry import Call_center_registry
+from roster import read_roster
+from timing_wheel import Timing_wheel
+from history import History
+
+COMMANDS = ("call", "answer", "reject", "hangup", "skills", "add_operator", "remove_operator", "login", "logout")
+OPERATOR_COMMANDS = ("answer", "reject", "skills", "remove_operator", "login", "logout")
+RING_ENDING_ACTIONS = ("answered", "reject", "missed", "finished", "operator_removed", "logged_out")
+
+class Virtual_clock():
+    """ A clock that only moves when told to, callable like time.monotonic """
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Replay():
+    """
+    Replay drives a Call_center_registry from commands and a virtual clock
+
+    "feed" runs one command at its time, firing the ring timeouts that expire before it first,
+    and every response goes to "emit(time, tenant, response)"
+    """
+
+    def __init__(self, emit, ring_timeout=10, max_rejections=None, tick=0.1, max_tenants=10 ** 6):
+        self.clock = Virtual_clock()
+        self.registry = Call_center_registry(max_tenants=max_tenants, ring_timeout=ring_timeout, clock=self.clock, max_rejections=max_rejections)
+        self.wheel = Timing_wheel(tick)
+        self.ticks = 0
+        self.ring_timers = dict()
+        self.emit = emit
+        self.commands = 0
+        self.invalid = 0
+        self.start = None
+
+    def advance_to(self, now):
+        """ Move the virtual clock to now, ticking the wheel through every ring timeout that expires on the way """
+        tick = self.wheel.get_tick()
+        target = math.floor(now / tick)
+
+        while self.ticks < target:
+            if len(self.wheel) == 0:
+                self.ticks = target
+                break
+            self.ticks += 1
+            self.clock.now = max(self.clock.now, round(self.ticks * tick, 6))
+            self.wheel.advance()
+
+        self.clock.now = max(self.clock.now, now)
+
+    def drain(self):
+        """ Let every ringing call ring until it is answered by no one, until no ring timeout is left """
+        tick = self.wheel.get_tick()
+
+        while len(self.wheel):
+            self.ticks += 1
+            self.clock.now = max(self.clock.now, round(self.ticks * tick, 6))
+            self.wheel.advance()
+
+    def feed(self, now, tenant, command, id, skills=None, priority=None):
+        """
+        Run a command at virtual time now, with the skills of a call, skills or add_operator command and the priority of a call,
+        return False if it is not valid
+        """
+        if self.start is None:
+            self.start = now
+            self.ticks = math.floor(now / self.wheel.get_tick())
+            self.clock.now = now
+
+        self.advance_to(now)
+        tenant = tenant or self.registry.DEFAULT_TENANT
+        call_center = self.registry.get(tenant)
+
+        if (call_center is None or command not in COMMANDS or (command in OPERATOR_COMMANDS and call_center.find_operator(id) is None)
+                or (command == "add_operator" and call_center.find_operator(id) is not None)
+                or (command == "call" and call_center.has_call(id))
+                or (priority is not None and not call_center.has_priority(priority))):
+            self.invalid += 1
+            return False
+
+        self.commands += 1
+        if command == "call":
+            self.handle(call_center, call_center.call(id, skills, priority))
+        elif command in ("skills", "add_operator"):
+            self.handle(call_center, getattr(call_center, command)(id, skills or ()))
+        else:
+            self.handle(call_center, getattr(call_center, command)(id))
+        return True
+
+    def handle(self, call_center, responses):
+        """ Start or cancel the ring timeouts of the responses and emit them """
+        for obj in responses:
+            if obj["action"] == "ringing":
+                self.start_ring_timer(call_center, obj["call_id"], obj["operator_id"])
+            elif obj["action"] in RING_ENDING_ACTIONS:
+                timer = self.ring_timers.pop((call_center, obj.get("call_id")), None)
+                if timer is not None:
+                    timer.cancel()
+            self.emit(self.clock.now, call_center.get_name(), obj)
+
+    def start_ring_timer(self, call_center, call_id, operator_id):
+        timer = self.ring_timers.pop((call_center, call_id), None)
+        if timer is not None:
+            timer.cancel()
+        self.ring_timers[(call_center, call_id)] = self.wheel.schedule(
+            call_center.get_ring_timeout(operator_id), self.ring_timed_out, call_center, call_id, operator_id
+        )
+
+    def ring_timed_out(self, call_center, call_id, operator_id):
+        del self.ring_timers[(call_center, call_id)]
+        self.handle(call_center, call_center.verify_ignored(call_id, operator_id) or [])
+
+    def get_summary(self):
+        """ Return the totals of the replay and the metrics of every tenant """
+        tenants = {tenant: call_center.get_stats() for tenant, call_center in self.registry.items()}
+        actions = dict()
+        histograms = {"time_in_queue": [0, 0], "ring_time": [0, 0]}
+
+        for stats in tenants.values():
+            for action, count in stats["actions"].items():
+                actions[action] = actions.get(action, 0) + count
+            for name, total in histograms.items():
+                total[0] += stats[name]["sum"]
+                total[1] += stats[name]["count"]
+
+        return {
+            "commands": self.commands,
+            "invalid": self.invalid,
+            "virtual_seconds": self.clock.now - self.start if self.start is not None else 0,
+            "actions": actions,
+            "average_time_in_queue": histograms["time_in_queue"][0] / histograms["time_in_queue"][1] if histograms["time_in_queue"][1] else 0,
+            "average_ring_time": histograms["ring_time"][0] / histograms["ring_time"][1] if histograms["ring_time"][1] else 0,
+            "tenants": tenants
+        }
+
+
+def read_trace(lines):
+    """ Yield (time, tenant, command, id, skills, priority) from JSON lines, a line that can not be parsed yields None """
+    decode = json.JSONDecoder().decode
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            entry = decode(line)
+            skills = entry.get("skills")
+            if skills is not None and skills.__class__ is not list:
+                raise TypeError("skills must be a list")
+            yield float(entry["time"]), entry.get("tenant"), entry["command"], f'{entry["id"]}', skills, entry.get("priority")
+        except (ValueError, TypeError, KeyError):
+            yield None
+
+def run(trace, events, ring_timeout, max_rejections, tick, drain, roster=None, history=None):
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    write = events.write if events is not None else None
+    record = history.record if history is not None else None
+    emitted = [0]
+
+    def emit(now, tenant, obj):
+        emitted[0] += 1
+        if write is not None:
+            write(dumps({"time": now, "tenant": tenant, **obj}) + "\n")
+        if record is not None:
+            record(now, tenant, obj)
+
+    replay = Replay(emit, ring_timeout, max_rejections, tick)
+    if roster:
+        replay.registry.provision(read_roster(roster))
+    start = time.perf_counter()
+
+    for entry in read_trace(trace):
+        if entry is None:
+            replay.invalid += 1
+        else:
+            replay.feed(*entry)
+
+    if drain:
+        replay.drain()
+
+    elapsed = time.perf_counter() - start
+    summary = replay.get_summary()
+    summary.update({"events": emitted[0], "elapsed": elapsed, "commands_per_second": summary["commands"] / elapsed if elapsed else 0})
+    return summary
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="JSONL trace file, - for stdin")
+    parser.add_argument("--events", help="file the response events are written to, - for stdout, not written without it")
+    parser.add_argument("--summary", help="file the JSON summary is written to")
+    parser.add_argument("--ring-timeout", type=float, default=10, help="seconds a call rings before it is ignored")
+    parser.add_argument("--max-rejections", type=int, help="calls whose rejections each operator remembers at most")
+    parser.add_argument("--tick", type=float, default=0.1, help="resolution of the ring timeouts in seconds")
+    parser.add_argument("--drain", action="store_true", help="at the end of the trace, let the calls still ringing time out")
+    parser.add_argument("--roster", help="CSV or JSON file of the operators the tenants start with, A and B without it")
+    parser.add_argument("--history", help="directory of the columnar history the call lifecycle events are appended to")
+    args = parser.parse_args()
+
+    trace = sys.stdin if args.trace == "-" else open(args.trace, buffering=2 ** 20)
+    events = None
+    if args.events == "-":
+        events = sys.stdout
+    elif args.events:
+        events = open(args.events, "w", buffering=2 ** 20)
+    history = History(args.history) if args.history else None
+
+    try:
+        summary = run(trace, events, args.ring_timeout, args.max_rejections, args.tick, args.drain, args.roster, history)
+    finally:
+        for stream in (trace, events, history):
+            if stream not in (None, sys.stdin, sys.stdout):
+                stream.close()
+
+    if args.summary:
+        with open(args.summary, "w") as output:
+            json.dump(summary, output)
+
+    report = sys.stderr if events is sys.stdout else sys.stdout
+    print(f"replayed {summary['commands']:,} commands ({summary['invalid']:,} invalid) over {summary['virtual_seconds']:,.1f} virtual seconds "
+          f"in {summary['elapsed']:.2f}s, {summary['commands_per_second']:,.0f} commands/s, {summary['events']:,} events", file=report)
+    print("actions " + ", ".join(f"{action} {count}" for action, count in sorted(summary["actions"].items())), file=report)
+    print(f"average time in queue {summary['average_time_in_queue']:.2f}s, average ring time {summary['average_ring_time']:.2f}s", file=report)
@@ -0,0 +1,409 @@
+"""
+Multi-process call center: a supervisor, "shards" shard workers and "routers" routers
+
+    python sharded_server.py --port 5678 --shards 4 --routers 2
+
+Every shard worker is a plain call_center_queue.py process listening on shard_port + n, it owns the tenants whose crc32 modulo "shards" is n,
+so each Call_center still lives in exactly one single-threaded reactor. With --journal every shard journals to its own sub-directory,
+with --history it records its own history (report on each shard-n sub-directory), and with --metrics-port it is scraped on metrics_port + n.
+The other server options (--max-queue, the --ring-timeout of tenants, --max-rejections, --command-rate, --max-lag, --trace-every, --profile-dir) are passed on to every shard.
+
+Routers listen together on "port" (SO_REUSEPORT, the kernel spreads the client connections over them) and speak the same protocol as a shard.
+Each command line is sent to the shard of its tenant over a connection the router keeps per client connection and shard,
+and the responses are sent back in the order of the commands, so a client can not tell it is not talking to a single server.
+The router tags every command with its own request id for that and puts back the client one, if any, in the response.
+Notifications (calls ignored after a ring timeout) and subscription feeds are passed through as they come.
+The json and structured encodings are routed, the binary encoding is not.
+
+The supervisor restarts any worker that exits, until it is stopped.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import zlib
+from collections import OrderedDict
+from twisted.internet import protocol
+from twisted.internet import reactor
+from twisted.internet.endpoints import TCP4ClientEndpoint
+from twisted.protocols.basic import LineReceiver
+from call_center_registry import Call_center_registry
+from call_center_service import parse_tenant_values
+import wire_codec
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MISSING = object()
+
+def shard_of(tenant, shards):
+    """ Return the shard that owns tenant, the same in every process and across restarts """
+    return zlib.crc32((tenant or Call_center_registry.DEFAULT_TENANT).encode()) % shards
+
+def listen_shared(port, factory):
+    """ Listen on port with SO_REUSEPORT, so several processes accept connections on it """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("", port))
+    sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+
+    try:
+        return reactor.adoptStreamPort(sock.fileno(), socket.AF_INET, factory)
+    finally:
+        sock.close()
+
+
+#----/ router /----
+
+class shard_connection(LineReceiver):
+    """ The connection of one client connection of a router to one shard """
+
+    delimiter = b"\n"
+    MAX_LENGTH = 2 ** 20
+
+    def __init__(self, client, shard):
+        self.client = client
+        self.shard = shard
+
+    def dataReceived(self, data):
+        LineReceiver.dataReceived(self, data)
+        self.client.flushSlots()
+
+    def lineReceived(self, line):
+        self.client.shard_line(self.shard, line)
+
+    def connectionLost(self, reason):
+        self.client.shard_lost(self.shard)
+
+
+class shard_reader():
+    """
+    Streaming producer of the client transport of a router connection (the Twisted IPushProducer methods)
+
+    While the client does not read what it is sent, the shard connections are not read either, so the feed lines
+    and responses of a slow client wait in the shards, where a subscriber backlog is bounded (see event_subscriber)
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def pauseProducing(self):
+        self.client.read_shards(False)
+
+    def resumeProducing(self):
+        self.client.read_shards(True)
+
+    def stopProducing(self):
+        pass
+
+
+class router_server(LineReceiver):
+    """
+    A client connection of a router
+
+    Commands get a router request id "seq" and a slot in "slots", responses fill their slot
+    and the slots are written from the oldest one as soon as it is filled.
+    The shard connections are read only while the client transport is not full, see shard_reader.
+    """
+
+    delimiter = b"\n"
+    MAX_LENGTH = 2 ** 20
+
+    def connectionMade(self):
+        self.shard_ports = self.factory.shard_ports
+        self.shards = [None] * len(self.shard_ports)
+        self.queued = [[] for _ in self.shard_ports]
+        self.slots = OrderedDict()
+        self.requests = dict()
+        self.next_seq = 0
+        self.encoding = "json"
+        self.encoding_requests = dict()
+        self.closed = False
+        self.reading_shards = True
+        self.transport.registerProducer(shard_reader(self), True)
+
+    def read_shards(self, reading):
+        """ Resume or pause reading every shard connection """
+        self.reading_shards = reading
+        for shard in self.shards:
+            if shard is not None:
+                if reading:
+                    shard.transport.resumeProducing()
+                else:
+                    shard.transport.pauseProducing()
+
+    def connectionLost(self, reason):
+        self.closed = True
+        for shard in self.shards:
+            if shard is not None:
+                shard.transport.loseConnection()
+
+    def dataReceived(self, data):
+        LineReceiver.dataReceived(self, data)
+        self.flushSlots()
+
+    def lineReceived(self, line):
+        if not line.strip():
+            return
+
+        try:
+            data = json.loads(line)
+            command, id, tenant = data["command"], data["id"], data.get("tenant")
+            if tenant is not None and tenant.__class__ is not str:
+                raise TypeError("tenant must be a string")
+        except (ValueError, TypeError, KeyError):
+            self.sendError("Invalid command", None)
+            return
+
+        client_request_id = data.get("request_id", MISSING)
+
+        if command == "encoding":
+            self.set_encoding(data, id, client_request_id)
+        else:
+            self.forward(shard_of(tenant, len(self.shard_ports)), data, client_request_id)
+
+    def set_encoding(self, data, encoding, client_request_id):
+        """
+        Switch the encoding of every shard connection, only the first confirmation is sent back
+
+        The router takes the encoding once shard 0 confirmed it, and switches every shard connection opened later to it
+        (a shard that was restarted is reconnected in json)
+        """
+        if encoding == "binary":
+            self.sendError("Encoding binary is not available through the router", client_request_id)
+            return
+
+        self.encoding_requests[self.forward(0, data, client_request_id)] = encoding
+        for shard in range(1, len(self.shard_ports)):
+            self.forward(shard, dict(data), None, discard=True)
+
+    def request_line(self, shard, data, client_request_id, discard):
+        """ Tag a command for a shard with a router request id, keeping a slot for its response unless it is discarded, return (seq, line) """
+        seq = self.next_seq
+        self.next_seq += 1
+        data["request_id"] = seq
+        self.requests[seq] = (shard, client_request_id, discard)
+        if not discard:
+            self.slots[seq] = None
+        return seq, json.dumps(data).encode()
+
+    def forward(self, shard, data, client_request_id, discard=False):
+        """ Send a command to a shard with a router request id, return the request id """
+        seq, line = self.request_line(shard, data, client_request_id, discard)
+
+        if self.shards[shard] is None:
+            if not self.queued[shard]:
+                self.connect(shard)
+            self.queued[shard].append(line)
+        else:
+            self.shards[shard].sendLine(line)
+        return seq
+
+    def connect(self, shard):
+        endpoint = TCP4ClientEndpoint(reactor, "127.0.0.1", self.shard_ports[shard])
+        d = endpoint.connect(protocol.Factory.forProtocol(lambda: shard_connection(self, shard)))
+        d.addCallbacks(self.shard_connected, self.shard_failed, callbackArgs=(shard,), errbackArgs=(shard,))
+
+    def shard_connected(self, connection, shard):
+        if self.closed:
+            connection.transport.loseConnection()
+            return
+
+        self.shards[shard] = connection
+        if not self.reading_shards:
+            connection.transport.pauseProducing()
+        lines = self.queued[shard]
+        self.queued[shard] = []
+        if self.encoding != "json":
+            lines.insert(0, self.request_line(shard, {"command": "encoding", "id": self.encoding}, None, True)[1])
+        connection.transport.write(b"".join(line + b"\n" for line in lines))
+
+    def shard_failed(self, reason, shard):
+        self.queued[shard] = []
+        self.shard_lost(shard)
+
+    def shard_line(self, shard, line):
+        """ Put a shard response in its slot, pass notifications through """
+        data = json.loads(line)
+        seq = data.pop("request_id", None)
+        request = self.requests.pop(seq, None)
+
+        if request is None:
+            self.transport.write(line + b"\n")
+            return
+
+        encoding = self.encoding_requests.pop(seq, None)
+        if encoding is not None and data.get("response") == f"Encoding {encoding}":
+            self.encoding = encoding
+
+        _, client_request_id, discard = request
+        if discard:
+            return
+
+        if client_request_id is not MISSING:
+            data["request_id"] = client_request_id
+        self.slots[seq] = wire_codec.encode_json_response(data)
+
+    def shard_lost(self, shard):
+        """ Answer the commands still waiting for a shard that is gone, it is reconnected with the next command """
+        self.shards[shard] = None
+
+        for seq, (owner, client_request_id, discard) in list(self.requests.items()):
+            if owner == shard:
+                del self.requests[seq]
+                self.encoding_requests.pop(seq, None)
+                if not discard:
+                    self.slots[seq] = self.error_line("Shard unavailable", client_request_id)
+
+        self.flushSlots()
+
+    def sendError(self, message, client_request_id):
+        """ Answer a command in the router, in order with the others """
+        seq = self.next_seq
+        self.next_seq += 1
+        self.slots[seq] = self.error_line(message, client_request_id)
+
+    def error_line(self, message, client_request_id):
+        data = {"responses": [], "error": message} if self.encoding == "structured" else {"response": message}
+        if client_request_id not in (MISSING, None):
+            data["request_id"] = client_request_id
+        return wire_codec.encode_json_response(data)
+
+    def flushSlots(self):
+        """ Write the filled slots from the oldest one in one write """
+        ready = []
+        slots = self.slots
+
+        while slots:
+            seq, data = next(iter(slots.items()))
+            if data is None:
+                break
+            ready.append(data)
+            del slots[seq]
+
+        if ready:
+            self.transport.write(b"".join(ready))
+
+class router_factory(protocol.ServerFactory):
+    """ Builds router_server connections to the shards listening on shard_ports """
+
+    def __init__(self, shard_ports):
+        self.shard_ports = shard_ports
+
+    def buildProtocol(self, addr):
+        p = router_server()
+        p.factory = self
+        return p
+
+
+#----/ supervisor /----
+
+class worker_process(protocol.ProcessProtocol):
+    """ A worker process of the supervisor, its output is discarded """
+
+    def __init__(self, supervisor, args):
+        self.supervisor = supervisor
+        self.args = args
+
+    def processEnded(self, reason):
+        self.supervisor.worker_ended(self)
+
+
+class Supervisor():
+    """ Starts the shard workers and the routers, restarts the ones that exit and stops them all with the reactor, shard_args are added to every shard command line """
+
+    restart_delay = 1
+
+    def __init__(self, port, shards, routers, shard_port, ring_timeout, journal=None, shard_args=(), history=None, metrics_port=None):
+        self.__workers = []
+        self.__processes = []
+        self.__running = False
+        self.__devnull = open(os.devnull, "w")
+        shard_ports = [shard_port + n for n in range(shards)]
+
+        for n, shard in enumerate(shard_ports):
+            args = [sys.executable, os.path.join(HERE, "call_center_queue.py"), "--port", f"{shard}", "--ring-timeout", f"{ring_timeout}"]
+            if journal:
+                args += ["--journal", os.path.join(journal, f"shard-{n}")]
+            if history:
+                args += ["--history", os.path.join(history, f"shard-{n}")]
+            if metrics_port:
+                args += ["--metrics-port", f"{metrics_port + n}"]
+            self.__workers.append(args + list(shard_args))
+
+        for _ in range(routers):
+            self.__workers.append([
+                sys.executable, os.path.abspath(__file__), "--route", "--port", f"{port}",
+                "--shard-ports", ",".join(f"{shard}" for shard in shard_ports)
+            ])
+
+    def start(self):
+        self.__running = True
+        reactor.addSystemEventTrigger("before", "shutdown", self.stop)
+        self.__processes = [self.spawn(args) for args in self.__workers]
+
+    def spawn(self, args):
+        worker = worker_process(self, args)
+        worker.transport = reactor.spawnProcess(worker, args[0], args, env=os.environ, childFDs={0: "w", 1: self.__devnull.fileno(), 2: 2})
+        return worker
+
+    def worker_ended(self, worker):
+        if self.__running:
+            reactor.callLater(self.restart_delay, self.restart, worker)
+
+    def restart(self, worker):
+        if self.__running:
+            self.__processes[self.__processes.index(worker)] = self.spawn(worker.args)
+
+    def stop(self):
+        self.__running = False
+        for worker in self.__processes:
+            try:
+                worker.transport.signalProcess("TERM")
+            except Exception:
+                pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5678)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1, help="shard worker processes, one per core by default")
+    parser.add_argument("--routers", type=int, default=1, help="router processes sharing the port")
+    parser.add_argument("--shard-port", type=int, default=5700, help="port of the first shard, the others follow it")
+    parser.add_argument("--journal", help="directory of the shard journals, state is only kept in memory without it")
+    parser.add_argument("--ring-timeout", action="append", default=[], metavar="[TENANT=]SECONDS",
+                        help="seconds a call rings before it is ignored, 10 by default (or for TENANT, repeatable)")
+    parser.add_argument("--max-queue", action="append", default=[], metavar="[TENANT=]CALLS", help="queue length limit of the shards, see call_center_queue.py")
+    parser.add_argument("--command-rate", type=float, help="commands per second a router connection can send to a shard, unlimited without it")
+    parser.add_argument("--max-lag", type=float, help="seconds a shard reactor can lag before it stops reading, see call_center_queue.py")
+    parser.add_argument("--max-rejections", type=int, help="calls whose rejections each operator remembers at most, unbounded without it")
+    parser.add_argument("--trace-every", type=int, help="sample the stage timings of one command out of N in every shard, see call_center_queue.py")
+    parser.add_argument("--profile-dir", help="directory the shards dump the profiles of the \"profile\" admin command to")
+    parser.add_argument("--history", help="directory of the shard call histories, not recorded without it")
+    parser.add_argument("--metrics-port", type=int, help="Prometheus port of the first shard, the others follow it, disabled without it")
+    parser.add_argument("--route", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--shard-ports", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.route:
+        listen_shared(args.port, router_factory([int(port) for port in args.shard_ports.split(",")]))
+    else:
+        ring_timeout, ring_timeouts = parse_tenant_values(args.ring_timeout, float)
+        shard_args = [f"--max-queue={value}" for value in args.max_queue]
+        shard_args += [f"--ring-timeout={tenant}={seconds}" for tenant, seconds in ring_timeouts.items()]
+        if args.command_rate is not None:
+            shard_args += ["--command-rate", f"{args.command_rate}"]
+        if args.max_lag is not None:
+            shard_args += ["--max-lag", f"{args.max_lag}"]
+        if args.max_rejections is not None:
+            shard_args += ["--max-rejections", f"{args.max_rejections}"]
+        if args.trace_every is not None:
+            shard_args += ["--trace-every", f"{args.trace_every}"]
+        if args.profile_dir is not None:
+            shard_args += ["--profile-dir", args.profile_dir]
+        Supervisor(
+            args.port, args.shards, args.routers, args.shard_port, 10 if ring_timeout is None else ring_timeout, args.journal, shard_args, args.history, args.metrics_port
+        ).start()
+    reactor.run()
@@ -0,0 +1,114 @@
+"""
+Point-in-time views of a call center for reporting (see Call_center.snapshot)
+
+A Versioned_map keeps the view of the queue or of the operators as an immutable base dict plus a log of the changes made after it.
+A snapshot is the base, the log and the log length at that time: later changes are appended after that length and a compaction
+replaces the base and the log instead of touching them, so a snapshot never changes and can be read from any thread
+while the event loop keeps changing the map. Taking one copies nothing, building its dicts (materialize) is left to the reader.
+"""
+
+from records import STATUS_NAMES
+
+class Map_version():
+    """ One version of a Versioned_map: its base dict and the first "length" changes of its log """
+
+    __slots__ = ("base", "log", "length")
+
+    def __init__(self, base, log, length):
+        self.base = base
+        self.log = log
+        self.length = length
+
+    def materialize(self):
+        """ Return the entries of this version as a new dict, O(base + changes) """
+        entries = dict(self.base)
+        for index in range(self.length):
+            key, value = self.log[index]
+            if value is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = value
+        return entries
+
+class Versioned_map():
+    """
+    Versioned_map is a dict of immutable values whose versions (see Map_version) cost O(1) to take
+
+    Changes are appended to a log, removals as None values. Once the log is longer than the base, the next update builds a new base
+    with the whole log applied, so an update costs amortized O(1) per change however many versions are taken.
+    """
+
+    MIN_LOG = 1000
+
+    def __init__(self, entries=None):
+        self.__base = dict(entries or {})
+        self.__log = []
+
+    def update(self, changes, complete=False):
+        """ Apply {key: value or None} changes, or replace every entry with them when complete """
+        if complete:
+            self.__base = {key: value for key, value in changes.items() if value is not None}
+            self.__log = []
+            return
+
+        self.__log.extend(changes.items())
+        if len(self.__log) > len(self.__base) + self.MIN_LOG:
+            self.__base = self.version().materialize()
+            self.__log = []
+
+    def version(self):
+        """ Return the current Map_version """
+        return Map_version(self.__base, self.__log, len(self.__log))
+
+class Call_center_snapshot():
+    """
+    Call_center_snapshot is the queue and the operators of a call center as they were at "taken_at" (a clock reading of the call center)
+
+    queue and operators are Map_version of {call_id: (key, sequence, enqueued_at, skills)} and {op_id: (status, call_id, skills)},
+    they are only materialized (and the queue sorted) the first time they are read, in whatever thread reads them.
+    """
+
+    __slots__ = ("__name", "__taken_at", "__queue", "__operators", "__state")
+
+    def __init__(self, name, taken_at, queue, operators):
+        self.__name = name
+        self.__taken_at = taken_at
+        self.__queue = queue
+        self.__operators = operators
+        self.__state = None
+
+    def get_name(self):
+        return self.__name
+
+    def get_taken_at(self):
+        return self.__taken_at
+
+    def get_queue(self):
+        """ Return the waiting call_ids in queue order """
+        return [call["call_id"] for call in self.get_state()["queue"]]
+
+    def get_operators(self):
+        """ Return {op_id: (status, call_id)} of the operators in dispatch order """
+        return {op["id"]: (op["status"], op["call_id"]) for op in self.get_state()["operators"]}
+
+    def get_state(self):
+        """
+        Return a JSON-serializable dict of the snapshot: the waiting calls in queue order with how long they had waited
+        and the operators in dispatch order with their status, call and skills. Build it once, from any thread.
+        """
+        if self.__state is not None:
+            return self.__state
+
+        queue = sorted(self.__queue.materialize().items(), key=lambda item: item[1][:2])
+        self.__state = {
+            "tenant": self.__name,
+            "queue": [
+                {"call_id": call_id, "waiting": self.__taken_at - enqueued_at, "skills": sorted(skills)}
+                for call_id, (_, _, enqueued_at, skills) in queue
+            ],
+            "operators": [
+                {"id": op_id, "status": STATUS_NAMES[status], "call_id": call_id, "skills": sorted(skills)}
+                for op_id, (status, call_id, skills) in self.__operators.materialize().items()
+            ]
+        }
+        return self.__state
@@ -0,0 +1,60 @@
+from admission import Lag_monitor
+from admission import Token_bucket
+from call_center import Call_center
+from test_call_center_service import connect
+from test_call_center_service import send
+
+class Fake_clock():
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_allows_bursts_then_asks_to_wait_off_the_debt():
+    clock = Fake_clock()
+    bucket = Token_bucket(rate=10, burst=2, clock=clock)
+
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == 0.1
+    clock.now = 0.4
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == 0.1
+
+def test_lag_monitor_hysteresis():
+    clock = Fake_clock()
+    monitor = Lag_monitor(interval=1, max_lag=0.4, clock=clock)
+
+    for now, changed, overloaded in ((1.1, False, False), (2.6, True, True), (3.9, False, True), (4.95, True, False)):
+        clock.now = now
+        assert monitor.check() is changed and monitor.is_overloaded() is overloaded
+
+def test_calls_beyond_the_queue_length_are_refused_unless_they_ring():
+    call_center = Call_center([], max_queue=1)
+    call_center.call("1")
+    call_center.call("2")
+    assert call_center.call("3")[-1]["action"] == "waiting"
+    assert call_center.call("4")[-1] == {"action": "queue_full", "call_id": "4"}
+    assert not call_center.has_call("4") and call_center.get_state()["queue"] == ["3"]
+
+    call_center.reject("A")
+    assert call_center.get_state()["queue"] == ["3"]
+
+def test_a_connection_over_its_rate_is_paused_until_out_of_debt():
+    protocol, transport = connect()
+    protocol.factory.command_rate = 0.001
+    protocol.factory.command_burst = 1
+    protocol.bucket = protocol.factory.command_bucket()
+    timers = []
+    protocol.factory.call_later = lambda delay, callback, *args: timers.append((delay, callback))
+
+    send(protocol, transport, command="call", id="1")
+    assert transport.producerState == "producing"
+    send(protocol, transport, command="call", id="2")
+    assert transport.producerState == "paused" and 900 < timers[0][0] <= 1000
+
+    protocol.pause_reading("lag")
+    timers[0][1]()
+    assert transport.producerState == "paused"
+    protocol.resume_reading("lag")
+    assert transport.producerState == "producing"
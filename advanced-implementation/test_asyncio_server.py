@@ -0,0 +1,50 @@
+import asyncio
+import json
+from asyncio_server import asyncio_call_center_factory
+from call_center_registry import Call_center_registry
+import wire_codec
+
+async def serve(registry):
+    """ Return a factory started on the running loop, its listener and a connection to it """
+    factory = asyncio_call_center_factory(registry, loop=asyncio.get_running_loop())
+    factory.max_lag = None
+    factory.start()
+    listener = await asyncio.get_running_loop().create_server(factory, "127.0.0.1", 0)
+    reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+    return factory, listener, reader, writer
+
+async def close(factory, listener, writer):
+    writer.close()
+    listener.close()
+    await listener.wait_closed()
+    factory.stop()
+
+def test_pipelined_commands_and_ring_timeouts_over_asyncio():
+    async def scenario():
+        factory, listener, reader, writer = await serve(Call_center_registry(ring_timeout=0.05))
+        writer.write(b'{"command": "call", "id": "1", "request_id": 1}\n{"command": "call", "id": "2", "request_id": 2}\n')
+
+        responses = [json.loads(await reader.readline()) for _ in range(2)]
+        ignored = [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in range(2)]
+        await close(factory, listener, writer)
+        return responses, ignored
+
+    responses, ignored = asyncio.run(scenario())
+    assert [response["request_id"] for response in responses] == [1, 2]
+    assert responses[1]["response"].endswith("Call 2 ringing for operator B")
+    assert sorted(line["response"].split("\n")[0] for line in ignored) == ["Call 1 ignored by operator A", "Call 2 ignored by operator B"]
+
+def test_binary_encoding_over_asyncio():
+    async def scenario():
+        factory, listener, reader, writer = await serve(Call_center_registry())
+        writer.write(wire_codec.encode_json_command("encoding", "binary") + wire_codec.encode_binary_command("call", "1", "acme"))
+
+        confirmation = json.loads(await reader.readline())
+        length = wire_codec.FRAME_HEADER.unpack(await reader.readexactly(2))[0]
+        frame = await reader.readexactly(length)
+        await close(factory, listener, writer)
+        return confirmation, frame
+
+    confirmation, frame = asyncio.run(scenario())
+    assert confirmation["response"] == "Encoding binary"
+    assert [obj["action"] for obj in wire_codec.decode_binary_response(frame)] == ["recived", "ringing"]
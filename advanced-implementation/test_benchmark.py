@@ -0,0 +1,22 @@
+import benchmark
+
+def test_percentiles_are_in_milliseconds():
+    assert benchmark.percentiles([]) == {}
+    result = benchmark.percentiles([n * 1000000 for n in range(1, 1001)])
+    assert result == {"p50": 500, "p99": 990, "p999": 999, "max": 1000}
+
+def test_text_responses_parse_back_into_floor_events():
+    responses = benchmark.parse_text_response("Call 1 received\nCall 1 ringing for operator A\nCall 1 answered by operator A")
+    assert responses == [
+        {"action": "other"},
+        {"action": "ringing", "call_id": "1", "operator_id": "A"},
+        {"action": "answered", "call_id": "1", "operator_id": "A"}
+    ]
+
+def test_core_mode_is_reproducible_for_a_seed():
+    def commands():
+        floor = benchmark.Floor(tenants=3, rate=5, reject=0.2, answer_delay=0.5, handle=2, seed=7)
+        return benchmark.run_core(floor, 20)["commands"]
+
+    count = commands()
+    assert count > 100 and commands() == count
@@ -0,0 +1,133 @@
+from call_center import Call_center
+from records import Call_record
+
+class Fake_clock():
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def actions(responses):
+    return [(obj["action"], obj.get("call_id"), obj.get("operator_id")) for obj in responses]
+
+def test_a_waiting_call_does_not_hold_back_the_ones_other_operators_can_take():
+    call_center = Call_center([])
+    call_center.skills("A", ["es"])
+    call_center.call("1", skills=["es"])
+
+    assert actions(call_center.call("2", skills=["es"]))[-1] == ("waiting", "2", None)
+    assert actions(call_center.call("3"))[-1] == ("ringing", "3", "B")
+    assert actions(call_center.hangup("1"))[-1] == ("ringing", "2", "A")
+
+def test_an_operator_given_the_missing_skill_takes_the_waiting_call():
+    call_center = Call_center([])
+    call_center.skills("A", ["es"])
+    call_center.skills("B", ["fr"])
+    call_center.call("1", skills=["es"])
+
+    assert actions(call_center.call("2", skills=["es"]))[-1] == ("waiting", "2", None)
+    assert actions(call_center.skills("B", ["es", "fr"])) == [("skills", None, "B"), ("ringing", "2", "B")]
+
+def test_priority_calls_overtake_recent_calls_but_not_old_ones():
+    clock = Fake_clock()
+    call_center = Call_center([], clock=clock)
+    call_center.logout("A")
+    call_center.logout("B")
+
+    call_center.call("old")
+    clock.now = 400
+    call_center.call("recent")
+    clock.now = 500
+    assert call_center.call("vip", priority="vip")[-1]["ahead"] == 1
+    clock.now = 520
+    call_center.call("callback", priority="callback")
+    assert call_center.get_state()["queue"] == ["old", "vip", "recent", "callback"]
+
+def test_a_rejected_call_keeps_its_place_in_the_queue():
+    clock = Fake_clock()
+    call_center = Call_center([], clock=clock)
+    call_center.logout("B")
+    call_center.call("1")
+    clock.now = 1
+    call_center.call("2")
+
+    assert actions(call_center.reject("A"))[-1] == ("ringing", "1", "A")
+    assert call_center.get_state()["queue"] == ["2"]
+
+def test_the_call_of_an_operator_that_leaves_goes_back_to_its_place():
+    clock = Fake_clock()
+    call_center = Call_center([], clock=clock)
+    call_center.call("1")
+    call_center.answer("A")
+    call_center.call("2")
+    clock.now = 1
+    call_center.call("3")
+
+    responses = call_center.logout("B")
+    assert responses[0] == {"action": "logged_out", "operator_id": "B", "call_id": "2"}
+    assert call_center.get_state()["queue"] == ["2", "3"]
+
+    assert actions(call_center.add_operator("C", ["es"])) == [("operator_added", None, "C"), ("ringing", "2", "C")]
+    assert actions(call_center.remove_operator("C")) == [("operator_removed", "2", "C")]
+    assert actions(call_center.login("B")) == [("logged_in", None, "B"), ("ringing", "2", "B")]
+    assert [op.get_op_id() for op in call_center.get_operators()] == ["A", "B"]
+
+def test_state_round_trip_keeps_calls_operators_and_rejections():
+    clock = Fake_clock()
+    call_center = Call_center([], clock=clock)
+    call_center.skills("B", ["es"])
+    call_center.call("1")
+    call_center.reject("A")
+    call_center.answer("B")
+    call_center.call("2", skills=["es"])
+    clock.now = 5
+    call_center.call("3")
+    state = call_center.get_state()
+
+    restored = Call_center([], clock=Fake_clock(100))
+    restored.set_state(state)
+    assert restored.get_state() == state
+    assert [op["status"] for op in state["operators"]] == ["ringing", "busy"]
+    assert state["call_attempts"] == {"1": 2, "3": 1}
+    assert restored.find_operator("A").get_rejections("1") == 1
+
+    assert actions(restored.hangup("1"))[0] == ("finished", "1", "B")
+    assert actions(restored.answer("A")) == [("answered", "3", "A")]
+
+def test_operators_and_call_records_have_no_instance_dict():
+    assert not hasattr(Call_center([]).find_operator("A"), "__dict__")
+    assert not hasattr(Call_record("1", 0, 1), "__dict__")
+
+def test_waiting_calls_are_told_how_many_calls_are_ahead_and_how_long_to_wait():
+    clock = Fake_clock()
+    call_center = Call_center([], clock=clock)
+    call_center.logout("B")
+    call_center.call("1")
+    assert call_center.call("2")[-1] == {"action": "waiting", "call_id": "2", "ahead": 0, "estimated_wait": None}
+
+    clock.now = 2
+    call_center.answer("A")
+    clock.now = 12
+    call_center.hangup("1")
+    assert call_center.call("3")[-1]["estimated_wait"] == 12
+    assert call_center.call("4")[-1]["estimated_wait"] == 24
+
+    call_center.hangup("3")
+    waiting = call_center.call("5")[-1]
+    assert waiting["ahead"] == 1 and round(waiting["estimated_wait"], 6) == 22.8
+
+def test_calls_ahead_of_a_priority_call_are_interpolated():
+    clock = Fake_clock()
+    call_center = Call_center([], clock=clock)
+    call_center.logout("A")
+    call_center.logout("B")
+    for now in range(0, 400, 100):
+        clock.now = now
+        call_center.call(f"{now}")
+
+    clock.now = 360
+    assert call_center.call("callback", priority="callback")[-1]["ahead"] == 4
+    clock.now = 420
+    assert call_center.call("vip", priority="vip")[-1]["ahead"] == 2
+    assert call_center.get_state()["queue"] == ["0", "100", "vip", "200", "300", "callback"]
@@ -0,0 +1,65 @@
+from twisted.internet.testing import StringTransport
+from twisted.python.failure import Failure
+from twisted.internet.error import ConnectionLost
+from call_center_client import Call_center_error
+from call_center_client import call_center_client_factory
+from test_call_center_service import connect
+
+def client(on_event=None, on_lost=None):
+    protocol = call_center_client_factory(on_event, on_lost).buildProtocol(None)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    return protocol, transport
+
+def pump(client, client_transport, server, server_transport):
+    """ Deliver the commands the client wrote to the server, and the server responses back """
+    data = client_transport.value()
+    client_transport.clear()
+    server.dataReceived(data)
+    data = server_transport.value()
+    server_transport.clear()
+    client.dataReceived(data)
+
+def results(d):
+    outcome = []
+    d.addBoth(outcome.append)
+    return outcome
+
+def test_pipelined_commands_fire_with_their_own_responses():
+    protocol, transport = client()
+    server, server_transport = connect()
+
+    call = results(protocol.call("1", tenant="acme"))
+    answer = results(protocol.answer("A", tenant="acme"))
+    hangup = results(protocol.hangup("1", tenant="acme"))
+    assert protocol.in_flight() == 4
+    pump(protocol, transport, server, server_transport)
+
+    assert [obj["action"] for obj in call[0]] == ["recived", "ringing"]
+    assert [obj["action"] for obj in answer[0]] == ["answered"]
+    assert [obj["action"] for obj in hangup[0]] == ["finished"]
+    assert protocol.in_flight() == 0
+
+def test_refused_commands_fail_with_the_server_error():
+    protocol, transport = client()
+    server, server_transport = connect()
+
+    call = results(protocol.call("1", tenant="acme", priority="unknown"))
+    answer = results(protocol.answer("Z", tenant="acme"))
+    stats = results(protocol.stats(tenant="acme"))
+    pump(protocol, transport, server, server_transport)
+
+    assert call[0].check(Call_center_error)
+    assert answer[0].check(Call_center_error) and answer[0].getErrorMessage() == "Unknown operator Z"
+    assert stats[0]["queue_depth"] == 0
+
+def test_notifications_go_to_on_event_and_a_lost_connection_fails_the_commands_in_flight():
+    events, lost = [], []
+    protocol, transport = client(events.append, lost.append)
+    protocol.lineReceived(b'{"responses":[{"action":"ignored","call_id":"1","operator_id":"A"}]}')
+    assert events == [[{"action": "ignored", "call_id": "1", "operator_id": "A"}]]
+
+    call = results(protocol.call("2"))
+    protocol.connectionLost(Failure(ConnectionLost()))
+    assert call[0].check(ConnectionLost)
+    assert lost == [protocol]
@@ -0,0 +1,58 @@
+from call_center_registry import Call_center_registry
+
+class Fake_clock():
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_tenants_whose_operators_changed_are_never_evicted():
+    clock = Fake_clock()
+    registry = Call_center_registry(max_idle=60, clock=clock)
+    registry.get("skilled").skills("A", ["es"])
+    registry.get("short").logout("B")
+    registry.get("plain")
+
+    clock.now += 100
+    assert registry.evict_idle() == 1
+    assert "plain" not in registry
+    assert registry.find("skilled").find_operator("A").get_skills() == frozenset(["es"])
+    assert registry.find("short").find_operator("B").get_status().name == "OFFLINE"
+
+def test_ring_timeouts_of_tenants_apply_to_existing_and_new_tenants():
+    registry = Call_center_registry(ring_timeout=10)
+    registry.get("acme")
+    registry.set_ring_timeouts({"acme": 20, "globex": 30})
+
+    assert registry.get("acme").get_ring_timeout() == 20
+    assert registry.get("globex").get_ring_timeout() == 30
+    assert registry.get("initech").get_ring_timeout() == 10
+
+def test_tenants_with_live_calls_survive_idle_eviction():
+    clock = Fake_clock()
+    registry = Call_center_registry(max_idle=60, clock=clock)
+    registry.get("busy").call("1")
+    registry.get("quiet")
+
+    clock.now += 100
+    assert registry.evict_idle() == 1
+    assert list(registry.items())[0][0] == "busy"
+
+    registry.get("busy").hangup("1")
+    assert registry.evict_idle() == 0
+    clock.now += 100
+    assert registry.evict_idle() == 1 and len(registry) == 0
+
+def test_a_full_registry_evicts_its_least_recently_used_idle_tenant():
+    registry = Call_center_registry(max_tenants=2)
+    registry.get("acme").call("1")
+    registry.get("globex")
+    registry.get("acme")
+
+    assert registry.get("initech") is not None
+    assert "globex" not in registry and "acme" in registry
+    assert registry.get("initech").call("1")
+
+    assert registry.get("umbrella") is None
+    assert len(registry) == 2
@@ -0,0 +1,182 @@
+import json
+from twisted.internet.testing import StringTransport
+from call_center_queue import call_center_factory
+from call_center_service import server_parser
+from call_center_service import build_service
+import wire_codec
+
+def connect(factory=None):
+    """ Return a connection of a call_center_factory (without a lag monitor) and its transport """
+    factory = factory if factory is not None else call_center_factory()
+    factory.max_lag = None
+    protocol = factory.buildProtocol(None)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    return protocol, transport
+
+def send(protocol, transport, **command):
+    """ Send a JSON command and return the text of its response """
+    transport.clear()
+    protocol.dataReceived(json.dumps(command).encode() + b"\n")
+    return json.loads(transport.value())["response"]
+
+def test_duplicate_call_id_is_refused_while_the_call_is_live():
+    protocol, transport = connect()
+    call_center = protocol.factory.registry.get(protocol.registry.DEFAULT_TENANT)
+
+    assert "ringing for operator A" in send(protocol, transport, command="call", id="1")
+    send(protocol, transport, command="answer", id="A")
+    assert send(protocol, transport, command="call", id="1") == "Call 1 already exists"
+
+    assert "finished and operator A available" in send(protocol, transport, command="hangup", id="1")
+    assert [op.get_status().name for op in call_center.get_operators()] == ["AVAILABLE", "AVAILABLE"]
+    assert "ringing for operator A" in send(protocol, transport, command="call", id="1")
+
+def test_duplicate_call_id_is_refused_while_ringing():
+    protocol, transport = connect()
+    call_center = protocol.factory.registry.get(protocol.registry.DEFAULT_TENANT)
+
+    send(protocol, transport, command="call", id="1")
+    assert send(protocol, transport, command="call", id="1") == "Call 1 already exists"
+    send(protocol, transport, command="hangup", id="1")
+
+    assert [(op.get_status().name, op.get_call_id()) for op in call_center.get_operators()] == [("AVAILABLE", None), ("AVAILABLE", None)]
+
+def test_admin_commands_refuse_invalid_arguments():
+    protocol, transport = connect()
+
+    assert send(protocol, transport, command="profile", id=-1).startswith("Invalid duration -1")
+    assert send(protocol, transport, command="profile", id="inf").startswith("Invalid duration inf")
+    assert send(protocol, transport, command="profile", id=None) == "Invalid command"
+    assert protocol.factory.profiler is None
+
+    assert send(protocol, transport, command="trace", id=None) == "Invalid command"
+    assert send(protocol, transport, command="trace", id="often") == "Invalid sampling often"
+    assert send(protocol, transport, command="trace", id="1") == "Tracing 1 command out of 1"
+    assert send(protocol, transport, command="spans", id=[5]) == "Invalid command"
+    assert protocol in protocol.factory.connections
+
+def test_malformed_binary_frames_get_an_empty_response():
+    protocol, transport = connect()
+    send(protocol, transport, command="encoding", id="binary")
+
+    transport.clear()
+    protocol.dataReceived(b"\x00\x00" + b"\x00\x02\x00\xff" + wire_codec.encode_binary_command("call", "1"))
+    frames, rest = wire_codec.split_frames(transport.value())
+    assert rest == b"" and [wire_codec.decode_binary_response(frame) for frame in frames][:2] == [[], []]
+    assert wire_codec.decode_binary_response(frames[2])[0] == {"action": "recived", "call_id": "1"}
+    assert not transport.disconnecting
+
+def test_invalid_call_id_gets_an_error_response():
+    protocol, transport = connect()
+
+    assert send(protocol, transport, command="call", id=[1]) == "Invalid command"
+    assert protocol in protocol.factory.connections
+
+def test_subscribe_takes_int_operator_ids_as_strings():
+    protocol, transport = connect()
+
+    assert send(protocol, transport, command="subscribe", id=1) == "Subscribed to default"
+    assert protocol.subscriber is not None
+
+def test_int_call_id_is_the_same_call_as_its_string():
+    protocol, transport = connect()
+    call_center = protocol.factory.registry.get(protocol.registry.DEFAULT_TENANT)
+
+    assert send(protocol, transport, command="call", id=5).endswith("Call 5 ringing for operator A")
+    assert send(protocol, transport, command="reject", id="A").endswith("Call 5 ringing for operator B")
+    assert send(protocol, transport, command="reject", id="B").endswith("Call 5 ringing for operator A")
+    assert send(protocol, transport, command="reject", id="A").endswith("Call 5 ringing for operator B")
+    assert call_center.find_operator("A").get_rejections("5") == 2
+
+    assert send(protocol, transport, command="hangup", id=5) == "Call 5 missed"
+    assert [op.get_rejected_calls() for op in call_center.get_operators()] == [[], []]
+
+def test_invalid_tenant_gets_an_error_response():
+    protocol, transport = connect()
+
+    assert send(protocol, transport, command="call", id="1", tenant=["acme"]) == "Invalid command"
+    assert send(protocol, transport, command="stats", id="", tenant=7) == "Invalid command"
+    assert protocol in protocol.factory.connections
+
+def test_trace_hooks_survive_re_enabling_tracing():
+    protocol, transport = connect()
+    spans, stages = [], []
+    protocol.factory.add_trace_hook(spans.append)
+    protocol.factory.add_stage_hook(lambda stage, seconds: stages.append(stage))
+
+    send(protocol, transport, command="trace", id="1")
+    send(protocol, transport, command="trace", id="off")
+    send(protocol, transport, command="trace", id="1")
+    send(protocol, transport, command="call", id="1")
+
+    assert [span["command"] for span in spans] == ["trace", "call"]
+    assert stages[-5:] == ["decode", "dispatch", "journal", "timers", "render"]
+
+def test_tenants_get_their_ring_timeout_from_the_command_line():
+    args = server_parser().parse_args(["--ring-timeout", "5", "--ring-timeout", "acme=30", "--max-queue", "acme=2"])
+    registry = build_service(call_center_factory, args).registry
+
+    assert registry.get("acme").get_ring_timeout() == 30
+    assert registry.get("acme").get_max_queue() == 2
+    assert registry.get("globex").get_ring_timeout() == 5
+
+def test_pipelined_commands_are_answered_in_order_in_one_write():
+    protocol, transport = connect()
+    writes = []
+    transport.write = writes.append
+
+    protocol.dataReceived(b'{"command": "call", "id": "1", "request_id": 1}\n\n{"command": "call", "id": "2", "request_id": "b"}\n{"command": "hang')
+    protocol.dataReceived(b'up", "id": "1", "request_id": [3]}\n')
+
+    assert [len(data.splitlines()) for data in writes] == [2, 1]
+    responses = [json.loads(line) for line in b"".join(writes).splitlines()]
+    assert [response["request_id"] for response in responses] == [1, "b", [3]]
+    assert responses[1]["response"].endswith("Call 2 ringing for operator B")
+    assert responses[2]["response"].startswith("Call 1 missed")
+
+def test_binary_encoding_is_confirmed_in_json_then_used_both_ways():
+    protocol, transport = connect()
+
+    assert "binary" in send(protocol, transport, command="encoding", id="binary")
+    transport.clear()
+    protocol.dataReceived(wire_codec.encode_binary_command("call", "1") + wire_codec.encode_binary_command("answer", "A"))
+    frames, rest = wire_codec.split_frames(transport.value())
+
+    assert rest == b""
+    assert [wire_codec.decode_binary_response(frame) for frame in frames] == [
+        [{"action": "recived", "call_id": "1"}, {"action": "ringing", "call_id": "1", "operator_id": "A"}],
+        [{"action": "answered", "call_id": "1", "operator_id": "A"}]
+    ]
+
+def test_structured_connections_get_the_action_dicts():
+    protocol, transport = connect()
+    send(protocol, transport, command="encoding", id="structured")
+
+    transport.clear()
+    protocol.dataReceived(b'{"command": "call", "id": "1", "request_id": 4}\n{"command": "answer", "id": "Z"}\n')
+    lines = transport.value().splitlines()
+    assert json.loads(lines[0])["request_id"] == 4
+    assert [obj["action"] for obj in wire_codec.decode_structured_response(lines[0])] == ["recived", "ringing"]
+    assert "response" not in json.loads(lines[1])
+
+def test_spans_and_profiles_are_served_on_demand(tmp_path):
+    protocol, transport = connect()
+    protocol.factory.profile_dir = str(tmp_path)
+    timers = []
+    protocol.factory.call_later = lambda delay, callback, *args: timers.append((delay, callback, args))
+
+    assert send(protocol, transport, command="spans", id="") == "Tracing is off"
+    send(protocol, transport, command="trace", id="2")
+    for call_id in ("1", "2", "3", "4"):
+        send(protocol, transport, command="call", id=call_id)
+    transport.clear()
+    protocol.dataReceived(b'{"command": "spans", "id": "5"}\n')
+    assert [span["command"] for span in json.loads(transport.value())["spans"]] == ["call", "call"]
+
+    assert send(protocol, transport, command="profile", id="0.5").startswith("Profiling for 0.5 seconds into")
+    assert send(protocol, transport, command="profile", id="1") == "A profile is already running"
+    delay, stop, args = timers[0]
+    stop(*args)
+    assert delay == 0.5 and protocol.factory.profiler is None
+    assert [path.suffix for path in tmp_path.iterdir()] == [".pstats"]
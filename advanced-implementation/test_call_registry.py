@@ -0,0 +1,44 @@
+from call_registry import Call_registry
+from records import CALL_RINGING, ENDED
+
+def test_queue_is_fifo_and_a_rejected_call_goes_back_to_its_place():
+    registry = Call_registry(["1", "2", "3"])
+
+    record = registry.dequeue()
+    assert record.call_id == "1" and record.attempts == 1
+    registry.assign("1", "A")
+    assert record.state is CALL_RINGING and list(registry) == ["2", "3"]
+
+    assert registry.release("1") == "A"
+    registry.enqueue("1")
+    assert list(registry) == ["1", "2", "3"]
+
+def test_hangup_removes_a_call_from_the_middle_of_the_queue():
+    registry = Call_registry(["1", "2", "3"])
+
+    assert registry.remove("2")
+    assert not registry.remove("2")
+    assert not registry.is_live("2")
+    assert len(registry) == 2 and list(registry) == ["1", "3"]
+    assert [registry.dequeue().call_id for _ in range(2)] == ["1", "3"]
+
+def test_calls_wait_in_the_queue_of_their_skill_set():
+    registry = Call_registry(["1", "2", "3"], skills={"2": frozenset(["es"])})
+
+    assert registry.get_call_skills() == {"2": frozenset(["es"])}
+    assert [record.call_id for record in registry.heads()] == ["1", "2"]
+    registry.dequeue(registry.heads()[1])
+    assert [record.call_id for record in registry.heads()] == ["1"]
+    assert list(registry) == ["1", "3"]
+
+def test_released_call_is_forgotten_by_the_index():
+    registry = Call_registry(["1"])
+    record = registry.dequeue()
+    registry.assign("1", "A")
+    registry.answered("1")
+
+    assert registry.release("1") == "A"
+    assert registry.release("1") is None
+    registry.forget("1")
+    assert record.state is ENDED and not registry.is_live("1")
+    assert registry.get_keys() == {}
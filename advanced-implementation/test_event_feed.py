@@ -0,0 +1,44 @@
+from twisted.internet.testing import StringTransport
+from event_feed import Event_feed
+from event_feed import event_subscriber
+import wire_codec
+
+def events(transport):
+    return [wire_codec.decode_feed_event(line) for line in transport.value().splitlines()]
+
+def test_subscribers_get_the_events_of_their_tenant_and_operators():
+    feed = Event_feed()
+    everything, only_b, other = StringTransport(), StringTransport(), StringTransport()
+    feed.subscribe(event_subscriber(everything, "acme"))
+    feed.subscribe(event_subscriber(only_b, "acme", {"B"}))
+    feed.subscribe(event_subscriber(other, "globex"))
+
+    feed.publish("acme", [{"action": "recived", "call_id": "1"}, {"action": "ringing", "call_id": "1", "operator_id": "B"}])
+    assert len(events(everything)) == 2
+    assert events(only_b) == [events(everything)[1]]
+    assert other.value() == b""
+
+def test_a_paused_subscriber_keeps_a_bounded_backlog_and_counts_the_dropped_events():
+    feed = Event_feed()
+    transport = StringTransport()
+    subscriber = event_subscriber(transport, "acme", max_pending=2)
+    feed.subscribe(subscriber)
+
+    subscriber.pauseProducing()
+    for call_id in ("1", "2", "3"):
+        feed.publish("acme", [{"action": "recived", "call_id": call_id}])
+    assert transport.value() == b""
+
+    subscriber.resumeProducing()
+    lines = transport.value().splitlines()
+    assert lines[0] == wire_codec.encode_feed_dropped(1).strip()
+    assert [wire_codec.decode_feed_event(line)["call_id"] for line in lines[1:]] == ["2", "3"]
+
+def test_unsubscribing_the_last_subscriber_forgets_the_tenant():
+    feed = Event_feed()
+    subscriber = event_subscriber(StringTransport(), "acme")
+    feed.subscribe(subscriber)
+    feed.unsubscribe(subscriber)
+    feed.unsubscribe(subscriber)
+
+    assert len(feed) == 0 and not feed.has_subscribers("acme")
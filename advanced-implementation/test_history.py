@@ -0,0 +1,74 @@
+import pytest
+from history import History
+from history_report import report
+from history_report import format_report
+
+def record_calls(history, tenant, now):
+    """ Record a call answered and finished by A and a call rejected by B then missed, on tenant """
+    for obj in (
+        {"action": "recived", "call_id": "1"},
+        {"action": "ringing", "call_id": "1", "operator_id": "A"},
+        {"action": "answered", "call_id": "1", "operator_id": "A"},
+        {"action": "finished", "call_id": "1", "operator_id": "A"},
+        {"action": "recived", "call_id": "2"},
+        {"action": "ringing", "call_id": "2", "operator_id": "B"},
+        {"action": "reject", "call_id": "2", "operator_id": "B"},
+        {"action": "missed", "call_id": "2"},
+        {"action": "waiting", "call_id": "3"}
+    ):
+        now += 1
+        history.record(now, tenant, obj)
+
+def test_report_of_every_tenant_keeps_their_operators_apart(tmp_path):
+    history = History(tmp_path)
+    record_calls(history, "acme", 0)
+    record_calls(history, "globex", 100)
+    assert history.get_rows() == 16
+    history.close()
+
+    result = report(tmp_path)
+    assert result["calls"] == 4 and result["abandoned"] == 2 and result["abandoned_in_queue"] == 2
+    assert result["average_ring_time"] == 1 and result["average_handle_time"] == 1
+    assert sorted(result["operators"]) == ["acme/A", "acme/B", "globex/A", "globex/B"]
+    assert result["operators"]["acme/B"]["reject_rate"] == 1
+    assert "operators (4 of 4" in format_report(result)
+
+    assert sorted(report(tmp_path, "acme")["operators"]) == ["A", "B"]
+
+def test_history_is_appended_to_after_a_reopen(tmp_path):
+    history = History(tmp_path)
+    record_calls(history, "acme", 0)
+    history.close()
+
+    history = History(tmp_path)
+    record_calls(history, "acme", 3600)
+    history.close()
+
+    result = report(tmp_path, "acme", chunk=3)
+    assert result["events"] == 16 and result["calls"] == 4
+    assert list(result["operators"]) == ["A", "B"] and result["operators"]["A"]["rings"] == 2
+    assert len(result["hourly"]) == 2
+
+class Small_history(History):
+    BATCH = 4
+    INITIAL_ROWS = 4
+
+def test_readers_only_see_flushed_batches_and_the_maps_grow(tmp_path):
+    history = Small_history(tmp_path)
+    history.record(0, "acme", {"action": "recived", "call_id": "1"})
+    history.record(3, "acme", {"action": "ringing", "call_id": "1", "operator_id": "A"})
+    history.record(4, "acme", {"action": "reject", "call_id": "1", "operator_id": "A"})
+    history.record(9, "acme", {"action": "ringing", "call_id": "1", "operator_id": "B"})
+    for now in range(10, 15):
+        history.record(now, "acme", {"action": "recived", "call_id": f"{now}"})
+    assert report(tmp_path)["events"] == 8
+
+    history.close()
+    result = report(tmp_path, "acme")
+    assert result["events"] == 9 and result["calls"] == 6
+    assert result["average_first_wait"] == 3 and result["average_wait"] == 4
+
+def test_report_of_an_unknown_tenant_raises_a_value_error(tmp_path):
+    History(tmp_path).close()
+    with pytest.raises(ValueError):
+        report(tmp_path, "acme")
@@ -0,0 +1,92 @@
+import json
+from call_center_registry import Call_center_registry
+from journal import Journal
+from journal import apply_command
+
+class Fake_clock():
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_replayed_calls_keep_their_place_after_a_restart(tmp_path):
+    wall = Fake_clock(1000.0)
+    registry = Call_center_registry(clock=Fake_clock(50.0))
+    journal = Journal(tmp_path, wall)
+
+    for call_id in ("1", "2", "3"):
+        apply_command(registry, "default", "call", (call_id,))
+        journal.append("default", "call", call_id)
+    journal.close()
+
+    # restarted 10 minutes later, on a clock with another origin
+    wall.now += 600
+    recovered = Call_center_registry(clock=Fake_clock(7.0))
+    assert Journal(tmp_path, wall).recover(recovered) == 3
+
+    call_center = recovered.get("default")
+    assert call_center.get_state()["call_ages"]["3"] == 600
+    responses = call_center.call("4", priority="vip")
+    assert responses[-1]["action"] == "waiting" and responses[-1]["ahead"] == 1
+    assert call_center.get_state()["queue"] == ["3", "4"]
+
+def test_snapshot_ages_count_from_when_the_state_was_taken(tmp_path):
+    wall = Fake_clock(1000.0)
+    registry = Call_center_registry(clock=Fake_clock(50.0))
+    journal = Journal(tmp_path, wall)
+    for call_id in ("1", "2", "3"):
+        apply_command(registry, "default", "call", (call_id,))
+        journal.append("default", "call", call_id)
+
+    snapshot = (journal.get_sequence(), registry.get_state(), journal.get_time())
+    wall.now += 30    # a slow fsync
+    journal.write_batch(journal.take_batch(), snapshot)
+    journal.close()
+
+    wall.now += 60
+    recovered = Call_center_registry(clock=Fake_clock(7.0))
+    assert Journal(tmp_path, wall).recover(recovered) == 0
+    assert recovered.get("default").get_state()["call_ages"]["3"] == 90
+
+def journaled(registry, journal, tenant, command, *args):
+    apply_command(registry, tenant, command, args)
+    journal.append(tenant, command, *args)
+
+def test_a_torn_last_line_is_cut_and_the_log_goes_on_after_it(tmp_path):
+    registry = Call_center_registry()
+    journal = Journal(tmp_path)
+    journaled(registry, journal, "acme", "call", "1")
+    journaled(registry, journal, "acme", "answer", "A")
+    journal.close()
+    with open(tmp_path / Journal.LOG_NAME, "ab") as log:
+        log.write(b'[3,1.0,"acme","call","2"')
+
+    recovered = Call_center_registry()
+    journal = Journal(tmp_path)
+    assert journal.recover(recovered) == 2
+    assert recovered.get("acme").find_operator("A").get_call_id() == "1"
+    journaled(recovered, journal, "acme", "call", "3")
+    journal.close()
+
+    assert Journal(tmp_path).recover(Call_center_registry()) == 3
+    assert (tmp_path / Journal.LOG_NAME).read_bytes().count(b"\n") == 3
+    assert json.loads((tmp_path / Journal.LOG_NAME).read_bytes().splitlines()[-1])[0] == 3
+
+def test_recovery_loads_the_snapshot_and_replays_only_the_tail(tmp_path):
+    registry = Call_center_registry()
+    journal = Journal(tmp_path)
+    journaled(registry, journal, "acme", "call", "1")
+    journaled(registry, journal, "acme", "reject", "A")
+    journal.write_batch(journal.take_batch(), (journal.get_sequence(), registry.get_state()))
+    assert (tmp_path / Journal.LOG_NAME).read_bytes() == b""
+
+    journaled(registry, journal, "globex", "call", "2")
+    journaled(registry, journal, "acme", "logout", "A")
+    journal.close()
+
+    recovered = Call_center_registry()
+    assert Journal(tmp_path).recover(recovered) == 2
+    assert recovered.get("acme").get_state()["operators"] == registry.get("acme").get_state()["operators"]
+    assert recovered.get("acme").find_operator("A").get_rejections("1") == 1
+    assert recovered.get("globex").find_operator("A").get_call_id() == "2"
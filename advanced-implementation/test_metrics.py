@@ -0,0 +1,48 @@
+from call_center import Call_center
+from call_center_registry import Call_center_registry
+from metrics import Histogram
+from metrics import format_stats
+from metrics import render_prometheus
+
+class Fake_clock():
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 5))
+    for value in (0.5, 1, 3, 7):
+        histogram.observe(value)
+
+    assert histogram.get_state() == {"buckets": [(1, 2), (5, 3), ("+Inf", 4)], "sum": 11.5, "count": 4}
+
+def test_call_center_times_its_queue_rings_and_operators():
+    clock = Fake_clock()
+    call_center = Call_center([], clock=clock)
+    call_center.call("1")
+    call_center.call("2")
+    call_center.call("3")
+    clock.now = 2
+    call_center.answer("A")
+    clock.now = 12
+    call_center.hangup("1")
+
+    stats = call_center.get_stats()
+    assert stats["queue_depth"] == 0
+    assert stats["actions"]["recived"] == 3 and stats["actions"]["finished"] == 1
+    assert stats["time_in_queue"]["count"] == 3 and stats["time_in_queue"]["sum"] == 12
+    assert stats["ring_time"]["count"] == 1 and stats["ring_time"]["sum"] == 2
+    assert stats["averages"] == {"ring_time": 2, "handle_time": 10, "abandonment": 0}
+    assert stats["operators"]["A"] == {"status": "ringing", "seconds": {"available": 0, "ringing": 2, "busy": 10}, "occupancy": 1}
+    assert "Operator A ringing, occupancy 100%" in format_stats(stats)
+
+def test_prometheus_labels_are_escaped():
+    registry = Call_center_registry()
+    registry.get('ac"me').call("1")
+
+    text = render_prometheus(registry)
+    assert 'call_center_queue_depth{tenant="ac\\"me"} 0' in text
+    assert 'call_center_actions_total{tenant="ac\\"me",action="ringing"} 1' in text
+    assert text.endswith("\n")
@@ -0,0 +1,88 @@
+from call_center import Operator
+from operator_index import Operator_index
+from records import AVAILABLE, BUSY
+
+def operators(*op_ids):
+    return [Operator(op_id, None, AVAILABLE, None) for op_id in op_ids]
+
+def test_best_operator_prefers_the_ones_that_never_rejected_the_call_by_rank():
+    index = Operator_index(operators("A", "B", "C"))
+    a, b, c = index
+
+    assert index.best_operator("1") is a
+    index.add_rejection(a, "1")
+    assert index.best_operator("1") is b
+    index.set_status(b, BUSY)
+    assert index.best_operator("1") is c
+
+def test_best_operator_falls_back_to_the_fewest_rejections():
+    index = Operator_index(operators("A", "B"))
+    a, b = index
+    index.add_rejection(a, "1")
+    index.add_rejection(a, "1")
+    index.add_rejection(b, "1")
+
+    assert index.best_operator("1") is b
+    index.forget_call("1")
+    assert index.best_operator("1") is a
+    assert a.get_rejected_calls() == [] and b.get_rejected_calls() == []
+
+def test_removed_operator_leaves_a_hole_and_new_ones_come_last():
+    index = Operator_index(operators("A", "B"))
+    a, b = index
+    index.remove(a)
+    index.add(Operator("C", None, AVAILABLE, None))
+
+    assert [op.get_op_id() for op in index] == ["B", "C"]
+    assert index.find("A") is None
+    assert index.best_operator("1") is b
+    index.set_status(b, BUSY)
+    assert index.best_operator("1").get_op_id() == "C"
+
+def test_availability_bitmask_follows_the_statuses():
+    index = Operator_index(operators("A", "B"))
+    a, b = index
+
+    assert index.all_available()
+    index.set_status(a, BUSY)
+    index.set_status(b, BUSY)
+    assert not index.has_available() and not index.all_available()
+    assert index.best_operator("1") is None
+
+def test_bounded_rejections_forget_the_least_recently_rejected_call():
+    operator = Operator("A", None, AVAILABLE, None, max_rejections=2)
+
+    assert operator.add_rejection("1") is None
+    assert operator.add_rejection("2") is None
+    assert operator.add_rejection("1") is None
+    assert operator.add_rejection("3") == "2"
+    assert operator.get_rejected_calls() == ["1", "3"] and operator.get_rejections("1") == 2
+
+def test_a_forgotten_rejection_is_unmarked_in_the_index():
+    a = Operator("A", None, AVAILABLE, None, max_rejections=1)
+    b = Operator("B", None, AVAILABLE, None)
+    index = Operator_index([a, b])
+
+    index.add_rejection(a, "1")
+    assert index.best_operator("1") is b
+    index.add_rejection(a, "2")
+    assert index.best_operator("1") is a
+    assert index.best_operator("2") is b
+
+def test_calls_route_to_the_operators_with_every_skill_or_the_closest_ones():
+    index = Operator_index([
+        Operator("A", None, AVAILABLE, None, skills=["es"]),
+        Operator("B", None, AVAILABLE, None, skills=["es", "gold"]),
+        Operator("C", None, AVAILABLE, None, skills=["fr"])
+    ])
+    a, b, c = index
+
+    assert index.best_operator("1", frozenset(["es", "gold"])) is b
+    assert index.best_operator("1", frozenset(["fr", "gold"])) is b
+    assert index.best_operator("1", frozenset(["de"])) is a
+    index.set_status(b, BUSY)
+    assert index.best_operator("1", frozenset(["es", "gold"])) is None
+
+    index.set_skills(c, ["es", "gold"])
+    assert index.best_operator("1", frozenset(["es", "gold"])) is c
+    assert index.best_operator("1", frozenset(["fr"])) is a
@@ -0,0 +1,36 @@
+from priority_queue import Priority_queue
+from records import Call_record, ENDED
+
+def drain(queue):
+    call_ids = []
+    while queue.first() is not None:
+        record = queue.first()
+        queue.pop(record)
+        call_ids.append(record.call_id)
+    return call_ids
+
+def test_records_come_out_by_key_then_sequence():
+    queue = Priority_queue()
+    for sequence, (call_id, key) in enumerate([("1", 10), ("2", 20), ("vip", 5), ("3", 20), ("callback", 15)]):
+        queue.push(Call_record(call_id, key, sequence))
+
+    assert len(queue) == 5
+    assert drain(queue) == ["vip", "1", "callback", "2", "3"]
+    assert len(queue) == 0 and queue.first() is None
+
+def test_records_removed_from_the_middle_are_skipped():
+    queue = Priority_queue()
+    records = [Call_record(f"{n}", n, n) for n in range(40)]
+    for record in records:
+        queue.push(record)
+
+    for record in records[1:-1]:
+        if record.sequence % 3:
+            assert queue.pop(record)
+    assert not queue.pop(records[1])
+    assert records[1].state is ENDED
+
+    kept = [f"{n}" for n in range(40) if n % 3 == 0 or n == 39]
+    assert len(queue) == len(kept)
+    assert sorted(record.call_id for _, _, record in queue.items()) == sorted(kept)
+    assert drain(queue) == kept
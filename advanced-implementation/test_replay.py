@@ -0,0 +1,34 @@
+import io
+import json
+import replay
+
+TRACE = """
+{"time": 100, "command": "call", "id": 1}
+not json
+{"time": 105, "command": "call", "id": "2"}
+{"time": 106, "command": "answer", "id": "B"}
+{"time": 112, "command": "hangup", "id": "2"}
+{"time": 113, "command": "answer", "id": "Z"}
+"""
+
+def test_ring_timeouts_fire_at_their_virtual_time():
+    events = io.StringIO()
+    summary = replay.run(io.StringIO(TRACE), events, 10, None, 0.1, False)
+
+    lines = [json.loads(line) for line in events.getvalue().splitlines()]
+    assert [(line["time"], line["action"], line["call_id"]) for line in lines] == [
+        (100, "recived", "1"), (100, "ringing", "1"), (105, "recived", "2"), (105, "ringing", "2"),
+        (106, "answered", "2"), (110, "ignored", "1"), (112, "finished", "2")
+    ]
+    assert summary["commands"] == 4 and summary["invalid"] == 2
+    assert summary["virtual_seconds"] == 13 and summary["average_ring_time"] == 5.5
+
+def test_drain_lets_the_calls_still_ringing_time_out():
+    emitted = []
+    engine = replay.Replay(lambda now, tenant, obj: emitted.append((now, tenant, obj["action"])), ring_timeout=3)
+
+    assert engine.feed(50, "acme", "call", "1")
+    assert not engine.feed(51, "acme", "call", "1")
+    assert not engine.feed(51, "acme", "call", "2", priority="unknown")
+    engine.drain()
+    assert emitted[-1] == (53, "acme", "ignored") and engine.invalid == 2
@@ -0,0 +1,25 @@
+import json
+import pytest
+from call_center_registry import Call_center_registry
+from roster import read_roster
+
+def test_csv_roster_provisions_the_tenants_with_their_operators(tmp_path):
+    path = tmp_path / "roster.csv"
+    path.write_text('op_id,tenant,skills,ring_timeout,status\nA1,acme,es;gold,15,\nA2,acme,"fr, de",,offline\nD1,,,,\n')
+    registry = Call_center_registry(ring_timeout=10)
+
+    assert registry.provision(read_roster(str(path))) == 2
+    acme = registry.get("acme")
+    assert [op.get_op_id() for op in acme.get_operators()] == ["A1", "A2"]
+    assert acme.find_operator("A1").get_skills() == frozenset(["es", "gold"])
+    assert acme.get_ring_timeout("A1") == 15 and acme.get_ring_timeout("A2") == 10
+    assert acme.find_operator("A2").get_status().name == "OFFLINE"
+    assert [op.get_op_id() for op in registry.get("default").get_operators()] == ["D1"]
+    assert not acme.is_idle()
+
+@pytest.mark.parametrize("rows", [{"op_id": "A"}, [{"tenant": "acme"}], [{"op_id": "A", "status": "busy"}], [{"op_id": "A", "skills": [1]}]])
+def test_invalid_json_rosters_raise_value_errors(tmp_path, rows):
+    path = tmp_path / "roster.json"
+    path.write_text(json.dumps(rows))
+    with pytest.raises(ValueError):
+        read_roster(str(path))
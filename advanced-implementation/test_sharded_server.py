@@ -0,0 +1,94 @@
+import json
+from twisted.internet.testing import StringTransport
+from sharded_server import router_factory
+from sharded_server import shard_connection
+
+def route(shards=2):
+    """ Return a router connection whose shard connections are opened by hand (see open_shard) and its transport """
+    router = router_factory([5700 + n for n in range(shards)]).buildProtocol(None)
+    router.connect = lambda shard: None
+    transport = StringTransport()
+    router.makeConnection(transport)
+    return router, transport
+
+def open_shard(router, shard):
+    """ Connect a router to a shard, return the shard connection """
+    connection = shard_connection(router, shard)
+    connection.makeConnection(StringTransport())
+    router.shard_connected(connection, shard)
+    return connection
+
+def sent(connection):
+    lines = [json.loads(line) for line in connection.transport.value().splitlines()]
+    connection.transport.clear()
+    return lines
+
+def test_restarted_shard_is_switched_to_the_encoding():
+    router, _ = route()
+    router.dataReceived(b'{"command": "encoding", "id": "structured"}\n')
+    shards = [open_shard(router, 0), open_shard(router, 1)]
+    assert router.encoding == "json"
+
+    for connection in shards:
+        seq = sent(connection)[0]["request_id"]
+        connection.dataReceived(json.dumps({"response": "Encoding structured", "request_id": seq}).encode() + b"\n")
+    assert router.encoding == "structured"
+
+    shards[1].connectionLost(None)
+    router.dataReceived(b'{"command": "call", "id": "1", "tenant": "a"}\n')    # tenant "a" lives in shard 1
+    reconnected = sent(open_shard(router, 1))
+    assert [line["command"] for line in reconnected] == ["encoding", "call"]
+    assert reconnected[0]["id"] == "structured"
+
+def test_rejected_encoding_is_not_taken():
+    router, transport = route(1)
+    router.dataReceived(b'{"command": "encoding", "id": "yaml"}\n')
+    connection = open_shard(router, 0)
+    seq = sent(connection)[0]["request_id"]
+    connection.dataReceived(json.dumps({"response": "Unknown encoding yaml", "request_id": seq}).encode() + b"\n")
+
+    assert router.encoding == "json"
+    assert json.loads(transport.value()) == {"response": "Unknown encoding yaml"}
+
+def test_invalid_tenant_is_answered_by_the_router():
+    router, transport = route()
+    router.dataReceived(b'{"command": "call", "id": "1", "tenant": 7}\n')
+
+    assert json.loads(transport.value()) == {"response": "Invalid command"}
+    assert router.shards == [None, None]
+
+def test_shards_are_not_read_while_the_client_is_slow():
+    router, transport = route()
+    shard = open_shard(router, 0)
+
+    transport.producer.pauseProducing()
+    assert shard.transport.producerState == "paused"
+    assert open_shard(router, 1).transport.producerState == "paused"
+
+    transport.producer.resumeProducing()
+    assert [connection.transport.producerState for connection in router.shards] == ["producing", "producing"]
+
+def answer(connection, line, response):
+    connection.dataReceived(json.dumps({"response": response, "request_id": line["request_id"]}).encode() + b"\n")
+
+def test_responses_of_different_shards_are_written_in_command_order():
+    router, transport = route()
+    shards = [open_shard(router, 0), open_shard(router, 1)]
+    router.dataReceived(b'{"command": "call", "id": "1", "tenant": "acme", "request_id": "x"}\n{"command": "call", "id": "2", "tenant": "a"}\n')
+    (first,), (second,) = sent(shards[0]), sent(shards[1])
+    assert (first["id"], second["id"]) == ("1", "2")
+
+    answer(shards[1], second, "second")
+    assert transport.value() == b""
+    answer(shards[0], first, "first")
+    assert [json.loads(line) for line in transport.value().splitlines()] == [{"response": "first", "request_id": "x"}, {"response": "second"}]
+
+def test_commands_waiting_for_a_lost_shard_are_answered_by_the_router():
+    router, transport = route()
+    shards = [open_shard(router, 0), open_shard(router, 1)]
+    router.dataReceived(b'{"command": "call", "id": "1", "tenant": "acme"}\n{"command": "call", "id": "2", "tenant": "a", "request_id": 9}\n')
+    answer(shards[0], sent(shards[0])[0], "first")
+
+    shards[1].connectionLost(None)
+    assert [json.loads(line) for line in transport.value().splitlines()] == [{"response": "first"}, {"response": "Shard unavailable", "request_id": 9}]
+    assert router.shards[1] is None
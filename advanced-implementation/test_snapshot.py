@@ -0,0 +1,45 @@
+from call_center import Call_center
+from snapshot import Versioned_map
+
+class Fake_clock():
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_versions_never_change_after_they_are_taken():
+    versioned = Versioned_map({"a": 1})
+    versioned.MIN_LOG = 2
+    first = versioned.version()
+
+    versioned.update({"a": None, "b": 2})
+    second = versioned.version()
+    versioned.update({"c": 3, "d": 4})
+    versioned.update({"e": 5})
+    versioned.update({"x": 0}, complete=True)
+
+    assert first.materialize() == {"a": 1}
+    assert second.materialize() == {"b": 2}
+    assert versioned.version().materialize() == {"x": 0}
+
+def test_call_center_snapshots_are_consistent_points_in_time():
+    clock = Fake_clock()
+    call_center = Call_center([], name="acme", clock=clock)
+    call_center.call("1")
+    call_center.answer("A")
+    call_center.call("2")
+    clock.now = 4
+    call_center.call("3", skills=["es"])
+    clock.now = 10
+    before = call_center.snapshot()
+
+    call_center.hangup("1")
+    call_center.call("4")
+    after = call_center.snapshot()
+
+    assert before.get_queue() == ["3"]
+    assert before.get_state()["queue"] == [{"call_id": "3", "waiting": 6, "skills": ["es"]}]
+    assert before.get_operators() == {"A": ("busy", "1"), "B": ("ringing", "2")}
+    assert after.get_queue() == ["4"]
+    assert after.get_operators() == {"A": ("ringing", "3"), "B": ("ringing", "2")}
@@ -0,0 +1,51 @@
+from timing_wheel import Timing_wheel
+
+def test_timers_fire_in_the_tick_of_their_delay():
+    wheel = Timing_wheel(tick=0.5, size=8)
+    fired = []
+    wheel.schedule(1.0, fired.append, "a")
+    wheel.schedule(0.1, fired.append, "b")
+    wheel.schedule(1.2, fired.append, "c")
+
+    wheel.advance()
+    assert fired == ["b"]
+    wheel.advance()
+    assert fired == ["b", "a"]
+    wheel.advance()
+    assert fired == ["b", "a", "c"] and len(wheel) == 0
+
+def test_timers_further_than_one_turn_wait_their_rounds():
+    wheel = Timing_wheel(tick=1, size=4)
+    fired = []
+    timer = wheel.schedule(10, fired.append, "late")
+
+    wheel.advance(9)
+    assert fired == [] and timer.active()
+    wheel.advance()
+    assert fired == ["late"] and not timer.active()
+
+def test_cancelled_timers_never_fire():
+    wheel = Timing_wheel(tick=1, size=4)
+    fired = []
+    timer = wheel.schedule(2, fired.append, "cancelled")
+    wheel.schedule(2, fired.append, "kept")
+
+    timer.cancel()
+    timer.cancel()
+    assert len(wheel) == 1
+    wheel.advance(2)
+    assert fired == ["kept"]
+
+def test_a_timer_can_cancel_another_one_of_its_slot():
+    wheel = Timing_wheel(tick=1, size=4)
+    fired = []
+    second = None
+
+    def first():
+        fired.append("first")
+        second.cancel()
+
+    wheel.schedule(1, first)
+    second = wheel.schedule(1, fired.append, "second")
+    wheel.advance()
+    assert fired == ["first"] and len(wheel) == 0
@@ -0,0 +1,44 @@
+from tracing import Tracer
+
+class Fake_clock():
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_tracer_samples_one_command_out_of_every():
+    tracer = Tracer(every=3)
+    assert [tracer.start() is not None for _ in range(6)] == [False, False, True, False, False, True]
+
+def test_hooks_get_the_stages_and_the_finished_spans():
+    clock = Fake_clock()
+    spans, stages = [], []
+    tracer = Tracer(every=1, clock=clock, hooks=spans, stage_hooks=[])
+    tracer.add_stage_hook(lambda stage, seconds: stages.append((stage, seconds)))
+    tracer.add_hook(lambda span: None)
+
+    span = tracer.start()
+    clock.now += 2
+    span.mark("decode")
+    clock.now += 3
+    span.mark("dispatch")
+    tracer.finish(span, "call")
+
+    assert stages == [("decode", 2), ("dispatch", 3)]
+    assert tracer.get_spans() == [{"command": "call", "tenant": None, "stages": {"decode": 2, "dispatch": 3}, "total": 5}]
+    assert tracer.get_summary()["total"] == {"count": 1, "mean": 5, "max": 5}
+    assert len(spans) == 1
+
+def test_only_the_last_spans_are_kept():
+    tracer = Tracer(every=1, size=2, clock=Fake_clock())
+    hook = []
+    tracer.add_hook(hook.append)
+    for command in ("call", "answer"):
+        tracer.finish(tracer.start(), command)
+    tracer.remove_hook(hook.append)
+    tracer.finish(tracer.start(), "hangup")
+
+    assert [span["command"] for span in tracer.get_spans()] == ["answer", "hangup"]
+    assert [span["command"] for span in tracer.get_spans(1)] == ["hangup"]
+    assert [span["command"] for span in hook] == ["call", "answer"]
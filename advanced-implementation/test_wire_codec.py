@@ -0,0 +1,55 @@
+import pytest
+import wire_codec
+
+def test_binary_command_round_trip():
+    frame = wire_codec.encode_binary_command("call", "42", "acme")
+    assert wire_codec.decode_binary_command(frame[2:]) == ("call", "42", "acme")
+
+@pytest.mark.parametrize("frame", [b"", b"\x00", b"\x00\x05ab", b"\x00\x00\xff\xfe"])
+def test_malformed_binary_commands_raise_codec_errors(frame):
+    with pytest.raises(wire_codec.Codec_error):
+        wire_codec.decode_binary_command(frame)
+
+def test_binary_responses_carry_long_ids():
+    responses = [{"action": "ringing", "call_id": "c" * 300, "operator_id": "A"}]
+    frame = wire_codec.encode_binary_response(responses)
+    assert wire_codec.decode_binary_response(frame[2:]) == responses
+
+def test_binary_responses_too_long_for_a_frame_raise_codec_errors():
+    with pytest.raises(wire_codec.Codec_error):
+        wire_codec.encode_binary_response([{"action": "missed", "call_id": "c" * 70000}])
+
+def test_json_command_round_trip():
+    line = wire_codec.encode_json_command("call", "42", "acme", 7, ["es"], "vip")
+    assert wire_codec.decode_json_command(line) == ("call", "42", "acme", 7, {"skills": ["es"], "priority": "vip"})
+
+@pytest.mark.parametrize("id", [[1], {"a": 1}, None, True, 1.5])
+def test_json_commands_with_invalid_ids_raise_type_errors(id):
+    with pytest.raises(TypeError):
+        wire_codec.decode_json_command(wire_codec.json.dumps({"command": "call", "id": id}))
+
+@pytest.mark.parametrize("tenant", [["acme"], {"a": 1}, 7, True])
+def test_json_commands_with_invalid_tenants_raise_type_errors(tenant):
+    with pytest.raises(TypeError):
+        wire_codec.decode_json_command(wire_codec.json.dumps({"command": "stats", "id": "", "tenant": tenant}))
+
+def test_structured_responses_are_the_action_dicts_with_their_codes():
+    responses = [{"action": "waiting", "call_id": 'say "hi"\n', "ahead": 2, "estimated_wait": None}, {"action": "no_calls", "operator_id": "A"}]
+    line = wire_codec.encode_structured_response(responses, request_id=[7])
+
+    assert line.endswith(b"\n")
+    assert wire_codec.json.loads(line)["request_id"] == [7]
+    assert wire_codec.decode_structured_response(line) == [
+        dict(responses[0], code=wire_codec.ACTION_CODES["waiting"]), dict(responses[1], code=wire_codec.ACTION_CODES["no_calls"])
+    ]
+
+def test_text_rendering_of_the_action_dicts():
+    assert wire_codec.render_text([
+        {"action": "waiting", "call_id": "1", "ahead": 2, "estimated_wait": 30.4},
+        {"action": "waiting", "call_id": "2", "ahead": 3, "estimated_wait": None},
+        {"action": "logged_out", "operator_id": "A", "call_id": "3"}
+    ]) == (
+        "Call 1 waiting in queue, 2 calls ahead, estimated wait 30s\n"
+        "Call 2 waiting in queue, 3 calls ahead\n"
+        "Operator A logged out, call 3 back in queue"
+    )
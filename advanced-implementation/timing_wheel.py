@@ -0,0 +1,79 @@
+import math
+
+class Timer():
+    """ A callback scheduled in a Timing_wheel, "cancel" removes it in O(1) """
+
+    def __init__(self, wheel, slot, rounds, callback, args):
+        self.wheel = wheel
+        self.slot = slot
+        self.rounds = rounds
+        self.callback = callback
+        self.args = args
+
+    def active(self):
+        """ Return True if the timer has neither fired nor been cancelled """
+        return self.slot is not None
+
+    def cancel(self):
+        """ Cancel the timer, does nothing if it already fired or was cancelled """
+        if self.slot is not None:
+            self.wheel.remove(self)
+
+
+class Timing_wheel():
+    """
+    Timing_wheel is a hashed timing wheel: a ring of "size" slots where each tick of "tick" seconds moves to the next slot and fires its due timers
+
+    Timers are dicts entries of their slot, so scheduling and cancelling are O(1) no matter how many timers are live.
+    Timers further away than one turn of the wheel wait "rounds" turns in their slot.
+    The wheel does not read any clock, whoever owns it calls "advance" once per tick (a reactor LoopingCall, or a virtual clock in a simulation),
+    so a timer fires at most one tick before its delay.
+    """
+
+    def __init__(self, tick=0.1, size=512):
+        self.__tick = tick
+        self.__slots = [dict() for _ in range(size)]
+        self.__current = 0
+        self.__count = 0
+
+    def __len__(self):
+        """ Return the number of live timers """
+        return self.__count
+
+    def get_tick(self):
+        """ Return the tick length in seconds """
+        return self.__tick
+
+    def schedule(self, delay, callback, *args):
+        """ Call callback(*args) after delay seconds, return the Timer """
+        ticks = max(1, math.ceil(delay / self.__tick))
+        size = len(self.__slots)
+        slot = (self.__current + ticks) % size
+        timer = Timer(self, slot, (ticks - 1) // size, callback, args)
+        self.__slots[slot][timer] = None
+        self.__count += 1
+        return timer
+
+    def remove(self, timer):
+        """ Remove a pending timer from its slot """
+        del self.__slots[timer.slot][timer]
+        timer.slot = None
+        self.__count -= 1
+
+    def advance(self, ticks=1):
+        """ Move the wheel "ticks" ticks forward, firing the timers that became due in order """
+        for _ in range(ticks):
+            self.__current = (self.__current + 1) % len(self.__slots)
+            slot = self.__slots[self.__current]
+
+            if not slot:
+                continue
+
+            for timer in list(slot):
+                if timer.slot is None:
+                    continue
+                if timer.rounds > 0:
+                    timer.rounds -= 1
+                else:
+                    self.remove(timer)
+                    timer.callback(*timer.args)
@@ -0,0 +1,138 @@
+"""
+Tracing and profiling of the server hot path
+
+A Tracer samples one command out of "every": the sampled command gets a Span, and the server marks the end of each stage
+of its handling on it (see Command_handler):
+
+    decode    the command line (or binary frame) decoded
+    dispatch  the call center method run (Call_center.call and its verify_queue, answer, ...)
+    journal   the command appended to the journal batch
+    timers    ring timeouts started or cancelled and the responses published to the subscribers
+    render    the responses rendered (generate_response) or encoded in the connection encoding
+
+Finished spans go to a ring buffer of the last "size" ones and to the hooks (callables taking the span dict), so a hook can export them anywhere,
+and every stage of a sampled command goes to the stage hooks (callables taking the stage name and its seconds) as soon as it ends.
+A Tracer can be given the hook lists of its owner, so the hooks outlive it (see Call_center_service.set_tracing).
+The commands that are not sampled get no Span, and a server without a Tracer only checks that it has none, once per command.
+
+profile_report dumps a cProfile run to a .pstats file (readable with "python -m pstats") and renders its top functions.
+"""
+
+import io
+import pstats
+import time
+from collections import deque
+
+class Span():
+    """ The stage timings of one sampled command, marked as its stages end """
+
+    __slots__ = ("clock", "started", "last", "stages", "hooks")
+
+    def __init__(self, clock, hooks=()):
+        self.clock = clock
+        self.started = self.last = clock()
+        self.stages = []
+        self.hooks = hooks
+
+    def mark(self, stage):
+        """ End stage now, it lasted since the previous mark (or the start) """
+        now = self.clock()
+        seconds = now - self.last
+        self.stages.append((stage, seconds))
+        self.last = now
+
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+class Tracer():
+    """
+    Tracer samples one command out of "every" and keeps the last "size" finished spans
+
+    Sampling is a countdown, not a random draw, so starting a span costs one decrement for the commands that are not sampled.
+    hooks and stage_hooks are the lists the hooks are kept in (new ones when None), add_hook and add_stage_hook append to them.
+    """
+
+    def __init__(self, every=100, size=1000, clock=time.perf_counter, hooks=None, stage_hooks=None):
+        self.__every = every
+        self.__countdown = every
+        self.__spans = deque(maxlen=size)
+        self.__hooks = hooks if hooks is not None else []
+        self.__stage_hooks = stage_hooks if stage_hooks is not None else []
+        self.__clock = clock
+
+    def get_every(self):
+        """ Return how many commands there are for one that is sampled """
+        return self.__every
+
+    def add_hook(self, hook):
+        """ Call hook(span) with every finished span, a dict like the ones get_spans returns """
+        self.__hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.__hooks.remove(hook)
+
+    def add_stage_hook(self, hook):
+        """ Call hook(stage, seconds) whenever a stage of a sampled command ends """
+        self.__stage_hooks.append(hook)
+
+    def remove_stage_hook(self, hook):
+        self.__stage_hooks.remove(hook)
+
+    def start(self):
+        """ Return a Span if this command is sampled, None otherwise """
+        self.__countdown -= 1
+        if self.__countdown > 0:
+            return None
+
+        self.__countdown = self.__every
+        return Span(self.__clock, self.__stage_hooks)
+
+    def finish(self, span, command, tenant=None):
+        """ Record a span whose command is handled """
+        record = {
+            "command": command,
+            "tenant": tenant,
+            "stages": dict(span.stages),
+            "total": span.last - span.started
+        }
+        self.__spans.append(record)
+
+        for hook in self.__hooks:
+            hook(record)
+
+    def get_spans(self, count=None):
+        """ Return the last count finished spans (every one in the ring buffer when None), oldest first """
+        spans = list(self.__spans)
+        return spans[-count:] if count else spans
+
+    def get_summary(self):
+        """ Return {stage: {"count": ..., "mean": seconds, "max": seconds}} over the spans in the ring buffer, "total" included """
+        summary = dict()
+
+        for span in self.__spans:
+            for stage, seconds in list(span["stages"].items()) + [("total", span["total"])]:
+                stats = summary.get(stage)
+                if stats is None:
+                    stats = summary[stage] = {"count": 0, "sum": 0, "max": 0}
+                stats["count"] += 1
+                stats["sum"] += seconds
+                stats["max"] = max(stats["max"], seconds)
+
+        if summary:
+            summary["total"] = summary.pop("total")
+        return {stage: {"count": stats["count"], "mean": stats["sum"] / stats["count"], "max": stats["max"]} for stage, stats in summary.items()}
+
+def format_summary(summary):
+    """ Render a Tracer summary as text lines, times in microseconds """
+    if not summary:
+        return "No spans"
+    return "\n".join(
+        f"{stage} count {stats['count']}, mean {stats['mean'] * 1e6:.1f}us, max {stats['max'] * 1e6:.1f}us" for stage, stats in summary.items()
+    )
+
+def profile_report(profiler, path, limit=25):
+    """ Dump a disabled cProfile.Profile to path and return its "limit" top functions by cumulative time, as text """
+    profiler.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(limit)
+    return text.getvalue()
@@ -0,0 +1,256 @@
+"""
+Wire encodings of the call center protocol
+
+    * "json" (default): one JSON object per line, {"command": ..., "id": ..., "tenant": ..., "skills": [...], "priority": ...} in and {"response": "<English text>"} out
+    * "structured": JSON commands in, {"responses": [action dict, ...]} out, the dicts Call_center returns plus their "code" from ACTION_CODES,
+      so machine clients neither wait for the English text to be rendered nor parse it back
+    * "binary": length-prefixed frames with small integer codes
+
+A connection that sends {"command": "subscribe", "id": <operator ids, comma separated, or "">, "tenant": ...} becomes a read-only feed
+of the tenant events, one {"tenant": ..., "action": ..., "code": ..., ...} line per event whatever the encoding
+
+"structured" and "binary" are negotiated by sending {"command": "encoding", "id": <encoding>} as a JSON line
+
+Binary layout (network byte order):
+    command frame  = length:uint16 | command:uint8 | tenant length:uint8 | tenant:utf-8 | id:utf-8
+    response frame = length:uint16 | count:uint8 | count * (action:uint8 | call_id length:uint16 | operator_id length:uint16 | call_id:utf-8 | operator_id:utf-8)
+
+length counts the bytes after itself, missing tenant/call_id/operator_id fields are sent as empty strings (an empty tenant is the default one)
+Frames that can not be decoded, or responses that do not fit in a frame, raise Codec_error
+Binary commands carry no options: calls sent in binary have the normal priority and require no skills, and the "skills" command is JSON only,
+like the operator provisioning commands (add_operator, remove_operator, login, logout).
+Binary responses carry no other field either: the calls ahead and estimated wait of "waiting" are in the json and structured encodings only.
+"""
+
+import json
+import struct
+from json.encoder import encode_basestring_ascii as encode_string
+
+ENCODINGS = ("json", "structured", "binary")
+
+COMMANDS = ("call", "answer", "reject", "hangup")
+COMMAND_CODES = {command: code for code, command in enumerate(COMMANDS)}
+
+ACTIONS = (
+    "recived", "ringing", "waiting", "reject", "answered", "missed", "finished", "no_calls", "in_call", "ignored", "skills",
+    "operator_added", "operator_removed", "logged_in", "logged_out", "queue_full"
+)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+STRUCTURED_PREFIXES = {action: f'{{"action":"{action}","code":{code}' for action, code in ACTION_CODES.items()}
+
+FRAME_HEADER = struct.Struct("!H")
+COMMAND_HEADER = struct.Struct("!HBB")
+RESPONSE_HEADER = struct.Struct("!HB")
+EVENT_HEADER = struct.Struct("!BHH")
+
+MAX_FRAME = 0xFFFF
+
+encode_compact = json.JSONEncoder(separators=(",", ":")).encode
+
+RESPONSE_TEXTS = {
+    "recived": lambda obj: f"Call {obj['call_id']} recived",
+    "ringing": lambda obj: f"Call {obj['call_id']} ringing for operator {obj['operator_id']}",
+    "waiting": lambda obj: f"Call {obj['call_id']} waiting in queue" + wait_estimate(obj),
+    "reject": lambda obj: f"Call {obj['call_id']} rejected by operator {obj['operator_id']}",
+    "answered": lambda obj: f"Call {obj['call_id']} answered by operator {obj['operator_id']}",
+    "missed": lambda obj: f"Call {obj['call_id']} missed",
+    "finished": lambda obj: f"Call {obj['call_id']} finished and operator {obj['operator_id']} available",
+    "no_calls": lambda obj: f"No calls for operator {obj['operator_id']}",
+    "in_call": lambda obj: f"Operator {obj['operator_id']} is already in Call {obj['call_id']}",
+    "ignored": lambda obj: f"Call {obj['call_id']} ignored by operator {obj['operator_id']}",
+    "skills": lambda obj: f"Operator {obj['operator_id']} skills {', '.join(obj['skills']) or 'none'}",
+    "operator_added": lambda obj: f"Operator {obj['operator_id']} added",
+    "operator_removed": lambda obj: f"Operator {obj['operator_id']} removed" + back_in_queue(obj),
+    "logged_in": lambda obj: f"Operator {obj['operator_id']} logged in",
+    "logged_out": lambda obj: f"Operator {obj['operator_id']} logged out" + back_in_queue(obj),
+    "queue_full": lambda obj: f"Call {obj['call_id']} rejected: queue full"
+}
+
+class Codec_error(ValueError):
+    """ A binary frame that can not be decoded, or responses that can not be encoded in one """
+
+def wait_estimate(obj):
+    if "ahead" not in obj:
+        return ""
+    if obj.get("estimated_wait") is None:
+        return f", {obj['ahead']} calls ahead"
+    return f", {obj['ahead']} calls ahead, estimated wait {obj['estimated_wait']:.0f}s"
+
+def back_in_queue(obj):
+    return f", call {obj['call_id']} back in queue" if "call_id" in obj else ""
+
+
+#----/ json /----
+
+def encode_json_command(command, id, tenant=None, request_id=None, skills=None, priority=None):
+    """ Encode a command as a JSON line """
+    data = {"command": command, "id": f"{id}"}
+    if tenant:
+        data["tenant"] = tenant
+    if request_id is not None:
+        data["request_id"] = request_id
+    if skills is not None:
+        data["skills"] = list(skills)
+    if priority is not None:
+        data["priority"] = priority
+    return json.dumps(data).encode() + b"\n"
+
+def decode_json_command(line):
+    """
+    Decode a JSON line into (command, id, tenant, request_id, options), tenant and request_id are None when the command has none
+
+    id must be a string or an int and is returned as a string, tenant a string (or missing), options is None, or a dict of the "skills" (a list of strings) and "priority" (a string) the command has
+    """
+    data = json.loads(line)
+    options = None
+
+    if data["id"].__class__ not in (str, int):
+        raise TypeError("id must be a string or an int")
+    tenant = data.get("tenant")
+    if tenant is not None and tenant.__class__ is not str:
+        raise TypeError("tenant must be a string")
+
+    if "skills" in data or "priority" in data:
+        options = dict()
+        skills = data.get("skills")
+        priority = data.get("priority")
+        if skills is not None:
+            if skills.__class__ is not list or not all(skill.__class__ is str for skill in skills):
+                raise TypeError("skills must be a list of strings")
+            options["skills"] = skills
+        if priority is not None:
+            if priority.__class__ is not str:
+                raise TypeError("priority must be a string")
+            options["priority"] = priority
+
+    return data["command"], f"{data['id']}", tenant, data.get("request_id"), options
+
+def encode_json_response(response):
+    """ Encode a rendered response ({"response": text}) as a JSON line """
+    return json.dumps(response).encode() + b"\n"
+
+def decode_json_response(line):
+    """ Decode a JSON response line into its text """
+    return json.loads(line)["response"]
+
+def render_text(responses):
+    """ Render action dicts as English lines, with the RESPONSE_TEXTS renderer of each action """
+    return "\n".join([RESPONSE_TEXTS[obj["action"]](obj) for obj in responses])
+
+
+#----/ structured /----
+
+def encode_structured_response(responses, request_id=None):
+    """ Encode a list of action dicts (and the request id of the command) as a JSON line """
+    prefix = '{"responses":[' if request_id is None else '{"request_id":' + encode_compact(request_id) + ',"responses":['
+    return (prefix + ",".join([encode_structured_event(obj) for obj in responses]) + "]}\n").encode()
+
+def encode_structured_event(obj):
+    """
+    Encode an action dict and its code as a JSON object
+
+    The dict starts from the precomputed JSON of its action and code (STRUCTURED_PREFIXES), only its other fields are encoded
+    """
+    fields = [STRUCTURED_PREFIXES[obj["action"]]]
+    for key, value in obj.items():
+        if key != "action":
+            fields.append(f',"{key}":{encode_string(value) if value.__class__ is str else encode_compact(value)}')
+    fields.append("}")
+    return "".join(fields)
+
+def decode_structured_response(line):
+    """ Decode a structured response line into its list of action dicts """
+    return json.loads(line)["responses"]
+
+
+#----/ binary /----
+
+def encode_binary_command(command, id, tenant=None):
+    """ Encode a command as a binary frame """
+    id = f"{id}".encode()
+    tenant = tenant.encode() if tenant else b""
+    if len(tenant) > 0xFF or 2 + len(tenant) + len(id) > MAX_FRAME:
+        raise Codec_error("tenant or id too long for a binary command")
+    return COMMAND_HEADER.pack(2 + len(tenant) + len(id), COMMAND_CODES[command], len(tenant)) + tenant + id
+
+def decode_binary_command(frame):
+    """ Decode the body of a binary command frame into (command, id, tenant), command is None for an unknown code and tenant None when empty """
+    if len(frame) < 2 or 2 + frame[1] > len(frame):
+        raise Codec_error("truncated binary command")
+
+    code = frame[0]
+    command = COMMANDS[code] if code < len(COMMANDS) else None
+    end = 2 + frame[1]
+    try:
+        return command, frame[end:].decode(), frame[2:end].decode() or None
+    except UnicodeDecodeError:
+        raise Codec_error("binary command is not utf-8") from None
+
+def encode_binary_response(responses):
+    """ Encode a list of action dicts as one binary frame """
+    parts = []
+    for obj in responses:
+        call_id = f"{obj.get('call_id', '')}".encode()
+        operator_id = f"{obj.get('operator_id', '')}".encode()
+        if len(call_id) > 0xFFFF or len(operator_id) > 0xFFFF:
+            raise Codec_error("responses too long for a binary frame")
+        parts.append(EVENT_HEADER.pack(ACTION_CODES[obj["action"]], len(call_id), len(operator_id)))
+        parts.append(call_id)
+        parts.append(operator_id)
+
+    body = b"".join(parts)
+    if len(responses) > 0xFF or 1 + len(body) > MAX_FRAME:
+        raise Codec_error("responses too long for a binary frame")
+    return RESPONSE_HEADER.pack(1 + len(body), len(responses)) + body
+
+def decode_binary_response(frame):
+    """ Decode the body of a binary response frame into a list of action dicts """
+    responses = []
+    offset = 1
+
+    for _ in range(frame[0]):
+        action, call_len, op_len = EVENT_HEADER.unpack_from(frame, offset)
+        offset += EVENT_HEADER.size
+        obj = {"action": ACTIONS[action]}
+
+        if call_len:
+            obj["call_id"] = frame[offset:offset + call_len].decode()
+            offset += call_len
+        if op_len:
+            obj["operator_id"] = frame[offset:offset + op_len].decode()
+            offset += op_len
+
+        responses.append(obj)
+
+    return responses
+
+def split_frames(buffer):
+    """ Split a buffer into complete frame bodies, return (frames, rest of the buffer) """
+    frames = []
+    offset = 0
+    size = len(buffer)
+
+    while size - offset >= FRAME_HEADER.size:
+        length, = FRAME_HEADER.unpack_from(buffer, offset)
+        end = offset + FRAME_HEADER.size + length
+        if end > size:
+            break
+        frames.append(buffer[offset + FRAME_HEADER.size:end])
+        offset = end
+
+    return frames, buffer[offset:]
+
+
+#----/ event feed /----
+
+def encode_feed_event(tenant, obj):
+    """ Encode an action dict of tenant as a subscription feed line {"tenant": ..., "action": ..., "code": ..., ...} """
+    return ('{"tenant":' + encode_string(tenant) + "," + encode_structured_event(obj)[1:] + "\n").encode()
+
+def encode_feed_dropped(dropped):
+    """ Encode the feed line that tells a subscriber how many events it was too slow to receive """
+    return ('{"dropped":' + f"{dropped}" + "}\n").encode()
+
+def decode_feed_event(line):
+    """ Decode a subscription feed line, an event dict or {"dropped": count} """
+    return json.loads(line)
@@ -1,8 +1,16 @@
+import csv
+import json
+
 class Call_center():
+    """
+    Operators are A and B unless "operators" is given (see read_roster), they can be added, removed, logged out and in at runtime.
+    The call of an operator that is removed or logs out goes back to the front of the queue.
+    """
 
-    def __init__(self, queue):
+    def __init__(self, queue, operators=None):
         self.__queue = queue
-        self.__operators = [Operator("A", None, "available", dict()), Operator("B", None, "available", dict())]
+        self.__operators = operators if operators is not None else [Operator("A", None, "available", dict()), Operator("B", None, "available", dict())]
+        self.__by_id = {op.get_op_id(): op for op in self.__operators}
 
     def add_to_queue(self, call_id):
         """ Add a new call_id to the queue"""
@@ -10,9 +18,7 @@ class Call_center():
 
     def find_operator(self, op_id):
         """ Finds the operator by id """
-        for op in self.__operators:
-            if op.get_op_id() == op_id:
-                return op
+        return self.__by_id.get(op_id)
             
     def set_operator_call(self, operator, call_id):
         """
@@ -71,7 +77,10 @@ class Call_center():
         """
         op = self.find_operator(op_id)
 
-        if op.get_status() == "available":
+        if op is None:
+            print(f"Unknown operator {op_id}")
+
+        elif op.get_status() in ("available", "offline"):
             print(f"No calls for operator {op.get_op_id()}")
 
         elif op.get_status() == "busy":
@@ -90,7 +99,10 @@ class Call_center():
         """
         op = self.find_operator(op_id)
 
-        if op.get_status() == "available":
+        if op is None:
+            print(f"Unknown operator {op_id}")
+
+        elif op.get_status() in ("available", "offline"):
             print(f"No calls for operator {op.get_op_id()}")
 
         elif op.get_status() == "busy":
@@ -104,6 +116,67 @@ class Call_center():
             op.set_call_id(None)
             self.verify_queue()
 
+    def hand_back(self, op):
+        """ Puts the call of the operator (ringing or in progress) back at the front of the queue, returns its call_id or None """
+        call_id = op.get_call_id()
+        if call_id is not None:
+            self.__queue.insert(0, call_id)
+            op.set_call_id(None)
+        return call_id
+
+    def add_operator(self, op_id):
+        """ Adds an available operator after the existing ones, a waiting call rings for it """
+        if op_id in self.__by_id:
+            print(f"Operator {op_id} already exists")
+            return
+
+        op = Operator(op_id, None, "available", dict())
+        self.__operators.append(op)
+        self.__by_id[op_id] = op
+        print(f"Operator {op_id} added")
+        if self.__queue:
+            self.verify_queue()
+
+    def remove_operator(self, op_id):
+        """ Removes an operator, its call goes back to the queue and rings for another operator if one is available """
+        op = self.find_operator(op_id)
+        if op is None:
+            print(f"Unknown operator {op_id}")
+            return
+
+        call_id = self.hand_back(op)
+        self.__operators.remove(op)
+        del self.__by_id[op_id]
+        print(f"Operator {op_id} removed" + (f", call {call_id} back in queue" if call_id is not None else ""))
+        if call_id is not None:
+            self.verify_queue()
+
+    def logout(self, op_id):
+        """ Takes an operator off the floor ("offline"), its call goes back to the queue and rings for another operator if one is available """
+        op = self.find_operator(op_id)
+        if op is None:
+            print(f"Unknown operator {op_id}")
+            return
+
+        call_id = self.hand_back(op)
+        op.set_status("offline")
+        print(f"Operator {op_id} logged out" + (f", call {call_id} back in queue" if call_id is not None else ""))
+        if call_id is not None:
+            self.verify_queue()
+
+    def login(self, op_id):
+        """ Brings an offline operator back on the floor, a waiting call rings for it """
+        op = self.find_operator(op_id)
+        if op is None:
+            print(f"Unknown operator {op_id}")
+            return
+
+        if op.get_status() == "offline":
+            op.set_status("available")
+        print(f"Operator {op_id} logged in")
+        if self.__queue:
+            self.verify_queue()
+
     def hangup(self, call_id):
         """
         Finishes a call:
@@ -172,3 +245,23 @@ class Operator():
     
 
 
+def read_roster(path):
+    """
+    Reads the operators of a roster: a CSV file with an "op_id" column (and an optional "status", available or offline),
+    or a JSON list of {"op_id": ..., "status": ...} objects for a file ending in .json
+    """
+    with open(path, newline="") as roster:
+        rows = json.load(roster) if path.endswith(".json") else list(csv.DictReader(roster))
+
+    operators = []
+    seen = set()
+    for row in rows:
+        op_id = row.get("op_id")
+        status = row.get("status") or "available"
+        if not op_id or op_id in seen or status not in ("available", "offline"):
+            raise ValueError(f"Invalid roster operator {row}")
+        seen.add(op_id)
+        operators.append(Operator(f"{op_id}", None, status, dict()))
+
+    return operators
+
@@ -1,12 +1,14 @@
+import argparse
 import cmd
 from call_center_queue import Call_center
+from call_center_queue import read_roster
 
 class Call_command_interpreter(cmd.Cmd):
     prompt="(call-center)"
 
-    def __init__(self, completekey = "tab", stdin = None, stdout = None):
+    def __init__(self, completekey = "tab", stdin = None, stdout = None, operators = None):
         super().__init__(completekey, stdin, stdout)
-        self.call_center = Call_center([])
+        self.call_center = Call_center([], operators)
 
     "----/ call commands /----"
 
@@ -22,8 +24,25 @@ class Call_command_interpreter(cmd.Cmd):
     def do_hangup(self, call_id):
         self.call_center.hangup(call_id)
 
+    "----/ operator commands /----"
+
+    def do_add(self, operator_id):
+        self.call_center.add_operator(operator_id)
+
+    def do_remove(self, operator_id):
+        self.call_center.remove_operator(operator_id)
+
+    def do_login(self, operator_id):
+        self.call_center.login(operator_id)
+
+    def do_logout(self, operator_id):
+        self.call_center.logout(operator_id)
+
     def do_quit(self):
         return True
     
 if  __name__ == '__main__':
-    Call_command_interpreter().cmdloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roster", help="CSV or JSON file of the operators, A and B without it")
+    args = parser.parse_args()
+    Call_command_interpreter(operators=read_roster(args.roster) if args.roster else None).cmdloop()
\ No newline at end of file